@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 import os
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -8,17 +8,36 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import services
-from backend.services.world_bank_service import get_countries, get_gdp_growth_data, get_unemployment_data, get_country_comparison
-from backend.services.news_service import get_news_articles, analyze_news_sentiment
-from backend.services.mistral_service import get_mistral_insights, get_p3_recommendations
+from backend.services.world_bank_service import get_countries, get_gdp_growth_data, get_unemployment_data, get_country_comparison, get_global_rank, start_indicator_matrix
+from backend.services.news_service import get_news_articles, analyze_news_sentiment, get_news_sentiment, get_sentiment_trend, start_news_ingester
+from backend.services.mistral_service import get_mistral_insights, get_p3_recommendations, stream_mistral_insights, stream_p3_recommendations
 from backend.services.cdp_service import get_cdp_renewable_data
-from backend.services.project_service import get_projects_risk_analysis
+from backend.services.project_service import get_projects_risk_analysis, get_project_stats
 from backend.services.nib_service import get_nib_recommendations
+from backend.services.cache_service import get_cache_stats
+from backend.services.http_client import get_http_stats
+from backend.services.async_http_client import get_async_http_stats
+from backend.services.llm_gateway import get_llm_stats
+from backend.services.streaming import format_sse
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='frontend/static')
 CORS(app)
 
+# Keep regional/global indicator averages current in the background
+start_indicator_matrix()
+
+# Poll NewsAPI for tracked countries into the local news store, if enabled
+start_news_ingester()
+
+def event_stream(events):
+    """Send (event, data) pairs as server-sent events"""
+    return Response(
+        stream_with_context(format_sse(event, data) for event, data in events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # API Routes
 @app.route('/api/countries', methods=['GET'])
 def countries():
@@ -62,7 +81,7 @@ def analysis():
                             'value': '0.5%',
                             'direction': 'up'
                         },
-                        'globalRank': '45'
+                        'globalRank': get_global_rank(country_code, 'gdp')
                     },
                     {
                         'indicator': 'Inflation',
@@ -81,18 +100,13 @@ def analysis():
                             'value': '0.8%',
                             'direction': 'down'
                         },
-                        'globalRank': '38'
+                        'globalRank': get_global_rank(country_code, 'unemployment')
                     }
                 ]
             },
             'news': {
                 'articles': [],
-                'sentiment': {
-                    'neutral': 60,
-                    'positive': 25,
-                    'negative': 15,
-                    'summary': 'Overall neutral to positive sentiment in recent news coverage'
-                }
+                'sentiment': get_news_sentiment(country_code, query)
             },
             'aiInsights': {
                 'analysis': 'Based on the economic indicators and news sentiment, this country presents a moderate investment opportunity with reasonable risks.',
@@ -148,6 +162,24 @@ def follow_up_question():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/sentiment/<country_code>', methods=['GET'])
+def sentiment_trend(country_code):
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in ('hour', 'day'):
+            return jsonify({"error": "granularity must be 'hour' or 'day'"}), 400
+        days = request.args.get('days', '30')
+        if not days.isdigit() or int(days) < 1:
+            return jsonify({"error": "days must be a positive integer"}), 400
+        days = int(days)
+        result = {
+            'sentiment': get_news_sentiment(country_code, request.args.get('query', ''), days),
+            'trend': get_sentiment_trend(country_code, granularity, days)
+        }
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/cdp/<country_code>', methods=['GET'])
 def cdp_data(country_code):
     try:
@@ -165,6 +197,16 @@ def p3_strategy(country_code):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/p3/<country_code>/stream', methods=['GET'])
+def p3_strategy_stream(country_code):
+    query = request.args.get('query', '')
+    return event_stream(stream_p3_recommendations(country_code, query))
+
+@app.route('/api/insights/<country_code>/stream', methods=['GET'])
+def insights_stream(country_code):
+    query = request.args.get('query', '')
+    return event_stream(stream_mistral_insights(country_code, query))
+
 @app.route('/api/projects/<country_code>', methods=['GET'])
 def projects(country_code):
     try:
@@ -182,6 +224,32 @@ def nib_recommendations():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    try:
+        result = get_cache_stats()
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/http/stats', methods=['GET'])
+def http_stats():
+    try:
+        result = get_http_stats()
+        result['asyncUpstreams'] = get_async_http_stats()
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    try:
+        result = get_llm_stats()
+        result['projectAnalyses'] = get_project_stats()
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Serve frontend
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
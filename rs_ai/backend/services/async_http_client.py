@@ -0,0 +1,235 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+import httpx
+from .http_client import DEFAULT_TIMEOUT, IDEMPOTENT_METHODS, LLM_TIMEOUT, RETRY_STATUS_CODES
+from .prompt_budget import log_completion
+from .upstream_replay import upstream_url
+
+# Maximum concurrent requests per upstream; override with ASYNC_LIMIT_<UPSTREAM>
+UPSTREAM_LIMITS = {
+    'world_bank': 32,
+    'newsapi': 8,
+    'mistral': 4,
+    'openrouter': 4
+}
+DEFAULT_UPSTREAM_LIMIT = 16
+
+MISTRAL_ENDPOINT = os.environ.get('MISTRAL_ENDPOINT', 'https://api.mistral.ai')
+
+
+def upstream_limit(upstream):
+    """Get the concurrency limit for an upstream"""
+    default = UPSTREAM_LIMITS.get(upstream, DEFAULT_UPSTREAM_LIMIT)
+    return int(os.environ.get(f"ASYNC_LIMIT_{upstream.upper()}", default))
+
+
+def as_httpx_timeout(timeout):
+    """Convert a (connect, read) tuple as used by http_client to an httpx.Timeout"""
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return timeout
+
+
+class AsyncHttpClient:
+    """
+    Asyncio counterpart of HttpClient
+
+    Wraps one httpx.AsyncClient so a single event loop can keep many
+    upstream requests in flight on pooled keep-alive connections. Every
+    upstream has its own semaphore, so a burst against one service cannot
+    exhaust the connection pool or the upstream's rate limit for the others.
+    Retries follow the same rules as HttpClient.
+    """
+
+    def __init__(self, max_connections=200, timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.5, max_backoff=8):
+        """
+        Args:
+            max_connections: Maximum open connections across all hosts
+            timeout: Default (connect, read) timeout in seconds
+            retries: Retries for idempotent requests
+            backoff: Base backoff in seconds
+            max_backoff: Upper bound on a single backoff sleep
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.client = httpx.AsyncClient(
+            timeout=as_httpx_timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 2)
+        )
+
+        self._semaphores = {}
+        self._counters = {}
+
+    def semaphore(self, upstream):
+        if upstream not in self._semaphores:
+            self._semaphores[upstream] = asyncio.Semaphore(upstream_limit(upstream))
+            self._counters[upstream] = {
+                'requests': 0, 'errors': 0, 'retries': 0, 'inFlight': 0, 'totalSeconds': 0.0
+            }
+        return self._semaphores[upstream]
+
+    async def get(self, url, upstream, **kwargs):
+        return await self.request('GET', url, upstream, **kwargs)
+
+    async def post(self, url, upstream, **kwargs):
+        return await self.request('POST', url, upstream, **kwargs)
+
+    async def request(self, method, url, upstream, retry=None, timeout=None, **kwargs):
+        """
+        Send a request, holding one of the upstream's slots per attempt
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            upstream: Upstream name used for the concurrency limit and stats
+            retry: Whether to retry; defaults to True for idempotent methods
+            timeout: (connect, read) timeout; defaults to the client timeout
+            kwargs: Passed to httpx.AsyncClient.request
+
+        Returns:
+            httpx.Response (the last one if retries were exhausted)
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        if timeout is not None:
+            kwargs['timeout'] = as_httpx_timeout(timeout)
+        url = upstream_url(url)
+        attempts = 1 + (self.retries if retry else 0)
+        semaphore = self.semaphore(upstream)
+        counters = self._counters[upstream]
+
+        for attempt in range(attempts):
+            async with semaphore:
+                counters['inFlight'] += 1
+                start = time.time()
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    self._record(counters, start, error=True)
+                    if attempt + 1 >= attempts:
+                        raise
+                    response = None
+                finally:
+                    counters['inFlight'] -= 1
+
+            if response is not None:
+                self._record(counters, start, error=response.status_code >= 500)
+                if response.status_code not in RETRY_STATUS_CODES or attempt + 1 >= attempts:
+                    return response
+
+            counters['retries'] += 1
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def stats(self):
+        """
+        Get per-upstream request counters
+
+        Returns:
+            Dictionary of upstream name to statistics
+        """
+        stats = {}
+        for upstream, counters in list(self._counters.items()):
+            counters = dict(counters)
+            counters['limit'] = upstream_limit(upstream)
+            counters['averageSeconds'] = round(counters['totalSeconds'] / counters['requests'], 4) if counters['requests'] else 0
+            counters['totalSeconds'] = round(counters['totalSeconds'], 3)
+            stats[upstream] = counters
+        return stats
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _record(counters, start, error=False):
+        counters['requests'] += 1
+        counters['totalSeconds'] += time.time() - start
+        if error:
+            counters['errors'] += 1
+
+
+# One client per event loop; httpx clients and semaphores are bound to the
+# loop they are first used on
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+def get_async_http():
+    """
+    Get the shared async HTTP client for the running event loop
+
+    Returns:
+        AsyncHttpClient
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = AsyncHttpClient(
+                max_connections=int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', 200)),
+                retries=int(os.environ.get('HTTP_RETRIES', 2))
+            )
+            _clients[loop] = client
+    return client
+
+def get_async_http_stats():
+    """
+    Get per-upstream statistics summed over all event loops
+
+    Returns:
+        Dictionary of upstream name to request counters
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+
+    totals = {}
+    for client in clients:
+        for upstream, counters in client.stats().items():
+            total = totals.setdefault(upstream, {'requests': 0, 'errors': 0, 'retries': 0, 'inFlight': 0, 'totalSeconds': 0.0})
+            for name in ('requests', 'errors', 'retries', 'inFlight', 'totalSeconds'):
+                total[name] += counters[name]
+            total['limit'] = counters['limit']
+
+    for total in totals.values():
+        total['averageSeconds'] = round(total['totalSeconds'] / total['requests'], 4) if total['requests'] else 0
+        total['totalSeconds'] = round(total['totalSeconds'], 3)
+    return totals
+
+async def mistral_chat_async(prompt, model, endpoint="mistral"):
+    """
+    Send a single-message chat completion to Mistral AI, logging its token counts
+
+    Args:
+        prompt: User message
+        model: Model name
+        endpoint: Endpoint name for the token log
+
+    Returns:
+        Content of the first choice
+    """
+    start = time.time()
+    response = await get_async_http().post(
+        f"{MISTRAL_ENDPOINT}/v1/chat/completions",
+        'mistral',
+        headers={"Authorization": f"Bearer {os.environ.get('MISTRAL_API_KEY')}"},
+        json={"model": model, "messages": [{"role": "user", "content": prompt}]},
+        timeout=LLM_TIMEOUT
+    )
+    response.raise_for_status()
+    data = response.json()
+    content = data["choices"][0]["message"]["content"]
+    log_completion(endpoint, model, prompt, content, data.get("usage"), time.time() - start)
+    return content
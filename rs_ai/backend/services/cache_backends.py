@@ -0,0 +1,266 @@
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class CacheBackend:
+    """
+    Storage interface used by cache_service
+
+    Implementations store JSON-serializable values together with the time
+    they were produced and a TTL, and must be safe to call from many threads.
+    """
+
+    name = 'base'
+
+    def get_entry(self, key):
+        """
+        Look up a key, honoring the TTL it was written with
+
+        Returns:
+            Tuple of (found, data, timestamp)
+        """
+        raise NotImplementedError
+
+    def set(self, key, data, ttl, timestamp=None):
+        """Store a value for ttl seconds from timestamp (default: now)"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove a single key if present"""
+        raise NotImplementedError
+
+    def clear(self, key_prefix=None):
+        """Remove all entries, or only those whose key starts with key_prefix"""
+        raise NotImplementedError
+
+    def keys(self):
+        """List all live keys"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Backend statistics; must include an 'entries' count"""
+        raise NotImplementedError
+
+
+class RespError(Exception):
+    """Error reply from a RESP server"""
+
+
+def encode_command(*args):
+    """
+    Encode a command as a RESP array of bulk strings
+
+    Args:
+        args: Command name and arguments
+
+    Returns:
+        Encoded bytes
+    """
+    parts = [f'*{len(args)}\r\n'.encode()]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(f'${len(arg)}\r\n'.encode())
+        parts.append(arg)
+        parts.append(b'\r\n')
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """
+    Read one RESP value from a binary file-like stream
+
+    Args:
+        stream: Stream returned by socket.makefile('rb')
+
+    Returns:
+        Decoded reply (bytes, int, str, list or None)
+    """
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('Connection closed by cache server')
+
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b'+':
+        return payload.decode('utf-8')
+    if prefix == b'-':
+        raise RespError(payload.decode('utf-8'))
+    if prefix == b':':
+        return int(payload)
+    if prefix == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if prefix == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+
+    raise RespError(f'Unexpected reply prefix {prefix!r}')
+
+
+def escape_pattern(text):
+    """Escape glob special characters for a RESP MATCH pattern"""
+    return ''.join('\\' + c if c in '*?[]\\' else c for c in text)
+
+
+def parse_address(url):
+    """
+    Parse a cache backend URL into a socket family and address
+
+    Accepts unix:///path/to.sock, tcp://host:port and redis://host:port.
+
+    Returns:
+        Tuple of (family, address)
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'unix':
+        return socket.AF_UNIX, parsed.path
+    if parsed.scheme in ('tcp', 'redis'):
+        return socket.AF_INET, (parsed.hostname or '127.0.0.1', parsed.port or 6379)
+    raise ValueError(f"Unsupported cache backend URL: {url}")
+
+
+class RespCacheBackend(CacheBackend):
+    """
+    Cache backend shared by all worker processes on a node
+
+    Talks the Redis protocol (RESP) to either the bundled cache_server or a
+    real Redis instance. Each thread keeps its own connection. Connection
+    failures degrade to cache misses so an unavailable server never breaks a
+    request.
+    """
+
+    name = 'resp'
+
+    def __init__(self, url, timeout=1.0):
+        """
+        Args:
+            url: Server address (unix:///path, tcp://host:port or redis://host:port)
+            timeout: Socket timeout in seconds
+        """
+        self.url = url
+        self.family, self.address = parse_address(url)
+        self.timeout = timeout
+        self._local = threading.local()
+        self.errors = 0
+
+    def get_entry(self, key):
+        try:
+            raw = self._command('GET', key)
+        except (OSError, RespError) as e:
+            self._on_error(e)
+            return False, None, None
+
+        if raw is None:
+            return False, None, None
+
+        try:
+            envelope = json.loads(raw)
+        except ValueError:
+            return False, None, None
+        return True, envelope['data'], envelope['timestamp']
+
+    def set(self, key, data, ttl, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        remaining_ms = int((timestamp + ttl - time.time()) * 1000)
+        if remaining_ms <= 0:
+            return
+
+        try:
+            value = json.dumps({'timestamp': timestamp, 'data': data})
+        except (TypeError, ValueError) as e:
+            print(f"Error serializing cache entry {key}: {str(e)}")
+            return
+
+        try:
+            self._command('SET', key, value, 'PX', remaining_ms)
+        except (OSError, RespError) as e:
+            self._on_error(e)
+
+    def delete(self, key):
+        try:
+            self._command('DEL', key)
+        except (OSError, RespError) as e:
+            self._on_error(e)
+
+    def clear(self, key_prefix=None):
+        try:
+            if key_prefix is None:
+                self._command('FLUSHDB')
+                return
+            keys = self._scan(escape_pattern(key_prefix) + '*')
+            if keys:
+                self._command('DEL', *keys)
+        except (OSError, RespError) as e:
+            self._on_error(e)
+
+    def keys(self):
+        try:
+            return [k.decode('utf-8') for k in self._scan('*')]
+        except (OSError, RespError) as e:
+            self._on_error(e)
+            return []
+
+    def stats(self):
+        try:
+            entries = self._command('DBSIZE')
+        except (OSError, RespError) as e:
+            self._on_error(e)
+            entries = 0
+        return {
+            'backend': self.name,
+            'url': self.url,
+            'entries': entries,
+            'errors': self.errors
+        }
+
+    def _scan(self, pattern):
+        keys = []
+        cursor = b'0'
+        while True:
+            cursor, batch = self._command('SCAN', cursor, 'MATCH', pattern, 'COUNT', 1000)
+            keys.extend(batch)
+            if cursor in (b'0', 0, '0'):
+                return keys
+
+    def _command(self, *args):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.socket(self.family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+
+        sock, stream = conn
+        try:
+            sock.sendall(encode_command(*args))
+            return read_reply(stream)
+        except OSError:
+            self._disconnect()
+            raise
+
+    def _disconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def _on_error(self, error):
+        self.errors += 1
+        print(f"Error talking to cache backend {self.url}: {str(error)}")
+
@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Persistent SQLite cache tier
+
+    Entries are stored with their original write time and TTL so expiry
+    survives process restarts. Writes are buffered in memory and flushed by a
+    background thread (write-behind); reads consult the pending buffer before
+    the database so a value is visible as soon as it is written.
+    """
+
+    def __init__(self, directory, flush_interval=2):
+        """
+        Args:
+            directory: Directory holding the cache database (created if missing)
+            flush_interval: Seconds between background flushes of pending writes
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, data TEXT NOT NULL, '
+            'timestamp REAL NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='cache-disk-flusher', daemon=True)
+        self._flusher.start()
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (data, timestamp, ttl) or None if missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            if key in self._pending:
+                row = self._pending[key]
+                if row is None:
+                    return None
+                data, timestamp, expires_at = row
+            else:
+                row = self._conn.execute(
+                    'SELECT data, timestamp, expires_at FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                data, timestamp, expires_at = json.loads(row[0]), row[1], row[2]
+
+        if now >= expires_at:
+            return None
+        return data, timestamp, expires_at - timestamp
+
+    def set(self, key, data, timestamp, ttl):
+        """
+        Queue a value for writing
+
+        Args:
+            key: Cache key
+            data: JSON-serializable data
+            timestamp: Time the value was produced
+            ttl: Time to live in seconds
+        """
+        with self._lock:
+            self._pending[key] = (data, timestamp, timestamp + ttl)
+
+    def delete(self, key):
+        """Queue removal of a single key"""
+        with self._lock:
+            self._pending[key] = None
+
+    def clear(self, key_prefix=None):
+        """
+        Remove all entries, or only those whose key starts with key_prefix
+
+        Args:
+            key_prefix: Optional key prefix
+        """
+        with self._lock:
+            if key_prefix is None:
+                self._pending.clear()
+                self._conn.execute('DELETE FROM cache')
+            else:
+                for key in [k for k in self._pending if k.startswith(key_prefix)]:
+                    del self._pending[key]
+                self._conn.execute(
+                    "DELETE FROM cache WHERE substr(key, 1, ?) = ?",
+                    (len(key_prefix), key_prefix)
+                )
+            self._conn.commit()
+
+    def flush(self):
+        """
+        Write all pending changes and drop expired rows
+
+        Returns:
+            Number of pending changes written
+        """
+        # Hold the lock for the whole write so readers never fall between the
+        # pending buffer and the database
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            upserts = []
+            deletes = []
+            for key, row in pending.items():
+                if row is None:
+                    deletes.append((key,))
+                else:
+                    data, timestamp, expires_at = row
+                    try:
+                        upserts.append((key, json.dumps(data), timestamp, expires_at))
+                    except (TypeError, ValueError) as e:
+                        print(f"Error serializing cache entry {key}: {str(e)}")
+
+            self._conn.executemany('DELETE FROM cache WHERE key = ?', deletes)
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cache (key, data, timestamp, expires_at) VALUES (?, ?, ?, ?)',
+                upserts
+            )
+            self._conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+
+        return len(pending)
+
+    def close(self):
+        """Flush pending writes and stop the background flusher"""
+        self._stop_event.set()
+        self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        """
+        Get disk tier statistics
+
+        Returns:
+            Dictionary with stored row count, pending writes and file size
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            pending = len(self._pending)
+        return {
+            'path': self.path,
+            'entries': rows,
+            'pendingWrites': pending,
+            'fileBytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing disk cache: {str(e)}")
@@ -0,0 +1,259 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from .cache_backends import CacheBackend
+
+
+class CacheEntry:
+    """A single cached value with its bookkeeping"""
+
+    __slots__ = ('data', 'timestamp', 'expires_at', 'size')
+
+    def __init__(self, data, timestamp, ttl, size):
+        self.data = data
+        self.timestamp = timestamp
+        self.expires_at = timestamp + ttl
+        self.size = size
+
+    def is_expired(self, now):
+        return now >= self.expires_at
+
+
+def estimate_size(data):
+    """
+    Estimate the memory footprint of a cached value in bytes
+
+    Cached values are the JSON payloads returned by the API routes, so the
+    length of their serialized form is a cheap and stable approximation.
+
+    Args:
+        data: Value to measure
+
+    Returns:
+        Approximate size in bytes
+    """
+    try:
+        return len(json.dumps(data, default=str))
+    except (TypeError, ValueError):
+        return len(repr(data))
+
+
+class CacheEngine(CacheBackend):
+    """
+    Thread-safe in-memory cache with LRU eviction and per-entry TTL
+
+    Entries are kept in least-recently-used order. Whenever the entry count or
+    the estimated byte total exceeds its budget, the oldest entries are evicted.
+    Expired entries are dropped on read and by a periodic background sweep.
+    This is the default, per-process cache backend.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_entries=1000, max_bytes=64 * 1024 * 1024, sweep_interval=60, listener=None):
+        """
+        Args:
+            max_entries: Maximum number of entries held (0 disables the limit)
+            max_bytes: Maximum estimated bytes held (0 disables the limit)
+            sweep_interval: Seconds between background sweeps of expired entries
+            listener: Optional object with entry_added(key, size) and
+                entry_removed(key, size, reason) methods, notified as entries
+                come and go
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.listener = listener
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._sweeper = None
+        self._stop_event = threading.Event()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, max_age=None):
+        """
+        Look up a key
+
+        Args:
+            key: Cache key
+            max_age: Optional caller-side maximum age in seconds, applied on
+                top of the TTL the entry was written with
+
+        Returns:
+            Tuple of (found, data)
+        """
+        found, data, timestamp = self.get_entry(key)
+        if found and max_age is not None and time.time() - timestamp >= max_age:
+            return False, None
+        return found, data
+
+    def get_entry(self, key):
+        """
+        Look up a key, honoring only the TTL it was written with
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (found, data, timestamp)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None, None
+
+            if entry.is_expired(now):
+                self._remove(key, 'expired')
+                self.expirations += 1
+                return False, None, None
+
+            self._entries.move_to_end(key)
+            return True, entry.data, entry.timestamp
+
+    def set(self, key, data, ttl, timestamp=None):
+        """
+        Store a value and evict least-recently-used entries if over budget
+
+        Args:
+            key: Cache key
+            data: Data to store
+            ttl: Time to live in seconds
+            timestamp: Time the value was produced (default: now)
+        """
+        size = estimate_size(data)
+        entry = CacheEntry(data, time.time() if timestamp is None else timestamp, ttl, size)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # A value larger than the whole budget would evict everything else
+            if self.max_bytes and size > self.max_bytes:
+                return
+
+            self._entries[key] = entry
+            self._bytes += size
+            if self.listener is not None:
+                self.listener.entry_added(key, size)
+            self._evict()
+
+        self.start_sweeper()
+
+    def delete(self, key):
+        """Remove a single key if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self, key_prefix=None):
+        """
+        Remove all entries, or only those whose key starts with key_prefix
+
+        Args:
+            key_prefix: Optional key prefix
+        """
+        with self._lock:
+            if key_prefix is None:
+                for key in list(self._entries):
+                    self._remove(key)
+            else:
+                for key in [k for k in self._entries if k.startswith(key_prefix)]:
+                    self._remove(key)
+
+    def sweep(self):
+        """
+        Drop every expired entry
+
+        Returns:
+            Number of entries removed
+        """
+        now = time.time()
+        with self._lock:
+            expired = [k for k, entry in self._entries.items() if entry.is_expired(now)]
+            for key in expired:
+                self._remove(key, 'expired')
+            self.expirations += len(expired)
+        return len(expired)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        found, _ = self.get(key)
+        return found
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def stats(self):
+        """
+        Get engine-level statistics
+
+        Returns:
+            Dictionary with entry count, byte usage, budgets and counters
+        """
+        with self._lock:
+            return {
+                'backend': self.name,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def start_sweeper(self):
+        """Start the background sweeper thread if it is not already running"""
+        if self.sweep_interval <= 0 or (self._sweeper is not None and self._sweeper.is_alive()):
+            return
+
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop,
+                name='cache-sweeper',
+                daemon=True
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper thread"""
+        self._stop_event.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=self.sweep_interval + 1)
+            self._sweeper = None
+
+    def _sweep_loop(self):
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping cache: {str(e)}")
+
+    def _remove(self, key, reason='deleted'):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if self.listener is not None:
+            self.listener.entry_removed(key, entry.size, reason)
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries) or
+            (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)), 'evicted')
+            self.evictions += 1
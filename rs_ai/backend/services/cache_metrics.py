@@ -0,0 +1,122 @@
+import threading
+
+# Cache key families, matched by prefix. Keys matching none of these are
+# reported under "other".
+KEY_FAMILIES = [
+    'countries',
+    'wb_series_',
+    'wb_source_',
+    'news_',
+    'ai_insights_',
+    'p3_',
+    'projects_',
+    'cdp_renewable_',
+    'nib_recommendations'
+]
+
+OTHER_FAMILY = 'other'
+
+
+def key_family(key):
+    """
+    Get the family a cache key belongs to
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Family prefix, or "other"
+    """
+    for family in KEY_FAMILIES:
+        if key.startswith(family):
+            return family
+    return OTHER_FAMILY
+
+
+def _empty_counters():
+    return {
+        'hits': 0,
+        'staleHits': 0,
+        'misses': 0,
+        'evictions': 0,
+        'expirations': 0,
+        'entries': 0,
+        'bytes': 0,
+        'computeCount': 0,
+        'computeSeconds': 0.0
+    }
+
+
+class CacheMetrics:
+    """
+    Per-family cache counters
+
+    Lookups and computations are recorded by cache_service. Entry additions
+    and removals are reported by the in-process CacheEngine, which calls
+    entry_added and entry_removed as its listener. Every update is O(1).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {family: _empty_counters() for family in KEY_FAMILIES + [OTHER_FAMILY]}
+
+    def record_hit(self, key, stale=False):
+        self._increment(key, 'staleHits' if stale else 'hits')
+
+    def record_miss(self, key):
+        self._increment(key, 'misses')
+
+    def record_compute(self, key, seconds):
+        with self._lock:
+            counters = self._families[key_family(key)]
+            counters['computeCount'] += 1
+            counters['computeSeconds'] += seconds
+
+    def entry_added(self, key, size):
+        with self._lock:
+            counters = self._families[key_family(key)]
+            counters['entries'] += 1
+            counters['bytes'] += size
+
+    def entry_removed(self, key, size, reason):
+        """
+        Args:
+            key: Cache key
+            size: Estimated size of the removed entry
+            reason: 'evicted', 'expired' or 'deleted'
+        """
+        with self._lock:
+            counters = self._families[key_family(key)]
+            counters['entries'] -= 1
+            counters['bytes'] -= size
+            if reason == 'evicted':
+                counters['evictions'] += 1
+            elif reason == 'expired':
+                counters['expirations'] += 1
+
+    def snapshot(self):
+        """
+        Get per-family statistics
+
+        Time saved is estimated as the number of hits multiplied by the
+        average time it took to compute a value of that family.
+
+        Returns:
+            Dictionary of family name to statistics
+        """
+        with self._lock:
+            families = {family: dict(counters) for family, counters in self._families.items()}
+
+        for counters in families.values():
+            lookups = counters['hits'] + counters['staleHits'] + counters['misses']
+            average = counters['computeSeconds'] / counters['computeCount'] if counters['computeCount'] else 0
+            counters['hitRate'] = round((counters['hits'] + counters['staleHits']) / lookups, 4) if lookups else 0
+            counters['averageComputeSeconds'] = round(average, 4)
+            counters['timeSavedSeconds'] = round((counters['hits'] + counters['staleHits']) * average, 3)
+            counters['computeSeconds'] = round(counters['computeSeconds'], 3)
+
+        return families
+
+    def _increment(self, key, counter):
+        with self._lock:
+            self._families[key_family(key)][counter] += 1
@@ -0,0 +1,133 @@
+import threading
+import time
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised instead of calling an upstream that recently failed for the same key"""
+
+    def __init__(self, upstream, key, retry_after, last_error):
+        super().__init__(
+            f"{upstream} unavailable for {key} (last error: {last_error}); "
+            f"retrying in {retry_after:.0f}s"
+        )
+        self.upstream = upstream
+        self.key = key
+        self.retry_after = retry_after
+        self.last_error = last_error
+
+
+class NegativeCache:
+    """
+    Remembers upstream failures per (upstream, key) with exponential backoff
+
+    After a failure the key is blocked for base_ttl seconds; every further
+    consecutive failure doubles the block up to max_ttl. A success clears the
+    record. While a key is blocked, callers fail fast instead of paying the
+    upstream timeout again. Errors with a retry_after attribute (such as
+    rejections by the LLM gateway) block the key for at most that long.
+    """
+
+    def __init__(self, base_ttl=30, max_ttl=900, max_entries=10000):
+        """
+        Args:
+            base_ttl: Seconds a key is blocked after its first failure
+            max_ttl: Upper bound on the block duration
+            max_entries: Maximum number of failure records kept
+        """
+        self.base_ttl = base_ttl
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._upstreams = {}
+
+    def check(self, upstream, key):
+        """
+        Raise if the upstream is currently blocked for this key
+
+        Args:
+            upstream: Upstream service name
+            key: Cache key
+
+        Raises:
+            UpstreamUnavailableError: While the backoff window is open
+        """
+        with self._lock:
+            record = self._failures.get((upstream, key))
+            if record is None:
+                return
+            retry_after = record['until'] - time.time()
+            if retry_after <= 0:
+                return
+            self._upstream_counters(upstream)['shortCircuited'] += 1
+            error = record['error']
+
+        raise UpstreamUnavailableError(upstream, key, retry_after, error)
+
+    def record_failure(self, upstream, key, error):
+        """
+        Record a failed upstream call and open (or extend) the backoff window
+
+        Args:
+            upstream: Upstream service name
+            key: Cache key
+            error: The exception raised by the upstream call
+
+        Returns:
+            Seconds the key is now blocked for
+        """
+        now = time.time()
+        with self._lock:
+            record = self._failures.get((upstream, key))
+            count = record['count'] + 1 if record else 1
+            ttl = min(self.max_ttl, self.base_ttl * 2 ** (count - 1))
+            retry_after = getattr(error, 'retry_after', None)
+            if retry_after is not None:
+                ttl = min(ttl, retry_after)
+            self._failures[(upstream, key)] = {
+                'count': count,
+                'until': now + ttl,
+                'error': str(error)
+            }
+            self._upstream_counters(upstream)['failures'] += 1
+
+            if len(self._failures) > self.max_entries:
+                self._prune(now)
+
+        return ttl
+
+    def record_success(self, upstream, key):
+        """Clear the failure record after a successful upstream call"""
+        with self._lock:
+            self._failures.pop((upstream, key), None)
+
+    def stats(self):
+        """
+        Get per-upstream failure statistics
+
+        Returns:
+            Dictionary of upstream name to counters and currently blocked keys
+        """
+        now = time.time()
+        with self._lock:
+            stats = {upstream: dict(counters, blockedKeys=0) for upstream, counters in self._upstreams.items()}
+            for (upstream, _), record in self._failures.items():
+                if record['until'] > now:
+                    stats[upstream]['blockedKeys'] += 1
+        return stats
+
+    def _upstream_counters(self, upstream):
+        if upstream not in self._upstreams:
+            self._upstreams[upstream] = {'failures': 0, 'shortCircuited': 0}
+        return self._upstreams[upstream]
+
+    def _prune(self, now):
+        # Drop expired windows first, then the records closest to expiry
+        for failure_key in [k for k, r in self._failures.items() if r['until'] <= now]:
+            del self._failures[failure_key]
+        overflow = len(self._failures) - self.max_entries
+        if overflow > 0:
+            oldest = sorted(self._failures, key=lambda k: self._failures[k]['until'])[:overflow]
+            for failure_key in oldest:
+                del self._failures[failure_key]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Node-local cache server shared by all worker processes
+
+Speaks the subset of the Redis protocol used by RespCacheBackend (PING, GET,
+SET with EX/PX, DEL, SCAN, DBSIZE, FLUSHDB) on top of the in-process
+CacheEngine. Run it once per node and point every worker at it:
+
+    python -m backend.services.cache_server --url unix:///tmp/rs_ai_cache.sock
+    CACHE_BACKEND=resp CACHE_BACKEND_URL=unix:///tmp/rs_ai_cache.sock python run.py
+"""
+import argparse
+import os
+import re
+import socket
+import socketserver
+from .cache_backends import RespError, parse_address
+from .cache_engine import CacheEngine
+
+# Entries written without EX/PX are kept until evicted
+NO_EXPIRY = float('inf')
+
+
+def glob_to_regex(pattern):
+    """
+    Translate a Redis-style glob (*, ? and backslash escapes) to a regex
+
+    Args:
+        pattern: Glob pattern
+
+    Returns:
+        Compiled regular expression matching whole keys
+    """
+    parts = []
+    chars = iter(pattern)
+    for c in chars:
+        if c == '\\':
+            parts.append(re.escape(next(chars, '\\')))
+        elif c == '*':
+            parts.append('.*')
+        elif c == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(c))
+    return re.compile(''.join(parts) + r'\Z', re.DOTALL)
+
+
+def encode_reply(value):
+    """Encode a Python value as a RESP reply"""
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, bool):
+        return b'+OK\r\n'
+    if isinstance(value, int):
+        return f':{value}\r\n'.encode()
+    if isinstance(value, (list, tuple)):
+        return b''.join([f'*{len(value)}\r\n'.encode()] + [encode_reply(v) for v in value])
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return f'${len(value)}\r\n'.encode() + value + b'\r\n'
+
+
+class CacheCommandHandler(socketserver.StreamRequestHandler):
+    """Handles one client connection, one RESP command at a time"""
+
+    def handle(self):
+        while True:
+            try:
+                command = self._read_command()
+            except (ConnectionError, ValueError, RespError):
+                return
+            if command is None:
+                return
+
+            try:
+                reply = encode_reply(self.execute(command))
+            except RespError as e:
+                reply = f'-ERR {str(e)}\r\n'.encode()
+
+            try:
+                self.wfile.write(reply)
+                self.wfile.flush()
+            except OSError:
+                return
+
+    def execute(self, command):
+        engine = self.server.engine
+        name = command[0].decode('utf-8').upper()
+        args = command[1:]
+
+        if name == 'PING':
+            return 'PONG'
+
+        if name == 'GET':
+            found, data = engine.get(args[0].decode('utf-8'))
+            return data if found else None
+
+        if name == 'SET':
+            ttl = NO_EXPIRY
+            options = [a.decode('utf-8').upper() for a in args[2:]]
+            if 'PX' in options:
+                ttl = int(options[options.index('PX') + 1]) / 1000
+            elif 'EX' in options:
+                ttl = int(options[options.index('EX') + 1])
+            engine.set(args[0].decode('utf-8'), args[1].decode('utf-8'), ttl)
+            return True
+
+        if name == 'DEL':
+            removed = 0
+            for key in args:
+                key = key.decode('utf-8')
+                found, _, _ = engine.get_entry(key)
+                if found:
+                    engine.delete(key)
+                    removed += 1
+            return removed
+
+        if name == 'SCAN':
+            # All matches are returned in a single batch with a terminal cursor
+            pattern = '*'
+            options = [a.decode('utf-8') for a in args[1:]]
+            upper = [o.upper() for o in options]
+            if 'MATCH' in upper:
+                pattern = options[upper.index('MATCH') + 1]
+            regex = glob_to_regex(pattern)
+            return ['0', [k for k in engine.keys() if regex.match(k)]]
+
+        if name == 'DBSIZE':
+            return len(engine)
+
+        if name == 'FLUSHDB':
+            engine.clear()
+            return True
+
+        raise RespError(f"unknown command '{name}'")
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            raise RespError('expected RESP array')
+
+        command = []
+        for _ in range(int(line[1:-2])):
+            header = self.rfile.readline()
+            if not header.startswith(b'$'):
+                raise ValueError('expected bulk string')
+            length = int(header[1:-2])
+            command.append(self.rfile.read(length + 2)[:-2])
+        return command
+
+
+class ThreadingUnixCacheServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ThreadingTCPCacheServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def create_server(url, engine=None):
+    """
+    Create a cache server bound to url
+
+    Args:
+        url: Listen address (unix:///path or tcp://host:port)
+        engine: CacheEngine to serve (default: one built from CACHE_* settings)
+
+    Returns:
+        socketserver instance; call serve_forever() to run it
+    """
+    family, address = parse_address(url)
+    if engine is None:
+        engine = CacheEngine(
+            max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 1000)),
+            max_bytes=int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            sweep_interval=int(os.environ.get('CACHE_SWEEP_INTERVAL', 60))
+        )
+
+    if family == socket.AF_UNIX:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = ThreadingUnixCacheServer(address, CacheCommandHandler)
+    else:
+        server = ThreadingTCPCacheServer(address, CacheCommandHandler)
+
+    server.engine = engine
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the shared RS_AI cache server')
+    parser.add_argument(
+        '--url',
+        default=os.environ.get('CACHE_BACKEND_URL', 'unix:///tmp/rs_ai_cache.sock'),
+        help='Listen address (unix:///path or tcp://host:port)'
+    )
+    args = parser.parse_args()
+
+    server = create_server(args.url)
+    print(f"Cache server listening on {args.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,66 +1,529 @@
+import asyncio
+import atexit
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from .cache_backends import RespCacheBackend
+from .cache_engine import CacheEngine
+from .cache_metrics import CacheMetrics
+from .cache_negative import NegativeCache, UpstreamUnavailableError
+from .cache_disk import DiskCache
 
-# Simple in-memory cache
-cache = {}
+# Per key family hit/miss/eviction/latency counters
+metrics = CacheMetrics()
+
+def create_backend():
+    """
+    Create the cache backend selected by CACHE_BACKEND
+
+    'memory' (default) is a bounded in-process LRU+TTL engine. 'resp' shares
+    one cache between all worker processes through cache_server (or Redis)
+    at CACHE_BACKEND_URL.
+
+    Returns:
+        CacheBackend instance
+    """
+    backend = os.environ.get('CACHE_BACKEND', 'memory')
+    if backend == 'resp':
+        return RespCacheBackend(
+            os.environ.get('CACHE_BACKEND_URL', 'unix:///tmp/rs_ai_cache.sock'),
+            timeout=float(os.environ.get('CACHE_BACKEND_TIMEOUT', 1.0))
+        )
+    if backend != 'memory':
+        print(f"Unknown cache backend {backend}, using memory")
+
+    return CacheEngine(
+        max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 1000)),
+        max_bytes=int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        sweep_interval=int(os.environ.get('CACHE_SWEEP_INTERVAL', 60)),
+        listener=metrics
+    )
+
+cache = create_backend()
+
+# Recent upstream failures, so a failing upstream is not retried on every request
+negative_cache = NegativeCache(
+    base_ttl=float(os.environ.get('CACHE_FAILURE_TTL', 30)),
+    max_ttl=float(os.environ.get('CACHE_FAILURE_MAX_TTL', 900))
+)
+
+# Optional persistent tier, enabled by pointing CACHE_DIR at a directory
+disk_cache = None
+if os.environ.get('CACHE_DIR'):
+    try:
+        disk_cache = DiskCache(
+            os.environ['CACHE_DIR'],
+            flush_interval=float(os.environ.get('CACHE_DISK_FLUSH_INTERVAL', 2))
+        )
+        atexit.register(disk_cache.close)
+    except Exception as e:
+        print(f"Error opening disk cache: {str(e)}")
+
+def _lookup_entry(key):
+    """
+    Look a key up in memory, then in the disk tier
+
+    Only the TTL the entry was written with is honored here. Disk hits are
+    promoted into memory with their original write time, so the remaining
+    TTL carries over across restarts.
+
+    Returns:
+        Tuple of (found, data, timestamp)
+    """
+    found, data, timestamp = cache.get_entry(key)
+    if found or disk_cache is None:
+        return found, data, timestamp
+
+    try:
+        row = disk_cache.get(key)
+    except Exception as e:
+        print(f"Error reading disk cache: {str(e)}")
+        return False, None, None
+
+    if row is None:
+        return False, None, None
+
+    data, timestamp, ttl = row
+    cache.set(key, data, ttl, timestamp)
+    return True, data, timestamp
+
+def _lookup(key, max_age):
+    """
+    Look a key up in all tiers, treating entries older than max_age as missing
+
+    Returns:
+        Tuple of (found, data)
+    """
+    found, data, timestamp = _lookup_entry(key)
+    if not found or time.time() - timestamp >= max_age:
+        return False, None
+    return True, data
+
+def _store(key, data, ttl):
+    """Write a value to memory and queue it for the disk tier"""
+    timestamp = time.time()
+    cache.set(key, data, ttl, timestamp)
+    if disk_cache is not None:
+        disk_cache.set(key, data, timestamp, ttl)
 
 def get_cached_data(key, max_age=3600):
     """
     Get data from cache if it exists and is not expired
-    
+
     Args:
         key: Cache key
         max_age: Maximum age of cached data in seconds (default: 1 hour)
-        
+
     Returns:
         Cached data or None if not found or expired
     """
-    if key in cache:
-        cached_item = cache[key]
-        current_time = time.time()
-        
-        # Check if cache is expired
-        if current_time - cached_item['timestamp'] < max_age:
-            return cached_item['data']
-    
+    found, data = _lookup(key, max_age)
+    if found:
+        metrics.record_hit(key)
+        return data
+    metrics.record_miss(key)
     return None
 
+def lookup_cached_data(key, max_age=3600, stale_ttl=0):
+    """
+    Look data up the way get_or_compute does, without computing on a miss
+
+    Args:
+        key: Cache key
+        max_age: Maximum age of fresh data in seconds (default: 1 hour)
+        stale_ttl: Seconds past max_age during which stale data is returned
+
+    Returns:
+        Tuple of (data, stale); data is None if missing or too old
+    """
+    found, data, timestamp = _lookup_entry(key)
+    if found:
+        age = time.time() - timestamp
+        if age < max_age + stale_ttl:
+            metrics.record_hit(key, stale=age >= max_age)
+            return data, age >= max_age
+    metrics.record_miss(key)
+    return None, False
+
+def peek_cached_data(key):
+    """
+    Get data from cache regardless of its age, without counting a lookup
+
+    Meant for compute functions that revalidate an existing entry rather
+    than rebuild it.
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Cached data or None if not cached
+    """
+    found, data, _ = _lookup_entry(key)
+    return data if found else None
+
 def set_cached_data(key, data, max_age=3600):
     """
     Store data in cache
-    
+
     Args:
         key: Cache key
         data: Data to store
         max_age: Maximum age of cached data in seconds (default: 1 hour)
     """
-    cache[key] = {
-        'data': data,
-        'timestamp': time.time(),
-        'max_age': max_age
-    }
+    _store(key, data, max_age)
+
+class _Flight:
+    """An in-progress computation that concurrent callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+# In-progress computations keyed by cache key
+_flights = {}
+_flights_lock = threading.Lock()
+
+# Background refresh of stale entries
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CACHE_REFRESH_WORKERS', 4)),
+    thread_name_prefix='cache-refresh'
+)
+_refresh_max_pending = int(os.environ.get('CACHE_REFRESH_MAX_PENDING', 32))
+_refreshing = set()
+_refresh_lock = threading.Lock()
+_refresh_stats = {
+    'staleServed': 0,
+    'scheduled': 0,
+    'skipped': 0,
+    'completed': 0,
+    'failed': 0,
+    'totalSeconds': 0.0
+}
+
+def get_or_compute(key, compute, max_age=3600, stale_ttl=0, upstream=None):
+    """
+    Get data from cache, computing and storing it on a miss
+
+    Only one caller per key runs compute at a time. Concurrent callers that
+    miss the same key wait for that computation and share its result (or its
+    exception) instead of hitting the upstream service themselves.
+
+    With stale_ttl, entries are kept for max_age + stale_ttl seconds. Once an
+    entry is older than max_age (soft TTL) but still within the hard TTL, the
+    stale value is returned immediately and compute is rerun in the
+    background to refresh it.
+
+    With upstream, failures of compute are remembered per (upstream, key):
+    for a short window that doubles on each consecutive failure, callers get
+    UpstreamUnavailableError immediately instead of calling the upstream.
+
+    Args:
+        key: Cache key
+        compute: Zero-argument callable producing the data
+        max_age: Maximum age of fresh data in seconds (default: 1 hour)
+        stale_ttl: Seconds past max_age during which stale data may be served
+            while it is refreshed (default: 0, disabled)
+        upstream: Name of the upstream service compute calls, enabling
+            negative caching of its failures (default: None, disabled)
+
+    Returns:
+        Cached or freshly computed data
+
+    Raises:
+        UpstreamUnavailableError: If upstream failed recently for this key
+    """
+    found, data, timestamp = _lookup_entry(key)
+    if found:
+        age = time.time() - timestamp
+        if age < max_age:
+            metrics.record_hit(key)
+            return data
+        if age < max_age + stale_ttl:
+            metrics.record_hit(key, stale=True)
+            with _refresh_lock:
+                _refresh_stats['staleServed'] += 1
+            _schedule_refresh(key, compute, max_age, stale_ttl, upstream)
+            return data
+
+    metrics.record_miss(key)
+    return _compute_single_flight(key, compute, max_age, stale_ttl, upstream)
+
+def single_flight(key, compute):
+    """
+    Run compute, coalescing concurrent calls for the same key into one
+
+    The first caller runs compute; callers arriving while it is running wait
+    for it and receive the same result or exception. Nothing is cached.
+
+    Args:
+        key: Coalescing key
+        compute: Zero-argument callable
+
+    Returns:
+        Result of compute
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = compute()
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+def _compute_single_flight(key, compute, max_age, stale_ttl, upstream=None):
+    """Run compute for key unless another caller already is, then share its result"""
+    if upstream is not None:
+        negative_cache.check(upstream, key)
+
+    def compute_and_store():
+        # Another caller may have filled the key while we were waiting to lead
+        found, data = _lookup(key, max_age)
+        if found:
+            return data
+
+        start = time.time()
+        try:
+            data = compute()
+        except Exception as e:
+            if upstream is not None:
+                negative_cache.record_failure(upstream, key, e)
+            raise
+        metrics.record_compute(key, time.time() - start)
+        _store(key, data, max_age + stale_ttl)
+        if upstream is not None:
+            negative_cache.record_success(upstream, key)
+        return data
+
+    return single_flight(key, compute_and_store)
+
+def _schedule_refresh(key, compute, max_age, stale_ttl, upstream=None):
+    """Queue a background refresh of key unless one is already pending or the queue is full"""
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        if len(_refreshing) >= _refresh_max_pending:
+            _refresh_stats['skipped'] += 1
+            return
+        _refreshing.add(key)
+        _refresh_stats['scheduled'] += 1
+
+    try:
+        _refresh_executor.submit(_refresh, key, compute, max_age, stale_ttl, upstream)
+    except RuntimeError:
+        # Executor is shutting down
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+def _refresh(key, compute, max_age, stale_ttl, upstream=None):
+    start = time.time()
+    try:
+        _compute_single_flight(key, compute, max_age, stale_ttl, upstream)
+        outcome = 'completed'
+    except UpstreamUnavailableError:
+        # Upstream is backing off; keep serving the stale value
+        outcome = 'skipped'
+    except Exception as e:
+        print(f"Error refreshing cache entry {key}: {str(e)}")
+        outcome = 'failed'
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+    with _refresh_lock:
+        _refresh_stats[outcome] += 1
+        # Skipped refreshes never ran compute, so they are left out of the average
+        if outcome != 'skipped':
+            _refresh_stats['totalSeconds'] += time.time() - start
+
+# Asyncio variants. Cache lookups and writes are shared with the threaded
+# path; only coalescing and refreshes are done on the event loop.
+_async_flights = {}
+_async_refresh_tasks = set()
+
+async def get_or_compute_async(key, compute, max_age=3600, stale_ttl=0, upstream=None):
+    """
+    Asyncio version of get_or_compute
+
+    Args:
+        key: Cache key
+        compute: Zero-argument coroutine function producing the data
+        max_age: Maximum age of fresh data in seconds (default: 1 hour)
+        stale_ttl: Seconds past max_age during which stale data may be served
+            while it is refreshed (default: 0, disabled)
+        upstream: Name of the upstream service compute calls, enabling
+            negative caching of its failures (default: None, disabled)
+
+    Returns:
+        Cached or freshly computed data
+
+    Raises:
+        UpstreamUnavailableError: If upstream failed recently for this key
+    """
+    found, data, timestamp = _lookup_entry(key)
+    if found:
+        age = time.time() - timestamp
+        if age < max_age:
+            metrics.record_hit(key)
+            return data
+        if age < max_age + stale_ttl:
+            metrics.record_hit(key, stale=True)
+            with _refresh_lock:
+                _refresh_stats['staleServed'] += 1
+            _schedule_refresh_async(key, compute, max_age, stale_ttl, upstream)
+            return data
+
+    metrics.record_miss(key)
+    return await _compute_single_flight_async(key, compute, max_age, stale_ttl, upstream)
+
+async def single_flight_async(key, compute):
+    """
+    Asyncio version of single_flight, coalescing per event loop
+
+    Args:
+        key: Coalescing key
+        compute: Zero-argument coroutine function
+
+    Returns:
+        Result of compute
+    """
+    loop = asyncio.get_running_loop()
+    flight_key = (loop, key)
+    future = _async_flights.get(flight_key)
+    if future is not None:
+        # Shield so a cancelled waiter does not cancel the leader's result
+        return await asyncio.shield(future)
+
+    future = _async_flights[flight_key] = loop.create_future()
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved in case nobody else was waiting
+        future.exception()
+        raise
+    finally:
+        _async_flights.pop(flight_key, None)
+
+async def _compute_single_flight_async(key, compute, max_age, stale_ttl, upstream=None):
+    if upstream is not None:
+        negative_cache.check(upstream, key)
+
+    async def compute_and_store():
+        found, data = _lookup(key, max_age)
+        if found:
+            return data
+
+        start = time.time()
+        try:
+            data = await compute()
+        except Exception as e:
+            if upstream is not None:
+                negative_cache.record_failure(upstream, key, e)
+            raise
+        metrics.record_compute(key, time.time() - start)
+        _store(key, data, max_age + stale_ttl)
+        if upstream is not None:
+            negative_cache.record_success(upstream, key)
+        return data
+
+    return await single_flight_async(key, compute_and_store)
+
+def _schedule_refresh_async(key, compute, max_age, stale_ttl, upstream=None):
+    """Start a background refresh task on the running loop, with the same limits as the executor"""
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        if len(_refreshing) >= _refresh_max_pending:
+            _refresh_stats['skipped'] += 1
+            return
+        _refreshing.add(key)
+        _refresh_stats['scheduled'] += 1
+
+    # Keep a reference so the task is not garbage collected before it finishes
+    task = asyncio.get_running_loop().create_task(_refresh_async(key, compute, max_age, stale_ttl, upstream))
+    _async_refresh_tasks.add(task)
+    task.add_done_callback(_async_refresh_tasks.discard)
+
+async def _refresh_async(key, compute, max_age, stale_ttl, upstream=None):
+    start = time.time()
+    try:
+        await _compute_single_flight_async(key, compute, max_age, stale_ttl, upstream)
+        outcome = 'completed'
+    except UpstreamUnavailableError:
+        outcome = 'skipped'
+    except Exception as e:
+        print(f"Error refreshing cache entry {key}: {str(e)}")
+        outcome = 'failed'
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+    with _refresh_lock:
+        _refresh_stats[outcome] += 1
+        # Skipped refreshes never ran compute, so they are left out of the average
+        if outcome != 'skipped':
+            _refresh_stats['totalSeconds'] += time.time() - start
+
+def get_refresh_stats():
+    """
+    Get statistics about background refreshes of stale entries
+
+    Returns:
+        Dictionary with refresh counters
+    """
+    with _refresh_lock:
+        stats = dict(_refresh_stats)
+        stats['inProgress'] = len(_refreshing)
+    finished = stats['completed'] + stats['failed']
+    stats['averageSeconds'] = stats['totalSeconds'] / finished if finished else 0
+    return stats
 
 def clear_cache(key_prefix=None):
     """
     Clear cache entries
-    
+
     Args:
         key_prefix: If provided, only clear entries that start with this prefix
     """
-    if key_prefix is None:
-        cache.clear()
-    else:
-        keys_to_remove = [k for k in cache.keys() if k.startswith(key_prefix)]
-        for key in keys_to_remove:
-            del cache[key]
+    cache.clear(key_prefix)
+    if disk_cache is not None:
+        disk_cache.clear(key_prefix)
 
 def get_cache_stats():
     """
     Get statistics about the cache
-    
+
     Returns:
-        Dictionary with cache statistics
+        Dictionary with backend totals, per key family counters, background
+        refresh counters and, if enabled, disk tier statistics
     """
-    return {
-        'size': len(cache),
-        'keys': list(cache.keys())
-    }
\ No newline at end of file
+    stats = cache.stats()
+    stats['size'] = stats['entries']
+    stats['families'] = metrics.snapshot()
+    stats['refresh'] = get_refresh_stats()
+    stats['upstreamFailures'] = negative_cache.stats()
+    if disk_cache is not None:
+        stats['disk'] = disk_cache.stats()
+    return stats
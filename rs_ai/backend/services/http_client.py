@@ -0,0 +1,207 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from .upstream_replay import upstream_url
+
+# Methods that are safe to retry automatically
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Status codes worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Timeouts (connect, read) in seconds
+DEFAULT_TIMEOUT = (
+    float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5)),
+    float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+)
+LLM_TIMEOUT = (
+    float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5)),
+    float(os.environ.get('LLM_READ_TIMEOUT', 120))
+)
+
+
+class HttpClient:
+    """
+    Shared HTTP client for all upstream services
+
+    Wraps one requests.Session so connections are kept alive and pooled per
+    host. Every request gets connect/read timeouts. Idempotent requests are
+    retried on connection errors, timeouts and retryable status codes with
+    exponential backoff and full jitter. Per-host counters and connection
+    pool state are available from stats().
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=20, timeout=DEFAULT_TIMEOUT,
+                 retries=2, backoff=0.5, max_backoff=8):
+        """
+        Args:
+            pool_connections: Number of per-host pools to keep
+            pool_maxsize: Maximum connections kept per host
+            timeout: Default (connect, read) timeout in seconds
+            retries: Retries for idempotent requests
+            backoff: Base backoff in seconds
+            max_backoff: Upper bound on a single backoff sleep
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, retry=None, **kwargs):
+        """
+        Send a request through the shared session
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            retry: Whether to retry; defaults to True for idempotent methods
+            kwargs: Passed to requests.Session.request; timeout defaults to
+                the client timeout
+
+        Returns:
+            requests.Response (the last one if retries were exhausted)
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).netloc
+        url = upstream_url(url)
+        attempts = 1 + (self.retries if retry else 0)
+
+        for attempt in range(attempts):
+            start = time.time()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, time.time() - start, error=True)
+                if attempt + 1 >= attempts:
+                    raise
+                self._record_retry(host)
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self._record(host, time.time() - start, status=response.status_code)
+            if response.status_code not in RETRY_STATUS_CODES or attempt + 1 >= attempts:
+                return response
+
+            self._record_retry(host)
+            time.sleep(self._backoff(attempt, response.headers.get('Retry-After')))
+
+    def stats(self):
+        """
+        Get per-host request counters and connection pool state
+
+        Returns:
+            Dictionary of host to statistics
+        """
+        with self._lock:
+            stats = {host: dict(counters) for host, counters in self._hosts.items()}
+
+        for counters in stats.values():
+            counters['averageSeconds'] = round(counters['totalSeconds'] / counters['requests'], 4) if counters['requests'] else 0
+            counters['totalSeconds'] = round(counters['totalSeconds'], 3)
+
+        pools = self.adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            counters = stats.setdefault(host, {})
+            # The pool queue is pre-filled with None placeholders; only real
+            # connections count as idle
+            idle = [conn for conn in list(pool.pool.queue) if conn is not None] if pool.pool is not None else []
+            counters['pool'] = {
+                'connectionsOpened': pool.num_connections,
+                'requestsSent': pool.num_requests,
+                'idleConnections': len(idle),
+                'maxSize': pool.pool.maxsize if pool.pool is not None else 0
+            }
+        return stats
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _counters(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = {'requests': 0, 'errors': 0, 'retries': 0, 'totalSeconds': 0.0}
+        return self._hosts[host]
+
+    def _record(self, host, seconds, status=None, error=False):
+        with self._lock:
+            counters = self._counters(host)
+            counters['requests'] += 1
+            counters['totalSeconds'] += seconds
+            if error or (status is not None and status >= 500):
+                counters['errors'] += 1
+
+    def _record_retry(self, host):
+        with self._lock:
+            self._counters(host)['retries'] += 1
+
+
+# Shared client used by every service module
+http = HttpClient(
+    pool_maxsize=int(os.environ.get('HTTP_POOL_MAXSIZE', 20)),
+    retries=int(os.environ.get('HTTP_RETRIES', 2))
+)
+
+_mistral_client = None
+_mistral_lock = threading.Lock()
+
+def get_mistral_client():
+    """
+    Get the shared Mistral AI client
+
+    Created on first use with the configured timeout, so every module reuses
+    the same connection pool.
+
+    Returns:
+        MistralClient
+    """
+    global _mistral_client
+    if _mistral_client is None:
+        with _mistral_lock:
+            if _mistral_client is None:
+                from mistralai.client import MistralClient
+                _mistral_client = MistralClient(
+                    api_key=os.environ.get('MISTRAL_API_KEY'),
+                    endpoint=upstream_url(os.environ.get('MISTRAL_ENDPOINT', 'https://api.mistral.ai')),
+                    # Chat completions are billed POSTs, so never retried
+                    max_retries=0,
+                    timeout=int(LLM_TIMEOUT[1])
+                )
+    return _mistral_client
+
+def get_http_stats():
+    """
+    Get statistics for the shared HTTP client
+
+    Returns:
+        Dictionary of host to request counters and pool state
+    """
+    return http.stats()
@@ -0,0 +1,340 @@
+import os
+import threading
+import time
+import numpy as np
+from .http_client import http
+
+# Base URL for World Bank API
+BASE_URL = "https://api.worldbank.org/v2"
+
+
+class IndicatorMatrix:
+    """
+    All-country indicator values held as NumPy country x year matrices
+
+    Region and global means and global ranks are precomputed for every
+    indicator and year when the matrix is built, so lookups for a single
+    country are O(1) index operations.
+    """
+
+    def __init__(self, countries, years, values):
+        """
+        Args:
+            countries: List of dicts with code, region and incomeLevel
+            years: List of years (columns), ascending
+            values: Dictionary of indicator code to a float array of shape
+                (len(countries), len(years)) with NaN for missing values
+        """
+        self.country_codes = [c["code"] for c in countries]
+        self.country_index = {code: i for i, code in enumerate(self.country_codes)}
+        self.years = np.asarray(years, dtype=np.int32)
+        self.values = values
+        self.built_at = time.time()
+        self.version = None
+
+        self.region_names, self.region_ids = np.unique(
+            [c.get("region") or "Unknown" for c in countries], return_inverse=True
+        )
+        self.income_names, self.income_ids = np.unique(
+            [c.get("incomeLevel") or "Unknown" for c in countries], return_inverse=True
+        )
+
+        self.region_means = {}
+        self.income_means = {}
+        self.global_means = {}
+        self.ranks = {}
+        for indicator, matrix in values.items():
+            self.region_means[indicator] = group_means(matrix, self.region_ids, len(self.region_names))
+            self.income_means[indicator] = group_means(matrix, self.income_ids, len(self.income_names))
+            self.global_means[indicator] = group_means(matrix, np.zeros(len(countries), dtype=np.intp), 1)[0]
+            self.ranks[indicator] = column_ranks(matrix)
+
+    def compare(self, country_code, indicator, year=None):
+        """
+        Compare a country with its region, income group and the world
+
+        Args:
+            country_code: ISO3 country code
+            indicator: World Bank indicator code
+            year: Year to compare (default: the country's most recent value)
+
+        Returns:
+            Dictionary with the year, country, region, income group and
+            global values and the country's global rank, or None if the
+            country or indicator is not in the matrix
+        """
+        row = self.country_index.get(country_code)
+        if row is None or indicator not in self.values:
+            return None
+
+        country_values = self.values[indicator][row]
+        if year is None:
+            present = np.flatnonzero(~np.isnan(country_values))
+            if present.size == 0:
+                return None
+            column = present[-1]
+        else:
+            matches = np.flatnonzero(self.years == int(year))
+            if matches.size == 0:
+                return None
+            column = matches[0]
+
+        region = self.region_ids[row]
+        income = self.income_ids[row]
+        rank = int(self.ranks[indicator][row, column])
+        return {
+            "year": str(self.years[column]),
+            "value": as_float(country_values[column]),
+            "region": str(self.region_names[region]),
+            "regionValue": as_float(self.region_means[indicator][region, column]),
+            "incomeLevel": str(self.income_names[income]),
+            "incomeLevelValue": as_float(self.income_means[indicator][income, column]),
+            "globalValue": as_float(self.global_means[indicator][column]),
+            "globalRank": rank or None,
+            "rankedCountries": int(np.count_nonzero(~np.isnan(self.values[indicator][:, column])))
+        }
+
+    def save(self, path):
+        """Save the raw matrix to an .npz file"""
+        np.savez_compressed(
+            path,
+            country_codes=np.asarray(self.country_codes),
+            regions=self.region_names[self.region_ids],
+            income_levels=self.income_names[self.income_ids],
+            years=self.years,
+            indicators=np.asarray(list(self.values.keys())),
+            values=np.stack(list(self.values.values())) if self.values else np.empty((0, 0, 0)),
+            built_at=np.asarray(self.built_at),
+            version=np.asarray(self.version or "")
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a matrix saved with save()"""
+        with np.load(path, allow_pickle=False) as data:
+            countries = [
+                {"code": str(code), "region": str(region), "incomeLevel": str(income)}
+                for code, region, income in zip(data["country_codes"], data["regions"], data["income_levels"])
+            ]
+            values = {str(indicator): data["values"][i] for i, indicator in enumerate(data["indicators"])}
+            matrix = cls(countries, data["years"].tolist(), values)
+            matrix.built_at = float(data["built_at"])
+            if "version" in data.files:
+                matrix.version = str(data["version"]) or None
+        return matrix
+
+
+def as_float(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def group_means(matrix, group_ids, group_count):
+    """
+    Compute per-group column means ignoring NaN
+
+    Args:
+        matrix: Array of shape (countries, years)
+        group_ids: Group index of every country
+        group_count: Number of groups
+
+    Returns:
+        Array of shape (group_count, years) with NaN for groups without data
+    """
+    present = ~np.isnan(matrix)
+    membership = np.zeros((group_count, matrix.shape[0]))
+    membership[group_ids, np.arange(matrix.shape[0])] = 1
+    sums = membership @ np.where(present, matrix, 0.0)
+    counts = membership @ present
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def column_ranks(matrix):
+    """
+    Rank every column in descending order, 1 being the highest value
+
+    Args:
+        matrix: Array of shape (countries, years)
+
+    Returns:
+        Integer array of the same shape with 0 where the value is missing
+    """
+    present = ~np.isnan(matrix)
+    order = np.argsort(np.where(present, -matrix, np.inf), axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    positions = np.broadcast_to(np.arange(1, matrix.shape[0] + 1)[:, None], order.shape)
+    np.put_along_axis(ranks, order, positions, axis=0)
+    return np.where(present, ranks, 0)
+
+
+def fetch_country_metadata():
+    """
+    Fetch region and income group for every non-aggregate country
+
+    Returns:
+        List of dicts with code, region and incomeLevel
+    """
+    response = http.get(f"{BASE_URL}/country", params={"format": "json", "per_page": 400})
+    response.raise_for_status()
+
+    countries = []
+    for country in response.json()[1]:
+        region = country.get("region", {}).get("value")
+        if region == "Aggregates":
+            continue
+        countries.append({
+            "code": country.get("id"),
+            "region": region,
+            "incomeLevel": country.get("incomeLevel", {}).get("value")
+        })
+    return countries
+
+
+def fetch_all_countries_indicator(indicator, start_year, end_year):
+    """
+    Download one indicator for all countries in bulk
+
+    Args:
+        indicator: World Bank indicator code
+        start_year: First year
+        end_year: Last year
+
+    Returns:
+        List of (ISO3 code, year, value) tuples for non-missing values
+    """
+    rows = []
+    page = 1
+    pages = 1
+    while page <= pages:
+        response = http.get(
+            f"{BASE_URL}/country/all/indicator/{indicator}",
+            params={
+                "format": "json",
+                "date": f"{start_year}:{end_year}",
+                "per_page": 20000,
+                "page": page
+            }
+        )
+        response.raise_for_status()
+
+        data = response.json()
+        pages = data[0].get("pages", 1)
+        for entry in data[1] or []:
+            if entry.get("value") is not None:
+                rows.append((entry.get("countryiso3code"), int(entry.get("date")), float(entry.get("value"))))
+        page += 1
+    return rows
+
+
+def build_indicator_matrix(indicators, start_year=2000, end_year=2023):
+    """
+    Download indicators for all countries and build an IndicatorMatrix
+
+    Args:
+        indicators: World Bank indicator codes
+        start_year: First year
+        end_year: Last year
+
+    Returns:
+        IndicatorMatrix
+    """
+    countries = fetch_country_metadata()
+    country_index = {c["code"]: i for i, c in enumerate(countries)}
+    years = list(range(start_year, end_year + 1))
+
+    values = {}
+    for indicator in indicators:
+        matrix = np.full((len(countries), len(years)), np.nan)
+        rows = [r for r in fetch_all_countries_indicator(indicator, start_year, end_year) if r[0] in country_index]
+        if rows:
+            codes, row_years, row_values = zip(*rows)
+            matrix[[country_index[c] for c in codes], np.asarray(row_years) - start_year] = row_values
+        values[indicator] = matrix
+
+    return IndicatorMatrix(countries, years, values)
+
+
+class IndicatorMatrixRefresher:
+    """
+    Keeps an IndicatorMatrix up to date in a background thread
+
+    The current matrix is replaced atomically after each successful rebuild.
+    If a snapshot path is given, the matrix is loaded from it at start (so
+    lookups work before the first download finishes) and saved after every
+    rebuild. If a version callable is given, a rebuild is skipped while the
+    version it returns matches the one the current matrix was built from.
+    """
+
+    def __init__(self, indicators, interval=86400, snapshot_path=None, builder=build_indicator_matrix, version=None):
+        """
+        Args:
+            indicators: World Bank indicator codes to download
+            interval: Seconds between rebuilds
+            snapshot_path: Optional .npz file used to start warm
+            builder: Callable building an IndicatorMatrix from a list of
+                indicator codes (default: download from the API)
+            version: Optional callable returning the current data version,
+                such as the source's last update date, or None if unknown
+        """
+        self.indicators = list(indicators)
+        self.interval = interval
+        self.snapshot_path = snapshot_path
+        self.builder = builder
+        self.version = version
+        self.matrix = None
+        self.last_error = None
+
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Load the snapshot if present and start the background thread"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            if self.snapshot_path and os.path.exists(self.snapshot_path) and self.matrix is None:
+                try:
+                    self.matrix = IndicatorMatrix.load(self.snapshot_path)
+                except Exception as e:
+                    print(f"Error loading indicator matrix snapshot: {str(e)}")
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='indicator-matrix', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def refresh(self):
+        """Rebuild the matrix now, unless the data version is unchanged"""
+        version = self.version() if self.version else None
+        if version and self.matrix is not None and self.matrix.version == version:
+            self.matrix.built_at = time.time()
+            matrix = self.matrix
+        else:
+            matrix = self.builder(self.indicators)
+            matrix.version = version
+        self.matrix = matrix
+        self.last_error = None
+        if self.snapshot_path:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            matrix.save(self.snapshot_path)
+
+    def _run(self):
+        # Skip the first download if the snapshot is still fresh
+        if self.matrix is not None:
+            wait = max(0, self.matrix.built_at + self.interval - time.time())
+        else:
+            wait = 0
+
+        while not self._stop_event.wait(wait):
+            try:
+                self.refresh()
+                wait = self.interval
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error building indicator matrix: {str(e)}")
+                # Retry sooner after a failure
+                wait = min(self.interval, 300)
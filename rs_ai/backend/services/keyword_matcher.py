@@ -0,0 +1,48 @@
+import re
+
+
+class KeywordMatcher:
+    """
+    Finds many keywords in a text in a single scan
+
+    All keywords are compiled into one alternation regex. A keyword matches
+    at the start of a word and may be followed by more word characters, so
+    "risk" matches "risks" and "risky" but not "brisk", and "fail" still
+    matches "failed" and "failure".
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords: Iterable of lowercase keywords
+        """
+        self.keywords = list(dict.fromkeys(keywords))
+        # Longest first so a keyword never shadows a longer one it prefixes
+        alternation = '|'.join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b({alternation})\w*", re.IGNORECASE)
+
+    def find(self, text):
+        """
+        Get the keywords present in a text
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Set of matched keywords
+        """
+        if not text:
+            return set()
+        return {match.group(1).lower() for match in self.pattern.finditer(text)}
+
+    def find_all(self, texts):
+        """
+        Get the keywords present in each of many texts
+
+        Args:
+            texts: Iterable of texts
+
+        Returns:
+            List of sets of matched keywords, one per text
+        """
+        return [self.find(text) for text in texts]
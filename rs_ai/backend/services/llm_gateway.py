@@ -0,0 +1,489 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from mistralai.models.chat_completion import ChatMessage
+from . import async_http_client
+from .async_http_client import get_async_http
+from .http_client import http, get_mistral_client, LLM_TIMEOUT
+from .prompt_budget import log_completion
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Per-model limits; LLM_LIMITS may override them per model as JSON, e.g.
+# {"mistral-small-3.1-24b-instruct:free": {"ratePerMinute": 60, "maxInFlight": 8}}
+DEFAULT_LIMITS = {
+    'ratePerMinute': float(os.environ.get('LLM_RATE_PER_MINUTE', 20)),
+    'burst': int(os.environ.get('LLM_BURST', 5)),
+    'maxInFlight': int(os.environ.get('LLM_MAX_IN_FLIGHT', 4)),
+    'queueTimeout': float(os.environ.get('LLM_QUEUE_TIMEOUT', 10)),
+    'breakerFailures': int(os.environ.get('LLM_BREAKER_FAILURES', 5)),
+    'breakerReset': float(os.environ.get('LLM_BREAKER_RESET', 60))
+}
+
+# Latency samples kept per model for percentiles
+LATENCY_SAMPLES = 200
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised instead of calling a model that is rate limited, saturated or failing
+
+    Callers must let it reach get_or_compute rather than caching a fallback in
+    its place. retry_after caps the negative cache backoff, so the key is
+    retried as soon as the gate could admit a call again.
+    """
+
+    def __init__(self, model, reason, retry_after=0):
+        super().__init__(f"LLM {model} unavailable: {reason}")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows rate calls per second on average, with bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Take a token if one is available
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a model after consecutive failures
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds. Then a single trial call is let
+    through (half-open): its success closes the circuit, its failure opens
+    it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a trial call through"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def is_open(self):
+        """Check whether calls are being rejected, without changing state"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.reset_timeout
+            return self.state == self.HALF_OPEN
+
+    def allow(self):
+        """
+        Decide whether a call may proceed
+
+        Returns:
+            True if the circuit is closed or this is the half-open trial call
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def release_trial(self):
+        """Let the next call be the half-open trial again, after one was abandoned"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ModelGate:
+    """Rate limit, concurrency cap, circuit breaker and latency stats of one model"""
+
+    def __init__(self, model, limits):
+        """
+        Args:
+            model: Model name
+            limits: Dictionary with the keys of DEFAULT_LIMITS
+        """
+        self.model = model
+        self.queue_timeout = limits['queueTimeout']
+        self.max_in_flight = limits['maxInFlight']
+        self.bucket = TokenBucket(limits['ratePerMinute'] / 60, limits['burst'])
+        self.breaker = CircuitBreaker(limits['breakerFailures'], limits['breakerReset'])
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {
+            'calls': 0, 'failures': 0, 'inFlight': 0, 'totalSeconds': 0.0,
+            'rejected': {'circuitOpen': 0, 'rateLimited': 0, 'inFlight': 0}
+        }
+
+    def enter(self):
+        """
+        Wait for a call slot
+
+        Returns:
+            Start time, to pass to exit
+
+        Raises:
+            LLMUnavailableError: If the circuit is open, or no rate token or
+                in-flight slot becomes available within queue_timeout
+        """
+        if self.breaker.is_open():
+            self._reject('circuitOpen', self.breaker.retry_after())
+        deadline = time.monotonic() + self.queue_timeout
+
+        while True:
+            wait = self.bucket.try_acquire()
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                self._reject('rateLimited', wait)
+            time.sleep(wait)
+
+        if not self._slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            self._reject('inFlight')
+        return self._admit()
+
+    async def enter_async(self):
+        """Asyncio version of enter, waiting without blocking the event loop"""
+        if self.breaker.is_open():
+            self._reject('circuitOpen', self.breaker.retry_after())
+        deadline = time.monotonic() + self.queue_timeout
+
+        while True:
+            wait = self.bucket.try_acquire()
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                self._reject('rateLimited', wait)
+            await asyncio.sleep(wait)
+
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject('inFlight')
+            await asyncio.sleep(0.05)
+        return self._admit()
+
+    def exit(self, start, error=None, abandoned=False):
+        """
+        Release the call slot and record the outcome
+
+        Args:
+            start: Value returned by enter
+            error: Exception raised by the call, if any
+            abandoned: The caller gave up on the call, so its outcome says
+                nothing about the model
+        """
+        elapsed = time.time() - start
+        self._slots.release()
+        if abandoned:
+            self.breaker.release_trial()
+        elif error is None:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        with self._lock:
+            self._counters['inFlight'] -= 1
+            self._counters['totalSeconds'] += elapsed
+            self._latencies.append(elapsed)
+            if error is not None:
+                self._counters['failures'] += 1
+
+    def stats(self):
+        """
+        Get call counters and latency percentiles
+
+        Returns:
+            Dictionary of statistics
+        """
+        with self._lock:
+            stats = dict(self._counters, rejected=dict(self._counters['rejected']))
+            latencies = sorted(self._latencies)
+        stats['circuit'] = self.breaker.state
+        stats['maxInFlight'] = self.max_in_flight
+        stats['averageSeconds'] = round(stats['totalSeconds'] / stats['calls'], 4) if stats['calls'] else 0
+        stats['p50Seconds'] = round(latencies[len(latencies) // 2], 4) if latencies else 0
+        stats['p95Seconds'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4) if latencies else 0
+        stats['totalSeconds'] = round(stats['totalSeconds'], 3)
+        return stats
+
+    def _admit(self):
+        # The breaker may have opened while waiting, or only allow one trial
+        if not self.breaker.allow():
+            self._slots.release()
+            self._reject('circuitOpen', self.breaker.retry_after())
+        with self._lock:
+            self._counters['calls'] += 1
+            self._counters['inFlight'] += 1
+        return time.time()
+
+    def _reject(self, reason, retry_after=0):
+        with self._lock:
+            self._counters['rejected'][reason] += 1
+        raise LLMUnavailableError(self.model, {
+            'circuitOpen': "circuit open after repeated failures",
+            'rateLimited': "rate limit reached",
+            'inFlight': "too many calls in flight"
+        }[reason], retry_after)
+
+
+class LLMGateway:
+    """
+    Single path for every LLM call
+
+    Each model gets its own ModelGate, so a burst against one endpoint is
+    throttled before it can use up the model's quota for the others, and a
+    failing model is skipped quickly so callers fall back at once.
+    """
+
+    def __init__(self, limits=None):
+        """
+        Args:
+            limits: Dictionary of model name to overrides of DEFAULT_LIMITS
+        """
+        self.limits = limits or {}
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def gate(self, model):
+        with self._lock:
+            if model not in self._gates:
+                self._gates[model] = ModelGate(model, {**DEFAULT_LIMITS, **self.limits.get(model, {})})
+            return self._gates[model]
+
+    def call(self, model, function):
+        """
+        Run a blocking LLM call under the model's limits
+
+        Args:
+            model: Model name
+            function: Zero-argument callable making the call
+
+        Returns:
+            Result of function
+
+        Raises:
+            LLMUnavailableError: If the call was rejected
+        """
+        gate = self.gate(model)
+        start = gate.enter()
+        try:
+            result = function()
+        except Exception as e:
+            gate.exit(start, e)
+            raise
+        gate.exit(start)
+        return result
+
+    async def call_async(self, model, function):
+        """Asyncio version of call; function is a coroutine function"""
+        gate = self.gate(model)
+        start = await gate.enter_async()
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            gate.exit(start, abandoned=True)
+            raise
+        except Exception as e:
+            gate.exit(start, e)
+            raise
+        gate.exit(start)
+        return result
+
+    def stream(self, model, function):
+        """
+        Run a streaming LLM call under the model's limits
+
+        The in-flight slot is held until the stream is exhausted or closed.
+
+        Args:
+            model: Model name
+            function: Zero-argument callable returning an iterator of chunks
+
+        Yields:
+            Chunks of the stream
+        """
+        gate = self.gate(model)
+        start = gate.enter()
+        try:
+            yield from function()
+        except Exception as e:
+            gate.exit(start, e)
+            raise
+        except GeneratorExit:
+            # Closed early by the consumer
+            gate.exit(start, abandoned=True)
+            raise
+        gate.exit(start)
+
+    def stats(self):
+        """
+        Get statistics for every model used so far
+
+        Returns:
+            Dictionary of model name to statistics
+        """
+        with self._lock:
+            gates = list(self._gates.items())
+        return {model: gate.stats() for model, gate in gates}
+
+
+def load_limits():
+    """Read per-model limit overrides from LLM_LIMITS"""
+    try:
+        return json.loads(os.environ.get('LLM_LIMITS') or '{}')
+    except json.JSONDecodeError as e:
+        print(f"Error parsing LLM_LIMITS: {str(e)}")
+        return {}
+
+gateway = LLMGateway(load_limits())
+
+
+def mistral_chat(prompt, model, endpoint):
+    """
+    Send a single-message chat completion to Mistral AI through the gateway
+
+    Args:
+        prompt: User message
+        model: Model name
+        endpoint: Endpoint name for the token log
+
+    Returns:
+        Content of the first choice
+    """
+    def call():
+        start = time.time()
+        chat_response = get_mistral_client().chat(
+            model=model,
+            messages=[ChatMessage(role="user", content=prompt)]
+        )
+        content = chat_response.choices[0].message.content
+        log_completion(endpoint, model, prompt, content, chat_response.usage, time.time() - start)
+        return content
+
+    return gateway.call(model, call)
+
+def mistral_chat_stream(prompt, model):
+    """
+    Stream a single-message chat completion from Mistral AI through the gateway
+
+    Args:
+        prompt: User message
+        model: Model name
+
+    Yields:
+        ChatCompletionStreamResponse chunks
+    """
+    return gateway.stream(model, lambda: get_mistral_client().chat_stream(
+        model=model,
+        messages=[ChatMessage(role="user", content=prompt)]
+    ))
+
+async def mistral_chat_async(prompt, model, endpoint):
+    """Asyncio version of mistral_chat"""
+    return await gateway.call_async(model, lambda: async_http_client.mistral_chat_async(prompt, model, endpoint))
+
+def openrouter_headers():
+    return {
+        "Authorization": f"Bearer {os.environ.get('OPENROUTER_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+def raise_for_overload(response):
+    """Treat rate limiting and server errors as failures of the model"""
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+def openrouter_chat(body):
+    """
+    Post a chat completion request to OpenRouter through the gateway
+
+    Args:
+        body: Request body, including the model
+
+    Returns:
+        requests.Response for any status other than 429 and 5xx
+    """
+    return gateway.call(body["model"], lambda: raise_for_overload(
+        http.post(OPENROUTER_URL, headers=openrouter_headers(), json=body, timeout=LLM_TIMEOUT)
+    ))
+
+async def openrouter_chat_async(body):
+    """Asyncio version of openrouter_chat, returning an httpx.Response"""
+    async def call():
+        return raise_for_overload(await get_async_http().post(
+            OPENROUTER_URL,
+            "openrouter",
+            headers=openrouter_headers(),
+            json=body,
+            timeout=LLM_TIMEOUT
+        ))
+
+    return await gateway.call_async(body["model"], call)
+
+def get_llm_stats():
+    """
+    Get per-model gateway statistics
+
+    Returns:
+        Dictionary of model name to call counters, latency and circuit state
+    """
+    return gateway.stats()
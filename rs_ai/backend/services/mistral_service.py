@@ -1,12 +1,14 @@
-import os
 import json
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
-from .cache_service import get_cached_data, set_cached_data
-
-# Initialize Mistral AI client
-mistral_api_key = os.environ.get('MISTRAL_API_KEY')
-mistral_client = MistralClient(api_key=mistral_api_key)
+import threading
+import time
+from collections import namedtuple
+from .cache_negative import UpstreamUnavailableError
+from .cache_service import negative_cache
+from .llm_gateway import mistral_chat, mistral_chat_async, mistral_chat_stream
+from .news_service import select_context_articles
+from .prompt_budget import MAX_QUERY_TOKENS, count_tokens, fit_items, log_completion, prompt_budget, prompt_query, rank_items
+from .prompt_cache import get_or_complete, get_or_complete_async, lookup_completion, normalize_query, prompt_key, set_cached_completion
+from .streaming import JsonFieldStream, StreamBroadcast
 
 # Use the specified model
 MISTRAL_MODEL = "mistral-small-3.1-24b-instruct:free"
@@ -24,32 +26,91 @@ def get_mistral_insights(country_code, query, news_articles=None, economic_indic
     Returns:
         AI insights
     """
-    cache_key = f"ai_insights_{country_code}_{query}"
-    cached_data = get_cached_data(cache_key, 3600)  # Cache for 1 hour
-    
-    if cached_data:
-        return cached_data
-    
     try:
-        # Prepare context data
-        context = f"Country: {country_code}\nQuery: {query}\n\n"
-        
-        # Add economic data if available
-        if economic_indicators:
-            context += "Economic Indicators:\n"
-            for indicator in economic_indicators:
-                context += f"- {indicator['indicator']}: {indicator['value']} ({indicator['year']})\n"
-            context += "\n"
-        
-        # Add news data if available
-        if news_articles:
-            context += "Recent News Headlines:\n"
-            for i, article in enumerate(news_articles[:5]):  # Limit to 5 articles
-                context += f"- {article['title']} ({article['source']})\n"
-            context += "\n"
+        prompt, fingerprint = build_insights_prompt(country_code, query, news_articles, economic_indicators)
+        return get_or_complete(
+            "ai_insights_",
+            prompt,
+            MISTRAL_MODEL,
+            generate_mistral_insights,
+            3600,  # Cache for 1 hour
+            stale_ttl=3600,  # Serve stale for another hour while refreshing
+            upstream="mistral",
+            fingerprint=fingerprint
+        )
+    except Exception as e:
+        print(f"Error getting AI insights: {str(e)}")
+        return create_fallback_insights("Unable to generate AI insights at this time.")
+
+def generate_mistral_insights(prompt):
+    """
+    Generate AI insights about a country with Mistral AI
+    
+    Args:
+        prompt: Prompt built by build_insights_prompt
         
-        # Prepare the prompt
-        prompt = f"""
+    Returns:
+        AI insights
+    """
+    # Call Mistral AI API
+    return parse_insights(mistral_chat(prompt, MISTRAL_MODEL, "insights"))
+
+def build_insights_prompt(country_code, query, news_articles=None, economic_indicators=None):
+    """
+    Build the Mistral AI prompt for country insights
+    
+    Indicators and headlines are ranked by relevance to the query, and the
+    least relevant are cut first to keep the prompt within its budget.
+    
+    Returns:
+        (prompt, fingerprint): the prompt with the user's query, and the
+        same prompt with the normalized query, for the cache key
+    """
+    query = prompt_query(query)
+    
+    indicator_lines = [
+        f"- {indicator['indicator']}: {indicator['value']} ({indicator['year']})"
+        for indicator in economic_indicators or []
+    ]
+    
+    # Add the news most relevant to the query
+    news_articles = select_context_articles(country_code, query, news_articles, limit=5)
+    headline_lines = [f"- {article['title']} ({article['source']})" for article in news_articles or []]
+    
+    fitted = fit_items(
+        rank_items(indicator_lines + headline_lines, query),
+        # Budget left after the prompt text and the section headings
+        prompt_budget("insights") - count_tokens(render_insights_prompt(
+            country_code, query, [""] if indicator_lines else [], [""] if headline_lines else []
+        ))
+    )
+    kept_indicators = [line for line in fitted[:len(indicator_lines)] if line is not None]
+    kept_headlines = [line for line in fitted[len(indicator_lines):] if line is not None]
+    return (
+        render_insights_prompt(country_code, query, kept_indicators, kept_headlines),
+        render_insights_prompt(country_code, normalize_query(query), kept_indicators, kept_headlines)
+    )
+
+def render_insights_prompt(country_code, query, indicator_lines, headline_lines):
+    """Render the country insights prompt around the given context lines"""
+    # Prepare context data
+    context = f"Country: {country_code}\nQuery: {query}\n\n"
+    
+    # Add economic data if available
+    if indicator_lines:
+        context += "Economic Indicators:\n"
+        for line in indicator_lines:
+            context += f"{line}\n"
+        context += "\n"
+    
+    if headline_lines:
+        context += "Recent News Headlines:\n"
+        for line in headline_lines:
+            context += f"{line}\n"
+        context += "\n"
+    
+    # Prepare the prompt
+    prompt = f"""
 You are an expert investment advisor. Based on the following information:
 
 {context}
@@ -67,46 +128,38 @@ Format your response as JSON with the following structure:
   ]
 }}
 """
+    
+    return prompt
+
+def parse_insights(response_content):
+    """Parse the Mistral AI response for country insights"""
+    try:
+        # Try to parse as JSON
+        insights = json.loads(response_content)
+    except json.JSONDecodeError:
+        # Fallback if response is not valid JSON
+        insights = create_fallback_insights(response_content)
+    
+    return insights
+
+def create_fallback_insights(analysis):
+    """
+    Create insights with default follow-up questions
+    
+    Args:
+        analysis: Analysis text
         
-        # Call Mistral AI API
-        chat_response = mistral_client.chat(
-            model=MISTRAL_MODEL,
-            messages=[
-                ChatMessage(role="user", content=prompt)
-            ]
-        )
-        
-        # Parse the response
-        response_content = chat_response.choices[0].message.content
-        
-        try:
-            # Try to parse as JSON
-            insights = json.loads(response_content)
-        except json.JSONDecodeError:
-            # Fallback if response is not valid JSON
-            insights = {
-                "analysis": response_content,
-                "followUpQuestions": [
-                    {"question": "What sectors are showing the strongest growth?"},
-                    {"question": "How has the regulatory environment changed in the past year?"},
-                    {"question": "What is the projected GDP growth for next year?"}
-                ]
-            }
-        
-        # Cache the result
-        set_cached_data(cache_key, insights, 3600)  # Cache for 1 hour
-        
-        return insights
-    except Exception as e:
-        print(f"Error getting AI insights: {str(e)}")
-        return {
-            "analysis": "Unable to generate AI insights at this time.",
-            "followUpQuestions": [
-                {"question": "What sectors are showing the strongest growth?"},
-                {"question": "How has the regulatory environment changed in the past year?"},
-                {"question": "What is the projected GDP growth for next year?"}
-            ]
-        }
+    Returns:
+        AI insights
+    """
+    return {
+        "analysis": analysis,
+        "followUpQuestions": [
+            {"question": "What sectors are showing the strongest growth?"},
+            {"question": "How has the regulatory environment changed in the past year?"},
+            {"question": "What is the projected GDP growth for next year?"}
+        ]
+    }
 
 def get_p3_recommendations(country_code, query):
     """
@@ -119,15 +172,50 @@ def get_p3_recommendations(country_code, query):
     Returns:
         P3 recommendations
     """
-    cache_key = f"p3_{country_code}_{query}"
-    cached_data = get_cached_data(cache_key, 3600)  # Cache for 1 hour
+    try:
+        prompt, fingerprint = build_p3_prompt(country_code, query)
+        return get_or_complete(
+            "p3_",
+            prompt,
+            MISTRAL_MODEL,
+            generate_p3_recommendations,
+            3600,  # Cache for 1 hour
+            stale_ttl=3600,  # Serve stale for another hour while refreshing
+            upstream="mistral",
+            fingerprint=fingerprint
+        )
+    except Exception as e:
+        print(f"Error getting P3 recommendations: {str(e)}")
+        return create_fallback_p3()
+
+def generate_p3_recommendations(prompt):
+    """
+    Generate P3 (Predict, Prevent, Protect) recommendations with Mistral AI
     
-    if cached_data:
-        return cached_data
+    Args:
+        prompt: Prompt built by build_p3_prompt
+        
+    Returns:
+        P3 recommendations
+    """
+    # Call Mistral AI API
+    return parse_p3(mistral_chat(prompt, MISTRAL_MODEL, "p3"))
+
+def build_p3_prompt(country_code, query):
+    """
+    Build the Mistral AI prompt for P3 recommendations, cutting the query to the budget
     
-    try:
-        # Prepare the prompt
-        prompt = f"""
+    Returns:
+        (prompt, fingerprint), as build_insights_prompt
+    """
+    query_budget = prompt_budget("p3") - count_tokens(render_p3_prompt(country_code, ""))
+    query = prompt_query(query, max(0, min(MAX_QUERY_TOKENS, query_budget)))
+    return render_p3_prompt(country_code, query), render_p3_prompt(country_code, normalize_query(query))
+
+def render_p3_prompt(country_code, query):
+    """Render the P3 prompt for a query"""
+    # Prepare the prompt
+    prompt = f"""
 You are a strategic risk management expert. For the country {country_code} and the query "{query}", 
 provide a comprehensive P3 (Predict, Prevent, Protect) framework analysis.
 
@@ -143,61 +231,263 @@ Format your response as JSON with the following structure:
   "protect": "Detailed protection recommendations here, formatted as a paragraph of at least 150 words"
 }}
 """
+    
+    return prompt
+
+def parse_p3(response_content):
+    """Parse the Mistral AI response for P3 recommendations"""
+    try:
+        # Try to parse as JSON
+        p3_data = json.loads(response_content)
+    except json.JSONDecodeError:
+        # If not valid JSON, try to extract sections from text
+        predict_section = "Unable to generate prediction analysis."
+        prevent_section = "Unable to generate prevention strategies."
+        protect_section = "Unable to generate protection recommendations."
         
-        # Call Mistral AI API
-        chat_response = mistral_client.chat(
-            model=MISTRAL_MODEL,
-            messages=[
-                ChatMessage(role="user", content=prompt)
-            ]
-        )
+        # Simple text parsing (will be imperfect but better than nothing)
+        if "PREDICT" in response_content:
+            predict_start = response_content.find("PREDICT")
+            prevent_start = response_content.find("PREVENT")
+            if prevent_start > predict_start:
+                predict_section = response_content[predict_start:prevent_start].strip()
+                predict_section = predict_section.replace("PREDICT:", "").strip()
         
-        # Parse the response
-        response_content = chat_response.choices[0].message.content
+        if "PREVENT" in response_content:
+            prevent_start = response_content.find("PREVENT")
+            protect_start = response_content.find("PROTECT")
+            if protect_start > prevent_start:
+                prevent_section = response_content[prevent_start:protect_start].strip()
+                prevent_section = prevent_section.replace("PREVENT:", "").strip()
         
-        try:
-            # Try to parse as JSON
-            p3_data = json.loads(response_content)
-        except json.JSONDecodeError:
-            # If not valid JSON, try to extract sections from text
-            predict_section = "Unable to generate prediction analysis."
-            prevent_section = "Unable to generate prevention strategies."
-            protect_section = "Unable to generate protection recommendations."
-            
-            # Simple text parsing (will be imperfect but better than nothing)
-            if "PREDICT" in response_content:
-                predict_start = response_content.find("PREDICT")
-                prevent_start = response_content.find("PREVENT")
-                if prevent_start > predict_start:
-                    predict_section = response_content[predict_start:prevent_start].strip()
-                    predict_section = predict_section.replace("PREDICT:", "").strip()
-            
-            if "PREVENT" in response_content:
-                prevent_start = response_content.find("PREVENT")
-                protect_start = response_content.find("PROTECT")
-                if protect_start > prevent_start:
-                    prevent_section = response_content[prevent_start:protect_start].strip()
-                    prevent_section = prevent_section.replace("PREVENT:", "").strip()
-            
-            if "PROTECT" in response_content:
-                protect_start = response_content.find("PROTECT")
-                protect_section = response_content[protect_start:].strip()
-                protect_section = protect_section.replace("PROTECT:", "").strip()
-            
-            p3_data = {
-                "predict": predict_section,
-                "prevent": prevent_section,
-                "protect": protect_section
-            }
+        if "PROTECT" in response_content:
+            protect_start = response_content.find("PROTECT")
+            protect_section = response_content[protect_start:].strip()
+            protect_section = protect_section.replace("PROTECT:", "").strip()
         
-        # Cache the result
-        set_cached_data(cache_key, p3_data, 3600)  # Cache for 1 hour
+        p3_data = {
+            "predict": predict_section,
+            "prevent": prevent_section,
+            "protect": protect_section
+        }
+    
+    return p3_data
+
+def create_fallback_p3():
+    """
+    Create fallback P3 recommendations if AI fails
+    
+    Returns:
+        P3 recommendations
+    """
+    return {
+        "predict": "Unable to generate prediction analysis at this time.",
+        "prevent": "Unable to generate prevention strategies at this time.",
+        "protect": "Unable to generate protection recommendations at this time."
+    }
+
+def stream_mistral_insights(country_code, query, news_articles=None, economic_indicators=None):
+    """
+    Stream AI insights about a country as they are generated
+    
+    Shares its cache entries with get_mistral_insights.
+    
+    Args:
+        country_code: ISO country code
+        query: User query
+        news_articles: News articles data (optional)
+        economic_indicators: Economic indicators data (optional)
+        
+    Yields:
+        (event, data) pairs, see stream_completion
+    """
+    return stream_completion(
+        "insights",
+        "ai_insights_",
+        *build_insights_prompt(country_code, query, news_articles, economic_indicators),
+        ["analysis"],
+        parse_insights,
+        lambda: create_fallback_insights("Unable to generate AI insights at this time."),
+        3600,
+        stale_ttl=3600
+    )
+
+def stream_p3_recommendations(country_code, query):
+    """
+    Stream P3 (Predict, Prevent, Protect) recommendations as they are generated
+    
+    Shares its cache entries with get_p3_recommendations.
+    
+    Args:
+        country_code: ISO country code
+        query: User query
         
-        return p3_data
+    Yields:
+        (event, data) pairs, see stream_completion
+    """
+    return stream_completion(
+        "p3",
+        "p3_",
+        *build_p3_prompt(country_code, query),
+        ["predict", "prevent", "protect"],
+        parse_p3,
+        create_fallback_p3,
+        3600,
+        stale_ttl=3600
+    )
+
+# A completion to stream; ttl is how long its result is cached
+CompletionStream = namedtuple('CompletionStream', ['endpoint', 'key', 'prompt', 'sections', 'parse', 'create_fallback', 'ttl'])
+
+# Completions being streamed, by prompt key
+_streams = {}
+_streams_lock = threading.Lock()
+
+def stream_completion(endpoint, family, prompt, fingerprint, sections, parse, create_fallback, max_age=3600, stale_ttl=0):
+    """
+    Stream the sections of a Mistral AI JSON response, caching the result
+    
+    A cached result is replayed as complete sections; a stale one is also
+    refreshed in the background. Otherwise the completion is streamed and
+    the text of each section is forwarded as it arrives. Like
+    get_or_complete, concurrent requests for the same prompt share one
+    completion, and failures are negative-cached under the "mistral"
+    upstream.
+    
+    Args:
+        endpoint: Endpoint name for the token log
+        family: Cache key prefix
+        prompt: Fully rendered prompt
+        fingerprint: Prompt fingerprint for the cache key, see get_or_complete
+        sections: Top-level string fields of the response to stream
+        parse: Callable parsing the full response content
+        create_fallback: Zero-argument callable producing the fallback result
+        max_age: Maximum age of fresh data in seconds (default: 1 hour)
+        stale_ttl: Seconds past max_age during which stale data is served
+        
+    Yields:
+        ("section", {"section", "text", "complete"}) with text added to a
+        section, then ("done", result) with the full parsed result
+    """
+    key = prompt_key(family, fingerprint, MISTRAL_MODEL)
+    stream = CompletionStream(endpoint, key, prompt, sections, parse, create_fallback, max_age + stale_ttl)
+    cached, stale = lookup_completion(key, max_age, stale_ttl)
+    if cached is not None:
+        if stale:
+            try:
+                start_stream(stream)
+            except UpstreamUnavailableError:
+                # Upstream is backing off; keep serving the stale value
+                pass
+        for section in sections:
+            if isinstance(cached.get(section), str):
+                yield "section", {"section": section, "text": cached[section], "complete": True}
+        yield "done", cached
+        return
+    
+    try:
+        broadcast = start_stream(stream)
+    except UpstreamUnavailableError as e:
+        print(f"Error streaming AI response: {str(e)}")
+        yield "done", create_fallback()
+        return
+    yield from broadcast.follow()
+
+def start_stream(stream):
+    """
+    Start streaming a completion in the background, unless it already is
+    
+    The completion runs to the end even if every client disconnects, so
+    its result is always cached.
+    
+    Args:
+        stream: CompletionStream
+        
+    Returns:
+        StreamBroadcast of the completion's events
+        
+    Raises:
+        UpstreamUnavailableError: If Mistral failed recently for this key
+    """
+    with _streams_lock:
+        broadcast = _streams.get(stream.key)
+        if broadcast is not None:
+            return broadcast
+        negative_cache.check("mistral", stream.key)
+        broadcast = _streams[stream.key] = StreamBroadcast()
+    
+    threading.Thread(target=run_stream, args=(stream, broadcast), name='mistral-stream', daemon=True).start()
+    return broadcast
+
+def run_stream(stream, broadcast):
+    """Stream a completion into a broadcast, then cache its parsed result"""
+    try:
+        start = time.time()
+        usage = None
+        fields = JsonFieldStream(stream.sections)
+        for chunk in mistral_chat_stream(stream.prompt, MISTRAL_MODEL):
+            # The last chunk carries the usage of the whole completion
+            usage = chunk.usage or usage
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if not content:
+                continue
+            for section, text, complete in fields.feed(content):
+                broadcast.publish("section", {"section": section, "text": text, "complete": complete})
+        
+        log_completion(stream.endpoint, MISTRAL_MODEL, stream.prompt, fields.text, usage, time.time() - start)
+        result = stream.parse(fields.text)
+        set_cached_completion(stream.key, result, stream.ttl)
+        negative_cache.record_success("mistral", stream.key)
+    except Exception as e:
+        print(f"Error streaming AI response: {str(e)}")
+        negative_cache.record_failure("mistral", stream.key, e)
+        result = stream.create_fallback()
+    finally:
+        # Later requests find the cached result instead of this stream
+        with _streams_lock:
+            _streams.pop(stream.key, None)
+    
+    broadcast.publish("done", result)
+    broadcast.close()
+
+async def get_mistral_insights_async(country_code, query, news_articles=None, economic_indicators=None):
+    """Asyncio version of get_mistral_insights, sharing its cache entries"""
+    async def generate(prompt):
+        return parse_insights(await mistral_chat_async(prompt, MISTRAL_MODEL, "insights"))
+    
+    try:
+        prompt, fingerprint = build_insights_prompt(country_code, query, news_articles, economic_indicators)
+        return await get_or_complete_async(
+            "ai_insights_",
+            prompt,
+            MISTRAL_MODEL,
+            generate,
+            3600,
+            stale_ttl=3600,
+            upstream="mistral",
+            fingerprint=fingerprint
+        )
+    except Exception as e:
+        print(f"Error getting AI insights: {str(e)}")
+        return create_fallback_insights("Unable to generate AI insights at this time.")
+
+async def get_p3_recommendations_async(country_code, query):
+    """Asyncio version of get_p3_recommendations, sharing its cache entries"""
+    async def generate(prompt):
+        return parse_p3(await mistral_chat_async(prompt, MISTRAL_MODEL, "p3"))
+    
+    try:
+        prompt, fingerprint = build_p3_prompt(country_code, query)
+        return await get_or_complete_async(
+            "p3_",
+            prompt,
+            MISTRAL_MODEL,
+            generate,
+            3600,
+            stale_ttl=3600,
+            upstream="mistral",
+            fingerprint=fingerprint
+        )
     except Exception as e:
         print(f"Error getting P3 recommendations: {str(e)}")
-        return {
-            "predict": "Unable to generate prediction analysis at this time.",
-            "prevent": "Unable to generate prevention strategies at this time.",
-            "protect": "Unable to generate protection recommendations at this time."
-        }
\ No newline at end of file
+        return create_fallback_p3()
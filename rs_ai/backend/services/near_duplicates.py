@@ -0,0 +1,128 @@
+import hashlib
+import re
+import numpy as np
+
+# Mersenne prime used for the universal hash family
+_PRIME = (1 << 31) - 1
+
+
+def shingles(text):
+    """Get the set of lowercase words of a text"""
+    return set(re.findall(r"\w+", (text or '').lower()))
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of word sets
+
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the texts' word sets.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        """
+        Args:
+            num_perm: Signature length
+            seed: Seed for the hash permutations, fixed so stored
+                signatures stay comparable across restarts
+        """
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, text):
+        """
+        Args:
+            text: Text to sign
+
+        Returns:
+            uint32 array of length num_perm, or None if the text has no words
+        """
+        words = shingles(text)
+        if not words:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(w.encode('utf-8'), digest_size=4).digest(), 'big') % _PRIME for w in words),
+            dtype=np.uint64,
+            count=len(words)
+        )
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(signature_a, signature_b):
+    """Estimate the Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(signature_a == signature_b)) / len(signature_a)
+
+
+def to_blob(signature):
+    return signature.astype('<u4').tobytes()
+
+
+def from_blob(blob):
+    return np.frombuffer(blob, dtype='<u4').astype(np.uint32)
+
+
+class MinHashLSH:
+    """
+    Finds near-duplicate signatures without comparing against every one
+
+    Signatures are split into bands and indexed by (band, band contents).
+    Only signatures sharing at least one whole band with the query are
+    compared, which for unrelated texts is almost never the case.
+    """
+
+    def __init__(self, threshold=0.7, num_perm=64, bands=16):
+        """
+        Args:
+            threshold: Minimum estimated Jaccard similarity of near-duplicates
+            num_perm: Signature length
+            bands: Number of bands; num_perm must be a multiple of it
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = {}
+        self._signatures = {}
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, key, signature):
+        """Index a signature under key"""
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def find(self, signature):
+        """
+        Find an indexed near-duplicate
+
+        Args:
+            signature: Signature to look up
+
+        Returns:
+            Key of the most similar indexed signature at or above the
+            threshold, or None
+        """
+        best = None
+        best_similarity = self.threshold
+        seen = set()
+        for band_key in self._band_keys(signature):
+            for key in self._buckets.get(band_key, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(signature, self._signatures[key])
+                if score >= best_similarity:
+                    best, best_similarity = key, score
+        return best
+
+    def __len__(self):
+        return len(self._signatures)
+
+
+# Shared hasher; every stored signature must come from the same permutations
+minhasher = MinHasher()
@@ -1,70 +1,329 @@
 import os
-import requests
 from newsapi import NewsApiClient
-from .cache_service import get_cached_data, set_cached_data
+from .async_http_client import get_async_http
+from .cache_service import get_or_compute, get_or_compute_async
+from .http_client import http
+from .keyword_matcher import KeywordMatcher
+from .near_duplicates import MinHashLSH, minhasher
+from .news_store import NewsIngester, NewsStore
+from .world_bank_service import get_countries
 
-# Initialize NewsAPI client
+# Initialize NewsAPI client on the shared HTTP session
 news_api_key = os.environ.get('NEWS_API_KEY')
-newsapi = NewsApiClient(api_key=news_api_key)
+newsapi = NewsApiClient(api_key=news_api_key, session=http)
 
-def get_news_articles(country_code, query):
+NEWSAPI_EVERYTHING_URL = "https://newsapi.org/v2/everything"
+
+# Sentiment keywords
+POSITIVE_KEYWORDS = [
+    'growth', 'profit', 'success', 'positive', 'increase',
+    'improve', 'gain', 'benefit', 'opportunity', 'innovation'
+]
+
+NEGATIVE_KEYWORDS = [
+    'decline', 'loss', 'fail', 'negative', 'decrease',
+    'risk', 'threat', 'crisis', 'problem', 'debt'
+]
+
+# Potential tag categories, in the order tags are assigned
+ECONOMIC_TAGS = ['economy', 'gdp', 'growth', 'inflation', 'recession', 'market', 'trade']
+POLITICAL_TAGS = ['government', 'policy', 'election', 'reform', 'regulation', 'law']
+BUSINESS_TAGS = ['business', 'company', 'investment', 'startup', 'corporation', 'industry']
+SOCIAL_TAGS = ['society', 'health', 'education', 'culture', 'employment', 'welfare']
+TAG_KEYWORDS = ECONOMIC_TAGS + POLITICAL_TAGS + BUSINESS_TAGS + SOCIAL_TAGS
+
+MAX_TAGS = 5
+
+# Rolling windows (days) reported for stored news sentiment
+SENTIMENT_WINDOWS = [7, 30, 90]
+
+# One matcher for every sentiment and tag keyword, compiled once
+keyword_matcher = KeywordMatcher(POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS + TAG_KEYWORDS)
+
+# Map of common country codes to names
+COUNTRY_NAMES = {
+    'USA': 'United States',
+    'GBR': 'United Kingdom',
+    'DEU': 'Germany',
+    'FRA': 'France',
+    'JPN': 'Japan',
+    'CHN': 'China',
+    'IND': 'India',
+    'BRA': 'Brazil',
+    'CAN': 'Canada',
+    'AUS': 'Australia',
+    'RUS': 'Russia',
+    'KOR': 'South Korea',
+    'ITA': 'Italy',
+    'ESP': 'Spain',
+    'MEX': 'Mexico'
+}
+
+# Local article store fed by a background ingester. When NEWS_DB is set,
+# get_news_articles queries the store and never calls NewsAPI itself.
+news_store = NewsStore(os.environ['NEWS_DB']) if os.environ.get('NEWS_DB') else None
+news_ingester = NewsIngester(
+    news_store,
+    lambda country_code, since: fetch_country_news(country_code, since),
+    [c for c in os.environ.get('NEWS_TRACKED_COUNTRIES', ','.join(COUNTRY_NAMES)).split(',') if c],
+    interval=int(os.environ.get('NEWS_INGEST_INTERVAL', 21600)),
+    max_tracked=int(os.environ.get('NEWS_MAX_REQUESTED_COUNTRIES', 50)),
+    idle_ttl=int(os.environ.get('NEWS_REQUESTED_IDLE_TTL', 604800))
+) if news_store is not None else None
+
+def start_news_ingester():
+    """Start polling NewsAPI for tracked countries if the local news store is enabled"""
+    if news_ingester is not None:
+        news_ingester.start()
+
+def track_country(country_code):
+    """
+    Have the news ingester poll a requested country
+    
+    Only known countries are tracked, so arbitrary codes from URLs cannot
+    grow the tracked set or spend the NewsAPI quota.
+    
+    Args:
+        country_code: ISO country code
+    """
+    if is_known_country(country_code):
+        news_ingester.track(country_code)
+
+def is_known_country(country_code):
+    """Check whether a code is a configured country or in the World Bank country list"""
+    if country_code in COUNTRY_NAMES or news_ingester.is_tracked(country_code):
+        return True
+    return any(country['code'] == country_code for country in get_countries())
+
+def get_news_articles(country_code, query, since=None, until=None, sources=None):
     """
     Get news articles related to a country and query
     
     Args:
         country_code: ISO country code
         query: Search query
+        since: Earliest publish date, YYYY-MM-DD (optional)
+        until: Latest publish date, YYYY-MM-DD (optional)
+        sources: List of source names to restrict to (optional)
         
     Returns:
         List of news articles
     """
-    cache_key = f"news_{country_code}_{query}"
-    cached_data = get_cached_data(cache_key, 3600)  # Cache for 1 hour
-    
-    if cached_data:
-        return cached_data
+    if news_store is not None:
+        return search_news_store(country_code, query, since=since, until=until, sources=sources)
     
     try:
-        # Get country name for better search results
-        country_name = get_country_name(country_code)
-        
-        # Build search query
-        search_query = f"{country_name} {query}"
-        
-        # Get articles from NewsAPI
-        response = newsapi.get_everything(
-            q=search_query,
-            language='en',
-            sort_by='relevancy',
-            page=1,
-            page_size=10
+        articles = get_or_compute(
+            f"news_{country_code}_{query}",
+            lambda: fetch_news_articles(country_code, query),
+            3600,  # Cache for 1 hour
+            upstream="newsapi"
         )
+        return filter_articles(articles, since, until, sources)
+    except Exception as e:
+        print(f"Error fetching news articles: {str(e)}")
+        return []
+
+def filter_articles(articles, since=None, until=None, sources=None):
+    """Filter formatted articles by publish date range and source name"""
+    return [
+        article for article in articles
+        if (not since or article['date'] >= since[:10])
+        and (not until or article['date'] <= until[:10])
+        and (not sources or article['source'] in sources)
+    ]
+
+def select_context_articles(country_code, query, articles=None, limit=5):
+    """
+    Pick the articles most relevant to a query, e.g. for an LLM prompt
+    
+    With the local news store, the best BM25 matches for the country are
+    used. Otherwise the given articles are kept in their (relevancy) order.
+    
+    Args:
+        country_code: ISO country code
+        query: Search query
+        articles: Already fetched articles (optional)
+        limit: Maximum number of articles
         
-        articles = []
+    Returns:
+        List of news articles
+    """
+    if news_store is not None:
+        selected = search_news_store(country_code, query, limit, fallback_to_recent=False)
+        if selected:
+            return selected
+    return (articles or [])[:limit]
+
+def fetch_news_articles(country_code, query):
+    """
+    Fetch news articles related to a country and query from NewsAPI
+    
+    Args:
+        country_code: ISO country code
+        query: Search query
         
-        for article in response.get('articles', []):
-            # Generate tags from title and description
-            tags = generate_tags(
-                article.get('title', ''),
-                article.get('description', ''),
-                query
-            )
-            
-            # Format article data
-            articles.append({
-                'title': article.get('title'),
-                'source': article.get('source', {}).get('name'),
-                'date': article.get('publishedAt')[:10],  # YYYY-MM-DD
-                'description': article.get('description'),
-                'url': article.get('url'),
-                'imageUrl': article.get('urlToImage'),
-                'tags': tags
-            })
-        
-        # Cache the result
-        set_cached_data(cache_key, articles, 3600)  # Cache for 1 hour
-        
-        return articles
+    Returns:
+        List of news articles
+    """
+    # Get articles from NewsAPI
+    response = newsapi.get_everything(
+        q=build_search_query(country_code, query),
+        language='en',
+        sort_by='relevancy',
+        page=1,
+        page_size=10
+    )
+    
+    return format_articles(response, query)
+
+def search_news_store(country_code, query, limit=10, since=None, until=None, sources=None, fallback_to_recent=True):
+    """
+    Get articles for a country from the local news store
+    
+    Articles are ranked by full-text relevance to the query. If none match,
+    the most recent articles for the country are returned instead (unless
+    fallback_to_recent is False). Countries not yet tracked are added to the
+    ingester and fetched in the background.
+    
+    Args:
+        country_code: ISO country code
+        query: Search query
+        limit: Maximum number of articles
+        since: Earliest publish date (optional)
+        until: Latest publish date (optional)
+        sources: List of source names to restrict to (optional)
+        fallback_to_recent: Return recent articles when nothing matches
+        
+    Returns:
+        List of news articles
+    """
+    try:
+        track_country(country_code)
+        filters = {'since': since, 'until': until, 'sources': sources}
+        articles = news_store.search(country_code, query, limit, **filters)
+        if not articles and fallback_to_recent:
+            articles = news_store.search(country_code, None, limit, **filters)
+        return format_articles({'articles': articles}, query)
+    except Exception as e:
+        print(f"Error searching news store: {str(e)}")
+        return []
+
+def fetch_country_news(country_code, since=None):
+    """
+    Fetch recent articles about a country from NewsAPI for ingestion
+    
+    Args:
+        country_code: ISO country code
+        since: Only fetch articles published after this ISO time (optional)
+        
+    Returns:
+        List of raw NewsAPI articles
+    """
+    response = newsapi.get_everything(
+        q=get_country_name(country_code),
+        language='en',
+        sort_by='publishedAt',
+        page=1,
+        page_size=100,
+        # NewsAPI accepts second precision without a zone suffix
+        from_param=since[:19] if since else None
+    )
+    
+    # Index keyword tags along with the text and count sentiment once per
+    # article; the store drops near-duplicates of stored articles itself
+    articles = response.get('articles', [])
+    for article, score in zip(articles, score_articles(articles)):
+        article['tags'] = score['tags']
+        article['sentiment'] = score['sentiment']
+    return articles
+
+def build_search_query(country_code, query):
+    # Get country name for better search results
+    country_name = get_country_name(country_code)
+    return f"{country_name} {query or ''}".strip()
+
+def drop_near_duplicates(articles):
+    """
+    Keep only the first of each group of near-duplicate articles
+    
+    Args:
+        articles: Raw NewsAPI articles, in order of preference
+        
+    Returns:
+        List of articles without near-duplicates of earlier ones
+    """
+    index = MinHashLSH(num_perm=minhasher.num_perm)
+    unique = []
+    for position, article in enumerate(articles):
+        signature = minhasher.signature(f"{article.get('title') or ''} {article.get('description') or ''}")
+        if signature is not None:
+            if index.find(signature) is not None:
+                continue
+            index.add(position, signature)
+        unique.append(article)
+    return unique
+
+def format_articles(response, query):
+    """
+    Format a NewsAPI response into tagged articles
+    
+    Near-duplicates (syndicated copies of the same story) are dropped.
+    
+    Args:
+        response: Parsed NewsAPI response
+        query: Search query
+        
+    Returns:
+        List of news articles
+    """
+    articles = []
+    
+    for article in drop_near_duplicates(response.get('articles', [])):
+        # Generate tags from title and description
+        tags = generate_tags(
+            article.get('title', ''),
+            article.get('description', ''),
+            query
+        )
+        
+        # Format article data
+        articles.append({
+            'title': article.get('title'),
+            'source': article.get('source', {}).get('name'),
+            'date': (article.get('publishedAt') or '')[:10],  # YYYY-MM-DD
+            'description': article.get('description'),
+            'url': article.get('url'),
+            'imageUrl': article.get('urlToImage'),
+            'tags': tags
+        })
+    
+    return articles
+
+async def get_news_articles_async(country_code, query, since=None, until=None, sources=None):
+    """Asyncio version of get_news_articles, sharing its cache entries"""
+    if news_store is not None:
+        return search_news_store(country_code, query, since=since, until=until, sources=sources)
+    
+    async def fetch():
+        response = await get_async_http().get(
+            NEWSAPI_EVERYTHING_URL,
+            "newsapi",
+            headers={"X-Api-Key": news_api_key or ""},
+            params={
+                "q": build_search_query(country_code, query),
+                "language": "en",
+                "sortBy": "relevancy",
+                "page": 1,
+                "pageSize": 10
+            }
+        )
+        response.raise_for_status()
+        return format_articles(response.json(), query)
+    
+    try:
+        articles = await get_or_compute_async(f"news_{country_code}_{query}", fetch, 3600, upstream="newsapi")
+        return filter_articles(articles, since, until, sources)
     except Exception as e:
         print(f"Error fetching news articles: {str(e)}")
         return []
@@ -82,49 +341,96 @@ def analyze_news_sentiment(articles):
     # In a real application, you would use a more sophisticated
     # sentiment analysis approach, possibly using an AI service
     
-    # For this example, we'll use a simple approach
-    positive_keywords = [
-        'growth', 'profit', 'success', 'positive', 'increase',
-        'improve', 'gain', 'benefit', 'opportunity', 'innovation'
-    ]
+    # For this example, we'll use a simple keyword approach
+    counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+    for score in score_articles(articles):
+        counts[score['sentiment']] += 1
     
-    negative_keywords = [
-        'decline', 'loss', 'fail', 'negative', 'decrease',
-        'risk', 'threat', 'crisis', 'problem', 'debt'
-    ]
+    return summarize_sentiment(counts['positive'], counts['negative'], counts['neutral'])
+
+def get_news_sentiment(country_code, query, days=30):
+    """
+    Get news sentiment for a country
     
-    # Initialize counters
-    positive_count = 0
-    negative_count = 0
-    neutral_count = 0
+    With the local news store, counts come from the rolling sentiment
+    buckets for the last `days` days, and counts for every window in
+    SENTIMENT_WINDOWS are included. Otherwise sentiment is computed from the
+    articles returned for the query, and cached for an hour.
     
-    # Count occurences of positive and negative keywords
-    for article in articles:
-        title = article.get('title', '').lower()
-        description = article.get('description', '').lower()
-        content = title + ' ' + description
-        
-        article_positive = 0
-        article_negative = 0
-        
-        for keyword in positive_keywords:
-            if keyword in content:
-                article_positive += 1
+    Args:
+        country_code: ISO country code
+        query: Search query, used without the local news store
+        days: Window for the headline percentages
         
-        for keyword in negative_keywords:
-            if keyword in content:
-                article_negative += 1
+    Returns:
+        Sentiment analysis results, neutral and empty without a country
+    """
+    if not country_code:
+        return summarize_sentiment(0, 0, 0)
+    
+    if news_store is None:
+        query = query or ''
+        try:
+            # Shares the article fetch with get_news_articles; a failed fetch
+            # raises, so no empty sentiment is cached
+            return get_or_compute(
+                f"news_sentiment_{country_code}_{query}",
+                lambda: analyze_news_sentiment(get_or_compute(
+                    f"news_{country_code}_{query}",
+                    lambda: fetch_news_articles(country_code, query),
+                    3600,
+                    upstream="newsapi"
+                )),
+                3600,  # Cache for 1 hour
+                upstream="newsapi"
+            )
+        except Exception as e:
+            print(f"Error getting news sentiment: {str(e)}")
+            return summarize_sentiment(0, 0, 0)
+    
+    try:
+        track_country(country_code)
+        counts = news_store.sentiment_counts(country_code, days)
+        result = summarize_sentiment(counts['positive'], counts['negative'], counts['neutral'])
+        result['windows'] = {
+            f"{window}d": news_store.sentiment_counts(country_code, window)
+            for window in SENTIMENT_WINDOWS
+        }
+        return result
+    except Exception as e:
+        print(f"Error reading news sentiment: {str(e)}")
+        return summarize_sentiment(0, 0, 0)
+
+def get_sentiment_trend(country_code, granularity='day', days=30):
+    """
+    Get per-bucket news sentiment counts for a country
+    
+    Args:
+        country_code: ISO country code
+        granularity: 'hour' or 'day'
+        days: Number of days back from now
         
-        # Classify article sentiment
-        if article_positive > article_negative:
-            positive_count += 1
-        elif article_negative > article_positive:
-            negative_count += 1
-        else:
-            neutral_count += 1
+    Returns:
+        List of bucket counts, oldest first; empty without the local news store
+    """
+    if news_store is None:
+        return []
+    return news_store.sentiment_trend(country_code, granularity, days)
+
+def summarize_sentiment(positive_count, negative_count, neutral_count):
+    """
+    Turn article sentiment counts into percentages and a summary
     
+    Args:
+        positive_count: Number of positive articles
+        negative_count: Number of negative articles
+        neutral_count: Number of neutral articles
+        
+    Returns:
+        Sentiment analysis results
+    """
     # Calculate percentages
-    total = max(1, len(articles))  # Avoid division by zero
+    total = max(1, positive_count + negative_count + neutral_count)  # Avoid division by zero
     positive_percent = round((positive_count / total) * 100)
     negative_percent = round((negative_count / total) * 100)
     neutral_percent = round((neutral_count / total) * 100)
@@ -144,6 +450,44 @@ def analyze_news_sentiment(articles):
         'summary': summary
     }
 
+def score_articles(articles, query=None):
+    """
+    Score sentiment and generate tags for many articles
+    
+    Every article's title and description are scanned once for all
+    sentiment and tag keywords together.
+    
+    Args:
+        articles: Iterable of articles with title and description
+        query: Search query added as the first tag (optional)
+        
+    Returns:
+        List with one dictionary per article: sentiment ('positive',
+        'negative' or 'neutral'), positive and negative keyword counts and
+        tags
+    """
+    scores = []
+    for article in articles:
+        found = keyword_matcher.find(f"{article.get('title') or ''} {article.get('description') or ''}")
+        positive = sum(1 for keyword in POSITIVE_KEYWORDS if keyword in found)
+        negative = sum(1 for keyword in NEGATIVE_KEYWORDS if keyword in found)
+        
+        # Classify article sentiment
+        if positive > negative:
+            sentiment = 'positive'
+        elif negative > positive:
+            sentiment = 'negative'
+        else:
+            sentiment = 'neutral'
+        
+        scores.append({
+            'sentiment': sentiment,
+            'positive': positive,
+            'negative': negative,
+            'tags': select_tags(found, query)
+        })
+    return scores
+
 def generate_tags(title, description, query):
     """
     Generate tags from article title and description
@@ -156,25 +500,29 @@ def generate_tags(title, description, query):
     Returns:
         List of tags
     """
-    # Combine title and description
-    text = (title + " " + description).lower()
-    
-    # Potential tag categories
-    economic_tags = ['economy', 'gdp', 'growth', 'inflation', 'recession', 'market', 'trade']
-    political_tags = ['government', 'policy', 'election', 'reform', 'regulation', 'law']
-    business_tags = ['business', 'company', 'investment', 'startup', 'corporation', 'industry']
-    social_tags = ['society', 'health', 'education', 'culture', 'employment', 'welfare']
+    return select_tags(keyword_matcher.find(f"{title or ''} {description or ''}"), query)
+
+def select_tags(found, query=None):
+    """
+    Pick tags from matched keywords
     
-    # Find matches
+    Args:
+        found: Set of keywords found in the article
+        query: Search query, added first if it's not too long
+        
+    Returns:
+        Up to MAX_TAGS tags in TAG_KEYWORDS order
+    """
     tags = []
     
     # Add query as a tag if it's not too long
-    if len(query) < 20:
+    if query and len(query) < 20:
         tags.append(query)
     
-    # Check for tag matches
-    for tag in economic_tags + political_tags + business_tags + social_tags:
-        if tag in text and tag not in tags and len(tags) < 5:
+    for tag in TAG_KEYWORDS:
+        if len(tags) >= MAX_TAGS:
+            break
+        if tag in found and tag != query:
             tags.append(tag)
     
     return tags
@@ -189,23 +537,4 @@ def get_country_name(country_code):
     Returns:
         Country name
     """
-    # Map of common country codes to names
-    country_map = {
-        'USA': 'United States',
-        'GBR': 'United Kingdom',
-        'DEU': 'Germany',
-        'FRA': 'France',
-        'JPN': 'Japan',
-        'CHN': 'China',
-        'IND': 'India',
-        'BRA': 'Brazil',
-        'CAN': 'Canada',
-        'AUS': 'Australia',
-        'RUS': 'Russia',
-        'KOR': 'South Korea',
-        'ITA': 'Italy',
-        'ESP': 'Spain',
-        'MEX': 'Mexico'
-    }
-    
-    return country_map.get(country_code, country_code)
\ No newline at end of file
+    return COUNTRY_NAMES.get(country_code, country_code)
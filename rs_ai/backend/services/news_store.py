@@ -0,0 +1,489 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from .near_duplicates import MinHashLSH, from_blob, minhasher, to_blob
+
+# Sentiment bucket sizes in seconds
+BUCKET_SECONDS = {'hour': 3600, 'day': 86400}
+
+
+def url_hash(url):
+    """Stable identifier for an article, used for deduplication"""
+    return hashlib.sha1((url or '').strip().encode('utf-8')).hexdigest()
+
+
+class NewsStore:
+    """
+    Local SQLite store of ingested news articles
+
+    Articles are deduplicated by the hash of their URL; an article found for
+    several countries is stored once and linked to each of them. Near-
+    duplicates (syndicated copies of a story under another URL) are found
+    with MinHash signatures in an LSH index and recorded as aliases of the
+    first copy, so only that representative is stored, indexed and counted. Title,
+    description and tags are indexed in an FTS5 table for BM25-ranked
+    search. Per-country sentiment counts are kept in hourly and daily
+    buckets, updated as new articles arrive, so windows and trends cost
+    O(buckets) rather than O(articles).
+    """
+
+    def __init__(self, path, duplicate_threshold=0.7):
+        """
+        Args:
+            path: Database file (its directory is created if missing)
+            duplicate_threshold: Minimum word-set Jaccard similarity of the
+                title and description of near-duplicate articles
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.duplicates = MinHashLSH(duplicate_threshold, minhasher.num_perm)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS articles ('
+            'url_hash TEXT PRIMARY KEY, url TEXT NOT NULL, title TEXT, source TEXT, '
+            'description TEXT, image_url TEXT, published_at TEXT, ingested_at REAL NOT NULL, tags TEXT, '
+            'minhash BLOB);'
+            'CREATE TABLE IF NOT EXISTS article_aliases ('
+            'url_hash TEXT PRIMARY KEY, representative TEXT NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS article_countries ('
+            'country TEXT NOT NULL, url_hash TEXT NOT NULL, published_at TEXT, '
+            'PRIMARY KEY (country, url_hash));'
+            'CREATE INDEX IF NOT EXISTS article_countries_recent '
+            'ON article_countries (country, published_at DESC);'
+            'CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5('
+            "title, description, tags, content='articles', content_rowid='rowid');"
+            'CREATE TABLE IF NOT EXISTS sentiment_buckets ('
+            'country TEXT NOT NULL, granularity TEXT NOT NULL, bucket_start INTEGER NOT NULL, '
+            'positive INTEGER NOT NULL, negative INTEGER NOT NULL, neutral INTEGER NOT NULL, '
+            'PRIMARY KEY (country, granularity, bucket_start));'
+        )
+        self._conn.commit()
+
+        for key, blob in self._conn.execute('SELECT url_hash, minhash FROM articles WHERE minhash IS NOT NULL'):
+            self.duplicates.add(key, from_blob(blob))
+
+    def add_articles(self, country_code, articles):
+        """
+        Store NewsAPI articles for a country, skipping ones already stored
+
+        Args:
+            country_code: ISO country code the articles were fetched for
+            articles: Raw NewsAPI article dictionaries, optionally with a
+                list of tags to index and a sentiment ('positive',
+                'negative' or 'neutral') to count
+
+        Returns:
+            Number of articles not seen before
+        """
+        now = time.time()
+        rows = []
+        for article in articles:
+            if not article.get('url') or not article.get('title'):
+                continue
+            rows.append((
+                url_hash(article['url']),
+                article['url'],
+                article.get('title'),
+                (article.get('source') or {}).get('name'),
+                article.get('description'),
+                article.get('urlToImage'),
+                article.get('publishedAt'),
+                now,
+                ' '.join(article.get('tags') or []),
+                article.get('sentiment')
+            ))
+
+        inserted = 0
+        with self._lock:
+            for row in rows:
+                key, signature = self._resolve(row)
+                if key == row[0] and self._insert(row, signature):
+                    inserted += 1
+
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO article_countries (country, url_hash, published_at) VALUES (?, ?, ?)',
+                    (country_code, key, row[6])
+                )
+                # Count each article once per country
+                if cursor.rowcount and row[9] in ('positive', 'negative', 'neutral'):
+                    self._count_sentiment(country_code, row[6], row[7], row[9])
+            self._conn.commit()
+        return inserted
+
+    def search(self, country_code, query=None, limit=10, since=None, until=None, sources=None):
+        """
+        Find articles for a country, best matches for the query first
+
+        Matching uses the full-text index over title, description and tags;
+        every query word is matched as a prefix and results are ranked by
+        BM25 with title matches weighted highest. Without a query the most
+        recent articles are returned.
+
+        Args:
+            country_code: ISO country code
+            query: Free-text query (optional)
+            limit: Maximum number of articles
+            since: Earliest publish date, ISO format (optional)
+            until: Latest publish date, ISO format, inclusive (optional)
+            sources: List of source names to restrict to (optional)
+
+        Returns:
+            List of articles in the NewsAPI article format
+        """
+        match = fts_query(query)
+        conditions = ['c.country = ?']
+        params = [country_code]
+        if since:
+            conditions.append('c.published_at >= ?')
+            params.append(since)
+        if until:
+            # Dates without a time include the whole day
+            conditions.append('c.published_at <= ?')
+            params.append(until if 'T' in until else f"{until}T23:59:59Z")
+        if sources:
+            conditions.append(f"a.source IN ({', '.join('?' for _ in sources)})")
+            params.extend(sources)
+
+        if match:
+            sql = (
+                'SELECT a.url, a.title, a.source, a.description, a.image_url, a.published_at, a.tags '
+                'FROM articles_fts f '
+                'JOIN articles a ON a.rowid = f.rowid '
+                'JOIN article_countries c ON c.url_hash = a.url_hash '
+                f"WHERE articles_fts MATCH ? AND {' AND '.join(conditions)} "
+                'ORDER BY bm25(articles_fts, 3.0, 1.0, 2.0), c.published_at DESC LIMIT ?'
+            )
+            params.insert(0, match)
+        else:
+            sql = (
+                'SELECT a.url, a.title, a.source, a.description, a.image_url, a.published_at, a.tags '
+                'FROM article_countries c JOIN articles a ON a.url_hash = c.url_hash '
+                f"WHERE {' AND '.join(conditions)} "
+                'ORDER BY c.published_at DESC LIMIT ?'
+            )
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                'url': url,
+                'title': title,
+                'source': {'name': source},
+                'description': description,
+                'urlToImage': image_url,
+                'publishedAt': published_at,
+                'tags': tags.split() if tags else []
+            }
+            for url, title, source, description, image_url, published_at, tags in rows
+        ]
+
+    def _resolve(self, row):
+        """
+        Get the key an incoming article is stored under
+
+        Returns:
+            Tuple of (key, signature): the article's own key, or its
+            representative's if it is a known alias or a near-duplicate of
+            a stored article. The MinHash signature is only computed for
+            articles not stored yet.
+        """
+        key = row[0]
+        alias = self._conn.execute(
+            'SELECT representative FROM article_aliases WHERE url_hash = ?', (key,)
+        ).fetchone()
+        if alias:
+            return alias[0], None
+        if self._conn.execute('SELECT 1 FROM articles WHERE url_hash = ?', (key,)).fetchone():
+            return key, None
+
+        signature = minhasher.signature(f"{row[2] or ''} {row[4] or ''}")
+        representative = self.duplicates.find(signature) if signature is not None else None
+        if representative is not None:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO article_aliases (url_hash, representative) VALUES (?, ?)',
+                (key, representative)
+            )
+            return representative, signature
+        return key, signature
+
+    def _insert(self, row, signature):
+        """Insert a new article and index it; returns False if it already existed"""
+        cursor = self._conn.execute(
+            'INSERT OR IGNORE INTO articles '
+            '(url_hash, url, title, source, description, image_url, published_at, ingested_at, tags, minhash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            row[:9] + (to_blob(signature) if signature is not None else None,)
+        )
+        if not cursor.rowcount:
+            return False
+
+        self._conn.execute(
+            'INSERT INTO articles_fts (rowid, title, description, tags) VALUES (?, ?, ?, ?)',
+            (cursor.lastrowid, row[2], row[4], row[8])
+        )
+        if signature is not None:
+            self.duplicates.add(row[0], signature)
+        return True
+
+    def _count_sentiment(self, country_code, published_at, ingested_at, sentiment):
+        timestamp = parse_timestamp(published_at) or ingested_at
+        for granularity, size in BUCKET_SECONDS.items():
+            self._conn.execute(
+                'INSERT INTO sentiment_buckets '
+                '(country, granularity, bucket_start, positive, negative, neutral) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (country, granularity, bucket_start) DO UPDATE SET '
+                'positive = positive + excluded.positive, '
+                'negative = negative + excluded.negative, '
+                'neutral = neutral + excluded.neutral',
+                (
+                    country_code, granularity, int(timestamp // size * size),
+                    int(sentiment == 'positive'), int(sentiment == 'negative'), int(sentiment == 'neutral')
+                )
+            )
+
+    def sentiment_counts(self, country_code, days, now=None):
+        """
+        Sum sentiment counts over a rolling window
+
+        Args:
+            country_code: ISO country code
+            days: Window length in days, ending now
+            now: End of the window as a Unix time (default: current time)
+
+        Returns:
+            Dictionary with positive, negative and neutral article counts
+        """
+        start = (now or time.time()) - days * 86400
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COALESCE(SUM(positive), 0), COALESCE(SUM(negative), 0), COALESCE(SUM(neutral), 0) '
+                "FROM sentiment_buckets WHERE country = ? AND granularity = 'day' AND bucket_start >= ?",
+                (country_code, int(start // 86400 * 86400))
+            ).fetchone()
+        return {'positive': row[0], 'negative': row[1], 'neutral': row[2]}
+
+    def sentiment_trend(self, country_code, granularity='day', days=30, now=None):
+        """
+        Get sentiment counts per bucket
+
+        Args:
+            country_code: ISO country code
+            granularity: 'hour' or 'day'
+            days: Number of days back from now
+            now: End of the range as a Unix time (default: current time)
+
+        Returns:
+            List of dictionaries with the bucket start (ISO time) and
+            positive, negative and neutral counts, oldest first; buckets
+            without articles are left out
+        """
+        size = BUCKET_SECONDS[granularity]
+        start = (now or time.time()) - days * 86400
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT bucket_start, positive, negative, neutral FROM sentiment_buckets '
+                'WHERE country = ? AND granularity = ? AND bucket_start >= ? ORDER BY bucket_start',
+                (country_code, granularity, int(start // size * size))
+            ).fetchall()
+        return [
+            {
+                'start': datetime.fromtimestamp(bucket_start, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'positive': positive,
+                'negative': negative,
+                'neutral': neutral
+            }
+            for bucket_start, positive, negative, neutral in rows
+        ]
+
+    def latest_published(self, country_code):
+        """Get the publish time of the newest stored article for a country, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MAX(published_at) FROM article_countries WHERE country = ?', (country_code,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def stats(self):
+        with self._lock:
+            articles = self._conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+            near_duplicates = self._conn.execute('SELECT COUNT(*) FROM article_aliases').fetchone()[0]
+            countries = self._conn.execute(
+                'SELECT country, COUNT(*) FROM article_countries GROUP BY country'
+            ).fetchall()
+        return {
+            'path': self.path,
+            'articles': articles,
+            'nearDuplicates': near_duplicates,
+            'countries': dict(countries)
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def parse_timestamp(value):
+    """Parse a NewsAPI ISO time (e.g. 2024-05-01T10:00:00Z) to a Unix time, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def fts_query(query):
+    """
+    Turn free text into an FTS5 query matching any word as a prefix
+
+    Args:
+        query: Free-text query
+
+    Returns:
+        FTS5 MATCH expression, or None if the query has no words
+    """
+    words = re.findall(r"\w+", (query or '').lower())
+    if not words:
+        return None
+    return ' OR '.join(f'"{word}"*' for word in dict.fromkeys(words))
+
+
+class NewsIngester:
+    """
+    Polls a news source for every tracked country in a background thread
+
+    Each country is polled once per interval for articles newer than the
+    newest one already stored. Countries can be added while running; a newly
+    tracked country is polled right away. Added countries are kept in LRU
+    order: at most max_tracked of them, each dropped once it has not been
+    requested for idle_ttl seconds. The initial countries are always kept.
+    """
+
+    def __init__(self, store, fetch, countries, interval=21600, max_tracked=50, idle_ttl=604800):
+        """
+        Args:
+            store: NewsStore receiving the articles
+            fetch: Callable (country_code, since) returning raw NewsAPI
+                articles published after since (an ISO time, or None)
+            countries: Initially tracked ISO country codes
+            interval: Seconds between polls of the same country
+            max_tracked: Maximum number of countries added with track
+            idle_ttl: Seconds after its last request an added country is dropped
+        """
+        self.store = store
+        self.fetch = fetch
+        self.interval = interval
+        self.max_tracked = max_tracked
+        self.idle_ttl = idle_ttl
+
+        self._lock = threading.Lock()
+        self._countries = {code: 0 for code in countries}
+        self._pinned = set(self._countries)
+        # Added countries, least recently requested first, to request time
+        self._requested = OrderedDict()
+        self._stats = {'polls': 0, 'failures': 0, 'articlesAdded': 0, 'lastError': None}
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='news-ingester', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def track(self, country_code):
+        """
+        Start tracking a country, or mark a tracked one as requested
+
+        Returns:
+            True if the country was not tracked before
+        """
+        with self._lock:
+            if country_code in self._pinned:
+                return False
+            if country_code in self._requested:
+                self._requested[country_code] = time.time()
+                self._requested.move_to_end(country_code)
+                return False
+            self._countries[country_code] = 0
+            self._requested[country_code] = time.time()
+            while len(self._requested) > self.max_tracked:
+                evicted, _ = self._requested.popitem(last=False)
+                self._countries.pop(evicted, None)
+        self._wake_event.set()
+        return True
+
+    def is_tracked(self, country_code):
+        with self._lock:
+            return country_code in self._countries
+
+    def poll(self, country_code):
+        """Fetch and store new articles for one country now"""
+        try:
+            articles = self.fetch(country_code, self.store.latest_published(country_code))
+            added = self.store.add_articles(country_code, articles)
+        except Exception as e:
+            print(f"Error ingesting news for {country_code}: {str(e)}")
+            with self._lock:
+                self._stats['failures'] += 1
+                self._stats['lastError'] = str(e)
+            added = None
+        else:
+            with self._lock:
+                self._stats['articlesAdded'] += added
+
+        with self._lock:
+            self._stats['polls'] += 1
+            if country_code in self._countries:
+                self._countries[country_code] = time.time()
+        return added
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['trackedCountries'] = sorted(self._countries)
+            stats['requestedCountries'] = len(self._requested)
+        return stats
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            now = time.time()
+            with self._lock:
+                self._drop_idle(now)
+                due = [code for code, polled in self._countries.items() if now - polled >= self.interval]
+                next_due = min(self._countries.values(), default=now) + self.interval
+
+            for country_code in due:
+                if self._stop_event.is_set():
+                    return
+                self.poll(country_code)
+
+            if not due:
+                self._wake_event.wait(max(1, next_due - time.time()))
+
+    def _drop_idle(self, now):
+        # Called with the lock held
+        while self._requested:
+            country_code, requested = next(iter(self._requested.items()))
+            if now - requested < self.idle_ttl:
+                break
+            del self._requested[country_code]
+            self._countries.pop(country_code, None)
@@ -1,15 +1,60 @@
+import asyncio
 import os
 import json
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from .cache_service import get_cached_data, set_cached_data
-
-# Initialize OpenRouter client
-openrouter_api_key = os.environ.get('OPENROUTER_API_KEY')
+from .cache_service import get_or_compute, get_or_compute_async
+from .llm_gateway import openrouter_chat, openrouter_chat_async
 
 # Use the specified model
 MODEL = "mistralai/mistral-small-3.1-24b-instruct:free"
 
+# Sector recommendations are cached separately so a late or failed sector
+# does not force the others to be regenerated
+SECTOR_TTL = 7200  # Cache for 2 hours
+SECTOR_STALE_TTL = 7200  # Serve stale for another 2 hours while refreshing
+
+# Seconds a request waits for each sector before using its fallback; the
+# call keeps running and caches its result for later requests
+NIB_CALL_DEADLINE = float(os.environ.get('NIB_CALL_DEADLINE', 45))
+
+# Sector calls run concurrently on a small dedicated pool
+_nib_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('NIB_WORKERS', 3)),
+    thread_name_prefix='nib'
+)
+
+# Sector calls still running are reused instead of resubmitted, and no more
+# than NIB_MAX_PENDING are queued or running; past that, sectors fall back
+# at once rather than growing the queue behind the workers
+NIB_MAX_PENDING = int(os.environ.get('NIB_MAX_PENDING', 6))
+_pending = {}
+_pending_lock = threading.Lock()
+
+# Sectors with AI recommendations: (result key, sector, prompt)
+SECTORS = [
+    (
+        "sustainable",
+        "Sustainable Finance",
+        """Generate an AI investment recommendation for sustainable finance projects in Nordic and Baltic regions.
+            Focus on green finance, renewable energy, and sustainable infrastructure projects."""
+    ),
+    (
+        "infrastructure",
+        "Infrastructure Development",
+        """Generate an AI investment recommendation for infrastructure development projects in Nordic and Baltic regions.
+            Focus on transportation, energy networks, and digital infrastructure."""
+    ),
+    (
+        "innovation",
+        "Innovation Finance",
+        """Generate an AI investment recommendation for innovation finance projects in Nordic and Baltic regions.
+            Focus on technology startups, research and development, and digital transformation."""
+    )
+]
+
 def get_nib_recommendations():
     """
     Get NIB recommendations
@@ -17,54 +62,118 @@ def get_nib_recommendations():
     Returns:
         NIB recommendations
     """
-    cache_key = "nib_recommendations"
-    cached_data = get_cached_data(cache_key, 7200)  # Cache for 2 hours
+    try:
+        return build_nib_recommendations()
+    except Exception as e:
+        print(f"Error getting NIB recommendations: {str(e)}")
+        return create_fallback_nib_recommendations()
+
+def build_nib_recommendations():
+    """
+    Build NIB recommendations with AI-generated sector recommendations
+    
+    The sectors are requested concurrently. A sector that is not ready
+    within NIB_CALL_DEADLINE of being submitted gets its fallback
+    recommendation, so the response takes about as long as the slowest
+    sector that makes its deadline. A sector call still running for an
+    earlier request is waited on rather than submitted again.
+    
+    Returns:
+        NIB recommendations
+    """
+    submitted = time.time()
+    futures = [
+        (key, sector, submit_sector_recommendation(key, sector, prompt))
+        for key, sector, prompt in SECTORS
+    ]
     
-    if cached_data:
-        return cached_data
+    recommendations = {}
+    for key, sector, future in futures:
+        if future is None:
+            print(f"AI recommendation queue full, skipping {sector}")
+            recommendations[key] = create_fallback_recommendation(sector)
+            continue
+        try:
+            recommendations[key] = future.result(timeout=max(0, submitted + NIB_CALL_DEADLINE - time.time()))
+        except FutureTimeoutError:
+            print(f"AI recommendation for {sector} missed its {NIB_CALL_DEADLINE}s deadline")
+            recommendations[key] = create_fallback_recommendation(sector)
+        except Exception as e:
+            print(f"Error getting AI recommendation for {sector}: {str(e)}")
+            recommendations[key] = create_fallback_recommendation(sector)
     
-    try:
-        # Get basic NIB info
-        basic_info = get_nib_basic_info()
-        
-        # Get AI recommendations
-        sustainable_recommendation = generate_ai_recommendation(
-            "Sustainable Finance",
-            """Generate an AI investment recommendation for sustainable finance projects in Nordic and Baltic regions.
-            Focus on green finance, renewable energy, and sustainable infrastructure projects."""
-        )
-        
-        infrastructure_recommendation = generate_ai_recommendation(
-            "Infrastructure Development",
-            """Generate an AI investment recommendation for infrastructure development projects in Nordic and Baltic regions.
-            Focus on transportation, energy networks, and digital infrastructure."""
-        )
+    return assemble_nib_recommendations(recommendations)
+
+def submit_sector_recommendation(key, sector, prompt):
+    """
+    Start getting a sector recommendation, unless it is still running
+    
+    Args:
+        key: Sector key
+        sector: Investment sector
+        prompt: Prompt for the AI model
         
-        innovation_recommendation = generate_ai_recommendation(
-            "Innovation Finance",
-            """Generate an AI investment recommendation for innovation finance projects in Nordic and Baltic regions.
-            Focus on technology startups, research and development, and digital transformation."""
-        )
+    Returns:
+        Future of get_sector_recommendation, or None if NIB_MAX_PENDING
+        calls are already queued or running
+    """
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        if len(_pending) >= NIB_MAX_PENDING:
+            return None
+        future = _pending[key] = _nib_executor.submit(get_sector_recommendation, key, sector, prompt)
+    
+    future.add_done_callback(lambda _: _finish_pending(key))
+    return future
+
+def _finish_pending(key):
+    with _pending_lock:
+        _pending.pop(key, None)
+
+def get_sector_recommendation(key, sector, prompt):
+    """
+    Get the cached AI recommendation for a sector, generating it on a miss
+    
+    Failures are not cached; they are negative-cached for a short backoff
+    and the caller uses the fallback recommendation.
+    
+    Args:
+        key: Sector key
+        sector: Investment sector
+        prompt: Prompt for the AI model
         
-        # Combine into final result
-        result = {
-            "basic": basic_info,
-            "aiRecommendations": {
-                "sustainable": sustainable_recommendation,
-                "infrastructure": infrastructure_recommendation,
-                "innovation": innovation_recommendation
-            },
-            "analysisDate": datetime.now().strftime("%Y-%m-%d"),
-            "modelDisclaimer": f"Recommendations generated using {MODEL}. These are AI-generated suggestions for informational purposes only and should not be considered financial advice."
-        }
+    Returns:
+        AI recommendation
         
-        # Cache the result
-        set_cached_data(cache_key, result, 7200)  # Cache for 2 hours
+    Raises:
+        Exception: If the recommendation could not be generated
+    """
+    return get_or_compute(
+        f"nib_recommendations_{key}",
+        lambda: generate_ai_recommendation(sector, prompt),
+        SECTOR_TTL,
+        stale_ttl=SECTOR_STALE_TTL,
+        upstream="openrouter"
+    )
+
+def assemble_nib_recommendations(recommendations):
+    """
+    Combine basic NIB info with sector recommendations
+    
+    Args:
+        recommendations: Dictionary of sector key to recommendation
         
-        return result
-    except Exception as e:
-        print(f"Error getting NIB recommendations: {str(e)}")
-        return create_fallback_nib_recommendations()
+    Returns:
+        NIB recommendations
+    """
+    return {
+        "basic": get_nib_basic_info(),
+        "aiRecommendations": recommendations,
+        "analysisDate": datetime.now().strftime("%Y-%m-%d"),
+        "modelDisclaimer": f"Recommendations generated using {MODEL}. These are AI-generated suggestions for informational purposes only and should not be considered financial advice."
+    }
 
 def get_nib_basic_info():
     """
@@ -153,10 +262,27 @@ def generate_ai_recommendation(sector, prompt):
         
     Returns:
         AI recommendation
+        
+    Raises:
+        LLMUnavailableError: If the gateway rejected the call
+        ValueError: If the response holds no usable recommendation
     """
-    try:
-        # Enhance the prompt
-        full_prompt = f"""
+    response = openrouter_chat(build_recommendation_request(sector, prompt))
+    return parse_recommendation_response(response)
+
+def build_recommendation_request(sector, prompt):
+    """
+    Build the OpenRouter request body for a sector recommendation
+    
+    Args:
+        sector: Investment sector
+        prompt: Prompt for the AI model
+        
+    Returns:
+        Request body
+    """
+    # Enhance the prompt
+    full_prompt = f"""
 You are an investment advisor for the Nordic Investment Bank. Your task is to provide a detailed
 investment recommendation for {sector} in the Nordic and Baltic regions.
 
@@ -173,50 +299,50 @@ Format your response as a valid JSON object with the following fields:
 
 The response should be a valid JSON object containing only these fields.
 """
+    
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "user", "content": full_prompt}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+
+def parse_recommendation_response(response):
+    """
+    Parse an OpenRouter response into a sector recommendation
+    
+    Args:
+        response: requests or httpx response
         
-        headers = {
-            "Authorization": f"Bearer {openrouter_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": MODEL,
-            "messages": [
-                {"role": "user", "content": full_prompt}
-            ],
-            "response_format": {"type": "json_object"}
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data
-        )
+    Returns:
+        AI recommendation
         
-        if response.status_code == 200:
-            response_data = response.json()
-            content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-            
-            try:
-                # Parse as JSON
-                recommendation = json.loads(content)
-                
-                # Validate required fields
-                required_fields = ["title", "description", "industry", "riskLevel", "opportunityLevel", "analysis", "keyRecommendation"]
-                for field in required_fields:
-                    if field not in recommendation:
-                        recommendation[field] = f"Missing {field}"
-                
-                return recommendation
-            except json.JSONDecodeError:
-                print(f"Invalid JSON from AI: {content}")
-                return create_fallback_recommendation(sector)
-        else:
-            print(f"Error from OpenRouter API: {response.status_code} - {response.text}")
-            return create_fallback_recommendation(sector)
-    except Exception as e:
-        print(f"Error generating AI recommendation: {str(e)}")
-        return create_fallback_recommendation(sector)
+    Raises:
+        ValueError: If the response is an error or holds no JSON object, so
+            it is not cached
+    """
+    if response.status_code != 200:
+        raise ValueError(f"Error from OpenRouter API: {response.status_code} - {response.text}")
+    
+    response_data = response.json()
+    content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    
+    try:
+        # Parse as JSON
+        recommendation = json.loads(content)
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON from AI: {content}")
+    if not isinstance(recommendation, dict):
+        raise ValueError(f"Unexpected AI response format: {content}")
+    
+    # Validate required fields
+    required_fields = ["title", "description", "industry", "riskLevel", "opportunityLevel", "analysis", "keyRecommendation"]
+    for field in required_fields:
+        if field not in recommendation:
+            recommendation[field] = f"Missing {field}"
+    
+    return recommendation
 
 def create_fallback_recommendation(sector):
     """
@@ -251,13 +377,49 @@ def create_fallback_nib_recommendations():
     Returns:
         Fallback NIB recommendations
     """
-    return {
-        "basic": get_nib_basic_info(),
-        "aiRecommendations": {
-            "sustainable": create_fallback_recommendation("Sustainable Finance"),
-            "infrastructure": create_fallback_recommendation("Infrastructure Development"),
-            "innovation": create_fallback_recommendation("Innovation Finance")
-        },
-        "analysisDate": datetime.now().strftime("%Y-%m-%d"),
-        "modelDisclaimer": f"Recommendations generated using {MODEL}. These are AI-generated suggestions for informational purposes only and should not be considered financial advice."
-    }
\ No newline at end of file
+    return assemble_nib_recommendations({
+        key: create_fallback_recommendation(sector)
+        for key, sector, _ in SECTORS
+    })
+
+async def get_nib_recommendations_async():
+    """Asyncio version of get_nib_recommendations"""
+    try:
+        return await build_nib_recommendations_async()
+    except Exception as e:
+        print(f"Error getting NIB recommendations: {str(e)}")
+        return create_fallback_nib_recommendations()
+
+async def build_nib_recommendations_async():
+    """Asyncio version of build_nib_recommendations, sharing its sector cache entries"""
+    results = await asyncio.gather(*(
+        get_sector_recommendation_within_deadline_async(key, sector, prompt)
+        for key, sector, prompt in SECTORS
+    ))
+    return assemble_nib_recommendations({
+        key: result for (key, _, _), result in zip(SECTORS, results)
+    })
+
+async def get_sector_recommendation_within_deadline_async(key, sector, prompt):
+    """Get a sector recommendation, or its fallback if it misses NIB_CALL_DEADLINE"""
+    # Shielded so a late call still completes and caches its result
+    task = asyncio.ensure_future(get_or_compute_async(
+        f"nib_recommendations_{key}",
+        lambda: generate_ai_recommendation_async(sector, prompt),
+        SECTOR_TTL,
+        stale_ttl=SECTOR_STALE_TTL,
+        upstream="openrouter"
+    ))
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), NIB_CALL_DEADLINE)
+    except asyncio.TimeoutError:
+        print(f"AI recommendation for {sector} missed its {NIB_CALL_DEADLINE}s deadline")
+        return create_fallback_recommendation(sector)
+    except Exception as e:
+        print(f"Error getting AI recommendation for {sector}: {str(e)}")
+        return create_fallback_recommendation(sector)
+
+async def generate_ai_recommendation_async(sector, prompt):
+    """Asyncio version of generate_ai_recommendation"""
+    response = await openrouter_chat_async(build_recommendation_request(sector, prompt))
+    return parse_recommendation_response(response)
@@ -1,17 +1,46 @@
-import os
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
-from .cache_service import get_cached_data, set_cached_data
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from .llm_gateway import mistral_chat
+from .prompt_budget import ContextItem, count_tokens, fit_items, prompt_budget, prompt_query
+from .prompt_cache import get_or_complete, normalize_query
+import hashlib
 import json
+import os
 import random
-
-# Initialize Mistral AI client
-mistral_api_key = os.environ.get('MISTRAL_API_KEY')
-mistral_client = MistralClient(api_key=mistral_api_key)
+import threading
+import time
 
 # Use the specified model
 MISTRAL_MODEL = "mistral-small-3.1-24b-instruct:free"
 
+# Per-project AI analyses
+PROJECT_TTL = 3600  # Cache for 1 hour
+PROJECT_STALE_TTL = 3600  # Serve stale for another hour while refreshing
+
+# Seconds a request waits for each project before using its fallback; the
+# call keeps running and caches its result for later requests
+PROJECT_CALL_DEADLINE = float(os.environ.get('PROJECT_CALL_DEADLINE', 60))
+
+# Project analyses run concurrently on a small dedicated pool
+_project_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PROJECT_WORKERS', 3)),
+    thread_name_prefix='project-risk'
+)
+
+# Analyses still running are reused instead of resubmitted, and no more than
+# PROJECT_MAX_PENDING are queued or running; past that, projects fall back
+# at once rather than growing the queue behind the workers
+PROJECT_MAX_PENDING = int(os.environ.get('PROJECT_MAX_PENDING', 12))
+_pending = {}
+_pending_lock = threading.Lock()
+_project_stats = {
+    'submitted': 0,
+    'reused': 0,
+    'fallbacks': {'deadline': 0, 'error': 0, 'queueFull': 0}
+}
+# Latest projects that fell back, most recent last
+_recent_fallbacks = deque(maxlen=20)
+
 # Project status constants
 PROJECT_STATUS = {
     "FUNDED": "funded",
@@ -89,6 +118,12 @@ def get_projects_risk_analysis(country_code, query):
     """
     Get projects with risk analysis for a specific country
     
+    Every project is analyzed by its own AI call. The calls run
+    concurrently and are cached per project, so unchanged projects come
+    from cache, and a slow or failed analysis only falls back for the
+    project concerned. An analysis still running for an earlier request is
+    waited on rather than submitted again.
+    
     Args:
         country_code: ISO country code
         query: User query
@@ -96,170 +131,275 @@ def get_projects_risk_analysis(country_code, query):
     Returns:
         List of projects with risk analysis
     """
-    cache_key = f"projects_{country_code}_{query}"
-    cached_data = get_cached_data(cache_key, 3600)  # Cache for 1 hour
-    
-    if cached_data:
-        return cached_data
-    
     try:
-        # Get projects for the country (or default if not available)
-        projects = SAMPLE_PROJECTS.get(country_code, SAMPLE_PROJECTS["default"])
-        
-        # Clone the projects to avoid modifying the original data
-        projects_copy = json.loads(json.dumps(projects))
-        
-        # Update projects with AI risk analysis based on the query
-        enhanced_projects = enhance_projects_with_ai(projects_copy, country_code, query)
+        projects = get_country_projects(country_code)
+        submitted = time.time()
+        futures = [submit_project_analysis(project, country_code, query) for project in projects]
         
-        # Cache the result
-        set_cached_data(cache_key, enhanced_projects, 3600)  # Cache for 1 hour
+        for project, future in zip(projects, futures):
+            if future is None:
+                print(f"Risk analysis queue full, skipping project {project['id']}")
+                record_project_fallback(project, country_code, 'queueFull')
+                update_project_risk(project)
+                continue
+            try:
+                analysis = future.result(timeout=max(0, submitted + PROJECT_CALL_DEADLINE - time.time()))
+                apply_risk_analysis(project, analysis)
+            except FutureTimeoutError:
+                print(f"Risk analysis for project {project['id']} missed its {PROJECT_CALL_DEADLINE}s deadline")
+                record_project_fallback(project, country_code, 'deadline')
+                update_project_risk(project)
+            except Exception as e:
+                print(f"Error analyzing project {project['id']}: {str(e)}")
+                record_project_fallback(project, country_code, 'error')
+                
+                # Fallback: update the project with a random risk change
+                update_project_risk(project)
         
-        return enhanced_projects
+        return projects
     except Exception as e:
         print(f"Error getting projects risk analysis: {str(e)}")
         return []
 
-def enhance_projects_with_ai(projects, country_code, query):
+def submit_project_analysis(project, country_code, query):
     """
-    Enhance projects with AI-generated risk analysis
+    Start the risk analysis of a project, unless the same one is still running
     
     Args:
-        projects: List of projects
+        project: Project
         country_code: ISO country code
         query: User query
         
     Returns:
-        Enhanced projects with AI-generated risk analysis
+        Future of get_project_risk_analysis, or None if PROJECT_MAX_PENDING
+        analyses are already queued or running
     """
-    try:
-        # Prepare context for AI
-        context = f"Country: {country_code}\nQuery: {query}\n\nProjects:\n"
+    key = (project['id'], project_content_hash(project), country_code, normalize_query(query))
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            _project_stats['reused'] += 1
+            return future
+        if len(_pending) >= PROJECT_MAX_PENDING:
+            return None
+        # The worker gets its own copy, since a late result must not see
+        # the fallback applied to the caller's project
+        future = _pending[key] = _project_executor.submit(
+            get_project_risk_analysis, json.loads(json.dumps(project)), country_code, query
+        )
+        _project_stats['submitted'] += 1
+    
+    future.add_done_callback(lambda _: _finish_pending(key))
+    return future
+
+def _finish_pending(key):
+    with _pending_lock:
+        _pending.pop(key, None)
+
+def record_project_fallback(project, country_code, reason):
+    """Count a project that got the fallback instead of its AI analysis"""
+    with _pending_lock:
+        _project_stats['fallbacks'][reason] += 1
+        _recent_fallbacks.append({
+            "project": project['id'],
+            "country": country_code,
+            "reason": reason,
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        })
+
+def get_project_stats():
+    """
+    Get project risk analysis statistics
+    
+    Returns:
+        Dictionary with submission and fallback counters, the number of
+        pending analyses and the latest projects that fell back
+    """
+    with _pending_lock:
+        return {
+            **_project_stats,
+            'fallbacks': dict(_project_stats['fallbacks']),
+            'pending': len(_pending),
+            'maxPending': PROJECT_MAX_PENDING,
+            'recentFallbacks': list(_recent_fallbacks)
+        }
+
+def get_country_projects(country_code):
+    """
+    Get the projects for a specific country
+    
+    Args:
+        country_code: ISO country code
         
-        for project in projects:
-            context += f"- {project['name']} ({project['sector']}): {project['description']}\n"
+    Returns:
+        Copy of the country's projects (or the default projects)
+    """
+    projects = SAMPLE_PROJECTS.get(country_code, SAMPLE_PROJECTS["default"])
+    
+    # Clone the projects to avoid modifying the original data
+    return json.loads(json.dumps(projects))
+
+def get_project_risk_analysis(project, country_code, query):
+    """
+    Get the cached AI risk analysis of a project, generating it on a miss
+    
+    Cached by project id, a hash of the project's content, and the prompt
+    fingerprint (which covers the country and the normalized query), so editing one
+    project only invalidates its own analysis.
+    
+    Args:
+        project: Project
+        country_code: ISO country code
+        query: User query
         
-        # Prepare the prompt
-        prompt = f"""
+    Returns:
+        Dictionary with the AI's currentRisk, riskFactors and impactAnalysis
+    """
+    prompt, fingerprint = build_project_prompt(project, country_code, query)
+    return get_or_complete(
+        f"projects_{project['id']}_{project_content_hash(project)}_",
+        prompt,
+        MISTRAL_MODEL,
+        analyze_project_risk,
+        PROJECT_TTL,
+        stale_ttl=PROJECT_STALE_TTL,
+        upstream="mistral",
+        fingerprint=fingerprint
+    )
+
+def project_content_hash(project):
+    """Hash the content of a project"""
+    return hashlib.sha256(json.dumps(project, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def build_project_prompt(project, country_code, query):
+    """
+    Build the Mistral AI prompt for one project, shortening its description to the budget
+    
+    Returns:
+        (prompt, fingerprint): the prompt with the user's query, and the
+        same prompt with the normalized query, for the cache key
+    """
+    query = prompt_query(query)
+    
+    heading = f"{project['name']} ({project['sector']}):"
+    item = ContextItem(f"{heading} {project['description']}", 0, count_tokens(heading))
+    line = fit_items([item], prompt_budget("projects") - count_tokens(render_project_prompt(country_code, query, "")))[0]
+    return render_project_prompt(country_code, query, line), render_project_prompt(country_code, normalize_query(query), line)
+
+def render_project_prompt(country_code, query, project_line):
+    """Render the risk analysis prompt for one project"""
+    # Prepare the prompt
+    prompt = f"""
 You are an expert risk analyst for investment projects. Based on the following information:
 
-{context}
+Country: {country_code}
+Query: {query}
 
-For each project mentioned, analyze potential risks and provide:
+Project: {project_line}
+
+Analyze the potential risks of this project and provide:
 1. An updated risk level (low, medium, high, or critical)
-2. Key risk factors specific to each project (3-5 factors)
+2. Key risk factors specific to the project (3-5 factors)
 3. A brief impact analysis
 
-Format your response as JSON with an array of objects, one for each project, with these fields:
-1. "name": The project name
-2. "currentRisk": The risk level as a string ("low", "medium", "high", or "critical")
-3. "previousRisk": The original risk level (set this to the same as currentRisk for now)
-4. "riskFactors": An array of strings with specific risk factors
-5. "impactAnalysis": A one-paragraph analysis of the project's impact and risk profile
+Format your response as a JSON object with these fields:
+1. "currentRisk": The risk level as a string ("low", "medium", "high", or "critical")
+2. "riskFactors": An array of strings with specific risk factors
+3. "impactAnalysis": A one-paragraph analysis of the project's impact and risk profile
 
 Ensure your response is valid JSON.
 """
+    
+    return prompt
+
+def analyze_project_risk(prompt):
+    """
+    Analyze the risk of one project with Mistral AI
+    
+    Args:
+        prompt: Prompt built by build_project_prompt
         
-        # Call Mistral AI API
-        chat_response = mistral_client.chat(
-            model=MISTRAL_MODEL,
-            messages=[
-                ChatMessage(role="user", content=prompt)
-            ]
-        )
-        
-        # Parse the response
-        response_content = chat_response.choices[0].message.content
+    Returns:
+        Dictionary with the valid fields of the AI analysis
         
-        try:
-            # Try to extract and parse JSON
-            # Look for JSON content
-            json_start = response_content.find('{')
-            json_end = response_content.rfind('}')
-            
-            if json_start >= 0 and json_end > json_start:
-                json_content = response_content[json_start:json_end+1]
-                ai_analysis = json.loads(json_content)
-                
-                # If AI returned an array directly
-                if isinstance(ai_analysis, list):
-                    ai_projects = ai_analysis
-                # If AI wrapped the array in an object
-                elif isinstance(ai_analysis, dict) and any(key in ai_analysis for key in ['projects', 'analysis', 'results']):
-                    for key in ['projects', 'analysis', 'results']:
-                        if key in ai_analysis and isinstance(ai_analysis[key], list):
-                            ai_projects = ai_analysis[key]
-                            break
-                    else:
-                        # Couldn't find an array, use first value if it's a dict with projects
-                        first_key = next(iter(ai_analysis))
-                        if isinstance(ai_analysis[first_key], list):
-                            ai_projects = ai_analysis[first_key]
-                        else:
-                            raise ValueError("Could not find project array in AI response")
-                else:
-                    raise ValueError("Unexpected AI response format")
-                
-                # Update projects with AI analysis
-                for i, project in enumerate(projects):
-                    if i < len(ai_projects):
-                        ai_project = ai_projects[i]
-                        
-                        # Store the previous risk level
-                        project['previousRisk'] = project['currentRisk']
-                        
-                        # Update with AI analysis if available
-                        if 'currentRisk' in ai_project and ai_project['currentRisk'] in RISK_LEVEL.values():
-                            project['currentRisk'] = ai_project['currentRisk']
-                        
-                        if 'riskFactors' in ai_project and isinstance(ai_project['riskFactors'], list):
-                            project['riskFactors'] = ai_project['riskFactors']
-                        
-                        if 'impactAnalysis' in ai_project:
-                            project['impactAnalysis'] = ai_project['impactAnalysis']
-                
-                return projects
-            else:
-                raise ValueError("Could not find JSON content in AI response")
-        except Exception as e:
-            print(f"Error parsing AI response: {str(e)}")
-            print(f"AI response: {response_content}")
-            
-            # Fallback: update projects with random risk changes
-            return update_projects_risk(projects)
-    except Exception as e:
-        print(f"Error enhancing projects with AI: {str(e)}")
+    Raises:
+        ValueError: If the response holds no usable analysis, so it is not cached
+    """
+    # Call Mistral AI API
+    response_content = mistral_chat(prompt, MISTRAL_MODEL, "projects")
+    
+    try:
+        return parse_project_risk(response_content)
+    except ValueError:
+        print(f"AI response: {response_content}")
+        raise
+
+def parse_project_risk(response_content):
+    """Parse the Mistral AI response for one project"""
+    # Look for JSON content
+    json_start = response_content.find('{')
+    json_end = response_content.rfind('}')
+    if json_start < 0 or json_end <= json_start:
+        raise ValueError("Could not find JSON content in AI response")
+    
+    ai_project = json.loads(response_content[json_start:json_end+1])
+    if not isinstance(ai_project, dict):
+        raise ValueError("Unexpected AI response format")
+    
+    analysis = {}
+    if ai_project.get('currentRisk') in RISK_LEVEL.values():
+        analysis['currentRisk'] = ai_project['currentRisk']
+    if isinstance(ai_project.get('riskFactors'), list):
+        analysis['riskFactors'] = ai_project['riskFactors']
+    if isinstance(ai_project.get('impactAnalysis'), str):
+        analysis['impactAnalysis'] = ai_project['impactAnalysis']
+    
+    if not analysis:
+        raise ValueError("No risk analysis fields in AI response")
+    return analysis
+
+def apply_risk_analysis(project, analysis):
+    """
+    Update a project with its AI risk analysis
+    
+    Args:
+        project: Project
+        analysis: Result of get_project_risk_analysis
         
-        # Fallback: update projects with random risk changes
-        return update_projects_risk(projects)
+    Returns:
+        The updated project
+    """
+    # Store the previous risk level
+    project['previousRisk'] = project['currentRisk']
+    project.update(analysis)
+    return project
 
-def update_projects_risk(projects):
+def update_project_risk(project):
     """
-    Update projects with random risk changes (fallback method)
+    Update a project with a random risk change (fallback method)
     
     Args:
-        projects: List of projects
+        project: Project
         
     Returns:
-        Updated projects with risk changes
+        The updated project
     """
     risk_levels = list(RISK_LEVEL.values())
     
-    for project in projects:
-        # Store the previous risk level
-        project['previousRisk'] = project['currentRisk']
-        
-        # Randomly adjust risk level
-        current_index = risk_levels.index(project['currentRisk'])
-        
-        # 30% chance of risk level change
-        if random.random() < 0.3:
-            # 50% chance of increase, 50% chance of decrease
-            if random.random() < 0.5 and current_index < len(risk_levels) - 1:
-                # Increase risk level
-                project['currentRisk'] = risk_levels[current_index + 1]
-            elif current_index > 0:
-                # Decrease risk level
-                project['currentRisk'] = risk_levels[current_index - 1]
+    # Store the previous risk level
+    project['previousRisk'] = project['currentRisk']
+    
+    # Randomly adjust risk level
+    current_index = risk_levels.index(project['currentRisk'])
+    
+    # 30% chance of risk level change
+    if random.random() < 0.3:
+        # 50% chance of increase, 50% chance of decrease
+        if random.random() < 0.5 and current_index < len(risk_levels) - 1:
+            # Increase risk level
+            project['currentRisk'] = risk_levels[current_index + 1]
+        elif current_index > 0:
+            # Decrease risk level
+            project['currentRisk'] = risk_levels[current_index - 1]
     
-    return projects
\ No newline at end of file
+    return project
\ No newline at end of file
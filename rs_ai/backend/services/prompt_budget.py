@@ -0,0 +1,182 @@
+import os
+import re
+from collections import namedtuple
+from .prompt_cache import lemmatize, normalize_query
+
+# Default prompt size limits in tokens; override with PROMPT_BUDGET_<ENDPOINT>
+PROMPT_BUDGETS = {
+    'insights': 1200,
+    'p3': 400,
+    'projects': 500
+}
+
+# Items are cut down to this many tokens at least, or dropped
+MIN_ITEM_TOKENS = 8
+
+# Longest user query rendered into a prompt
+MAX_QUERY_TOKENS = 64
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+# A piece of prompt context. keep is the number of leading tokens that must
+# survive compaction; items with keep=0 may be dropped entirely.
+ContextItem = namedtuple('ContextItem', ['text', 'score', 'keep'], defaults=[0])
+
+
+def prompt_budget(endpoint):
+    """Get the token budget for an endpoint's prompt"""
+    return int(os.environ.get(f"PROMPT_BUDGET_{endpoint.upper()}", PROMPT_BUDGETS[endpoint]))
+
+
+def _piece_tokens(piece):
+    # Short words are usually one token, longer ones split every ~6 characters
+    return 1 + (len(piece) - 1) // 6
+
+
+def count_tokens(text):
+    """
+    Estimate the number of tokens in a text
+
+    Counts words and punctuation marks the way subword tokenizers roughly
+    split English text. Used for budgeting only; logged usage comes from
+    the API when it reports it.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return sum(_piece_tokens(piece) for piece in _PIECE.findall(text or ''))
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    Cut a text down to at most max_tokens tokens
+
+    Args:
+        text: Text to cut
+        max_tokens: Maximum tokens to keep
+
+    Returns:
+        The text, or its leading part followed by an ellipsis
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    # Leave room for the ellipsis, which counts as a token itself
+    used = 0
+    for match in _PIECE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens - 1:
+            return text[:match.start()].rstrip() + '…'
+    return text
+
+
+def prompt_query(query, max_tokens=MAX_QUERY_TOKENS):
+    """Tidy a user query for a prompt: collapse whitespace and cut it to max_tokens"""
+    return truncate_tokens(' '.join((query or '').split()), max_tokens)
+
+
+def query_terms(query):
+    """Get the normalized words of a query, for relevance scoring"""
+    return set(normalize_query(query).split())
+
+
+def relevance(text, terms, position=0, count=1):
+    """
+    Score how relevant a context item is to a query
+
+    Args:
+        text: Item text
+        terms: Query terms from query_terms
+        position: Index of the item in its original order
+        count: Number of items in that order
+
+    Returns:
+        Number of query terms in the text, plus less than 0.5 for earlier
+        positions so ties keep the original ranking
+    """
+    words = {lemmatize(word) for word in re.findall(r"\w+", text.lower())}
+    return len(terms & words) + 0.5 * (1 - position / max(count, 1))
+
+
+def rank_items(texts, query, keep=0):
+    """
+    Turn texts into ContextItems scored against a query
+
+    Args:
+        texts: Item texts in their original order
+        query: User query
+        keep: Leading tokens of each item that must survive compaction
+
+    Returns:
+        List of ContextItem in the original order
+    """
+    terms = query_terms(query)
+    return [
+        ContextItem(text, relevance(text, terms, i, len(texts)), keep)
+        for i, text in enumerate(texts)
+    ]
+
+
+def fit_items(items, budget):
+    """
+    Compact context items to fit a token budget
+
+    The lowest scored items are cut first: truncated when that is enough to
+    fit, otherwise dropped (or cut down to their keep tokens).
+
+    Args:
+        items: List of ContextItem
+        budget: Maximum total tokens
+
+    Returns:
+        List of item texts in the original order, None for dropped items
+    """
+    texts = [item.text for item in items]
+    sizes = [count_tokens(text) for text in texts]
+    excess = sum(sizes) - budget
+
+    for i in sorted(range(len(items)), key=lambda i: items[i].score):
+        if excess <= 0:
+            break
+        floor = max(items[i].keep, MIN_ITEM_TOKENS)
+        if sizes[i] - excess >= floor:
+            texts[i] = truncate_tokens(texts[i], sizes[i] - excess)
+            excess = 0
+        elif items[i].keep:
+            target = min(sizes[i], items[i].keep)
+            texts[i] = truncate_tokens(texts[i], target)
+            excess -= sizes[i] - target
+        else:
+            texts[i] = None
+            excess -= sizes[i]
+
+    return texts
+
+
+def log_completion(endpoint, model, prompt, content, usage=None, seconds=None):
+    """
+    Log the token counts of an LLM call
+
+    Args:
+        endpoint: Endpoint name, e.g. "p3"
+        model: Model name
+        prompt: Prompt sent
+        content: Completion received
+        usage: Usage reported by the API (object or dict with prompt_tokens
+            and completion_tokens), estimated from the texts if missing
+        seconds: Duration of the call
+    """
+    if isinstance(usage, dict):
+        prompt_tokens, completion_tokens = usage.get('prompt_tokens'), usage.get('completion_tokens')
+    else:
+        prompt_tokens, completion_tokens = getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None)
+
+    estimated = prompt_tokens is None or completion_tokens is None
+    if estimated:
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+
+    duration = f" in {seconds:.2f}s" if seconds is not None else ""
+    print(f"LLM {endpoint} ({model}): {prompt_tokens} prompt + {completion_tokens} completion tokens"
+          f"{' (estimated)' if estimated else ''}{duration}")
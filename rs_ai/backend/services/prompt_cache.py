@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from .cache_service import get_or_compute, get_or_compute_async, lookup_cached_data, set_cached_data
+
+# Words that do not change what a query asks for
+STOPWORDS = frozenset("""
+a an and are as at be by for from how in into is it its of on or over the
+their there these this those to what which with within about
+""".split())
+
+
+# Words ending like plurals that are not plurals (or are their own singular)
+SINGULAR_WORDS = frozenset("""
+news series species
+""".split())
+
+
+def lemmatize(word):
+    """
+    Reduce a plural word to its singular form (light, suffix based)
+
+    Only used to match words, never to rewrite text shown to the model.
+    SINGULAR_WORDS and endings that are rarely plurals (status, analysis)
+    are left alone.
+    """
+    if word in SINGULAR_WORDS or word.endswith(('ss', 'us', 'is')):
+        return word
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('sses', 'shes', 'ches', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_query(query):
+    """
+    Canonicalize a user query so equivalent wordings share LLM results
+
+    The canonical form goes into cache fingerprints only; prompts render
+    the user's own wording. Lowercases, drops punctuation and stopwords, singularizes words and
+    collapses whitespace. Word order is kept.
+
+    Args:
+        query: User query
+
+    Returns:
+        Canonical query, or the lowercased query if only stopwords remain
+    """
+    words = re.findall(r"\w+", (query or '').lower())
+    canonical = [lemmatize(word) for word in words if word not in STOPWORDS]
+    return ' '.join(canonical or words)
+
+
+def prompt_key(family, prompt, model):
+    """
+    Get the cache key of an LLM completion
+
+    Args:
+        family: Key prefix, e.g. "p3_"
+        prompt: Fully rendered prompt, or its fingerprint
+        model: Model name
+
+    Returns:
+        Family prefix followed by a hash of the model and prompt
+    """
+    digest = hashlib.sha256(f"{model}\n{prompt}".encode('utf-8')).hexdigest()
+    return f"{family}{digest[:32]}"
+
+
+class PromptCache:
+    """
+    Durable SQLite store of LLM results keyed by prompt fingerprint
+
+    Completions are slow and billed, so unlike the disk cache tier this
+    store is written through immediately and kept apart from the general
+    cache, where entries can be evicted or live in another process.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Database file (its directory is created if missing)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS completions ('
+            'key TEXT PRIMARY KEY, data TEXT NOT NULL, '
+            'timestamp REAL NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.execute('DELETE FROM completions WHERE expires_at <= ?', (time.time(),))
+        self._conn.commit()
+
+    def get(self, key, max_age):
+        """
+        Look up a completion
+
+        Args:
+            key: Prompt key
+            max_age: Maximum age in seconds
+
+        Returns:
+            Stored result, or None if missing or older than max_age
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, timestamp FROM completions WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        if row is None or time.time() - row[1] >= max_age:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, data, ttl):
+        """
+        Store a completion
+
+        Args:
+            key: Prompt key
+            data: JSON-serializable result
+            ttl: Seconds to keep the result
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO completions (key, data, timestamp, expires_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(data), now, now + ttl)
+            )
+            self._conn.commit()
+
+
+# Optional durable store, enabled by pointing LLM_CACHE_DB at a file
+prompt_cache = None
+if os.environ.get('LLM_CACHE_DB'):
+    try:
+        prompt_cache = PromptCache(os.environ['LLM_CACHE_DB'])
+    except Exception as e:
+        print(f"Error opening LLM cache: {str(e)}")
+
+
+def _durable_get(key, max_age):
+    if prompt_cache is None:
+        return None
+    try:
+        return prompt_cache.get(key, max_age)
+    except Exception as e:
+        print(f"Error reading LLM cache: {str(e)}")
+        return None
+
+
+def _durable_set(key, data, ttl):
+    if prompt_cache is None:
+        return
+    try:
+        prompt_cache.set(key, data, ttl)
+    except Exception as e:
+        print(f"Error writing LLM cache: {str(e)}")
+
+
+def get_or_complete(family, prompt, model, complete, max_age=3600, stale_ttl=0, upstream=None, fingerprint=None):
+    """
+    Get an LLM result from cache, running the completion on a miss
+
+    Results are cached under prompt_key of the fingerprint, so any request
+    rendering the same canonical prompt for the same model shares them, and
+    also kept in the durable store so they survive restarts.
+
+    Args:
+        family: Key prefix, e.g. "p3_"
+        prompt: Fully rendered prompt
+        model: Model name
+        complete: Callable taking the prompt and returning the result
+        max_age: Maximum age of fresh data in seconds (default: 1 hour)
+        stale_ttl: Seconds past max_age during which stale data may be served
+        upstream: Name of the upstream service, see get_or_compute
+        fingerprint: Prompt rendered with the normalized query, used for the
+            cache key instead of prompt (default: None, use prompt)
+
+    Returns:
+        Cached or freshly computed result
+    """
+    key = prompt_key(family, fingerprint or prompt, model)
+
+    def compute():
+        data = _durable_get(key, max_age)
+        if data is None:
+            data = complete(prompt)
+            _durable_set(key, data, max_age + stale_ttl)
+        return data
+
+    return get_or_compute(key, compute, max_age, stale_ttl=stale_ttl, upstream=upstream)
+
+
+async def get_or_complete_async(family, prompt, model, complete, max_age=3600, stale_ttl=0, upstream=None, fingerprint=None):
+    """Asyncio version of get_or_complete; complete is a coroutine function"""
+    key = prompt_key(family, fingerprint or prompt, model)
+
+    async def compute():
+        data = _durable_get(key, max_age)
+        if data is None:
+            data = await complete(prompt)
+            _durable_set(key, data, max_age + stale_ttl)
+        return data
+
+    return await get_or_compute_async(key, compute, max_age, stale_ttl=stale_ttl, upstream=upstream)
+
+
+def lookup_completion(key, max_age, stale_ttl=0):
+    """
+    Get a cached LLM result from the cache or the durable store
+
+    Args:
+        key: Prompt key
+        max_age: Maximum age of fresh results in seconds
+        stale_ttl: Seconds past max_age during which a stale result is returned
+
+    Returns:
+        Tuple of (result, stale); result is None if missing or too old
+    """
+    data, stale = lookup_cached_data(key, max_age, stale_ttl)
+    if data is None:
+        data = _durable_get(key, max_age)
+    return data, stale
+
+
+def set_cached_completion(key, data, ttl):
+    """
+    Store an LLM result in the cache and the durable store
+
+    Args:
+        key: Prompt key
+        data: JSON-serializable result
+        ttl: Seconds to keep the result
+    """
+    set_cached_data(key, data, ttl)
+    _durable_set(key, data, ttl)
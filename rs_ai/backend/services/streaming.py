@@ -0,0 +1,152 @@
+import json
+import re
+import threading
+
+
+def format_sse(event, data):
+    """
+    Format a server-sent event with a JSON payload
+
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+
+    Returns:
+        Event text, including the blank line that ends it
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamBroadcast:
+    """
+    Events of one producer, replayed to any number of consumers
+
+    A consumer attaching late first receives every event published so far,
+    so each one sees the whole stream.
+    """
+
+    def __init__(self):
+        self._events = []
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def publish(self, event, data):
+        with self._condition:
+            self._events.append((event, data))
+            self._condition.notify_all()
+
+    def close(self):
+        """Mark the stream as complete, releasing waiting consumers"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def follow(self):
+        """
+        Iterate over the events from the first one until the stream is closed
+
+        Yields:
+            (event, data) pairs
+        """
+        position = 0
+        while True:
+            with self._condition:
+                while position == len(self._events) and not self._closed:
+                    self._condition.wait()
+                events = self._events[position:]
+                closed = self._closed
+            position += len(events)
+            yield from events
+            if closed:
+                return
+
+
+class JsonFieldStream:
+    """
+    Follows top-level string fields of a JSON object while it is generated
+
+    LLM responses asked for JSON arrive token by token. Each call to feed
+    reports the text added to the requested fields since the previous call,
+    so a section can be shown as it is written instead of after the whole
+    object has been received and parsed.
+    """
+
+    def __init__(self, fields):
+        """
+        Args:
+            fields: Names of the string fields to follow
+        """
+        self.fields = list(fields)
+        self.text = ''
+        self._starts = {}
+        self._sent = {field: 0 for field in self.fields}
+        self._complete = set()
+
+    def feed(self, chunk):
+        """
+        Add generated text
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            List of (field, new_text, complete) for fields that changed
+        """
+        self.text += chunk
+        updates = []
+        for field in self.fields:
+            if field in self._complete:
+                continue
+            value, complete = self._value(field)
+            if value is None:
+                continue
+            new_text = value[self._sent[field]:]
+            if new_text or complete:
+                updates.append((field, new_text, complete))
+                self._sent[field] = len(value)
+                if complete:
+                    self._complete.add(field)
+        return updates
+
+    def _value(self, field):
+        """Decode the field's string value received so far"""
+        start = self._starts.get(field)
+        if start is None:
+            match = re.search(rf'"{re.escape(field)}"\s*:\s*"', self.text)
+            if match is None:
+                return None, False
+            start = self._starts[field] = match.end()
+
+        position = start
+        while position < len(self.text):
+            char = self.text[position]
+            if char == '\\':
+                position += 2
+                continue
+            if char == '"':
+                return _decode(self.text[start:position]), True
+            position += 1
+        return _decode(_trim_partial_escape(self.text[start:])), False
+
+
+def _trim_partial_escape(raw):
+    """Drop an escape sequence cut off at the end of the received text"""
+    escape = raw.rfind('\\')
+    if escape == -1:
+        return raw
+    # An even run of backslashes is complete escaped backslashes
+    run = len(raw[:escape + 1]) - len(raw[:escape + 1].rstrip('\\'))
+    if run % 2 == 0:
+        return raw
+    tail = raw[escape + 1:]
+    if tail == '' or (tail[0] == 'u' and len(tail) < 5):
+        return raw[:escape]
+    return raw
+
+
+def _decode(raw):
+    try:
+        # Not strict, since models sometimes put raw newlines in strings
+        return json.loads(f'"{raw}"', strict=False)
+    except json.JSONDecodeError:
+        return raw
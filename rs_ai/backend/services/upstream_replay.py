@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""
+Record/replay stand-in for the upstream HTTP APIs
+
+With UPSTREAM_BASE_URL set, every upstream request (World Bank, NewsAPI,
+Mistral AI, OpenRouter) is sent to {UPSTREAM_BASE_URL}/{host}{path}
+instead. In record mode this server forwards each request to the real
+upstream and saves the exchange as a fixture; in replay mode it answers
+from the fixtures only, after an injected delay, so load tests run offline
+with deterministic responses and controlled latency:
+
+    python -m backend.services.upstream_replay record --fixtures fixtures/upstream
+    python -m backend.services.upstream_replay replay --fixtures fixtures/upstream --latency 0.2 --jitter 0.05
+    UPSTREAM_BASE_URL=http://127.0.0.1:8900 python run.py
+
+API keys are stripped from fixture keys and files, so fixtures recorded
+with one key replay for any other.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+import requests
+
+# Set to the stand-in server's URL to route all upstream traffic through it
+UPSTREAM_BASE_URL = os.environ.get('UPSTREAM_BASE_URL', '').rstrip('/')
+
+# Query parameters and headers that carry credentials
+SECRET_PARAMS = {'apikey', 'api_key', 'key', 'token'}
+FORWARDED_HEADERS = {'authorization', 'x-api-key', 'content-type', 'accept', 'user-agent'}
+
+
+def upstream_url(url):
+    """
+    Get the URL to send an upstream request to
+
+    Args:
+        url: Upstream URL
+
+    Returns:
+        The URL on the stand-in server if UPSTREAM_BASE_URL is set,
+        otherwise the URL unchanged
+    """
+    if not UPSTREAM_BASE_URL or url.startswith(UPSTREAM_BASE_URL):
+        return url
+    parsed = urlparse(url)
+    if not parsed.netloc:
+        return url
+    rewritten = f"{UPSTREAM_BASE_URL}/{parsed.netloc}{parsed.path}"
+    return f"{rewritten}?{parsed.query}" if parsed.query else rewritten
+
+
+def public_query(query):
+    """Sort query parameters and drop credentials"""
+    params = [(name, value) for name, value in parse_qsl(query, keep_blank_values=True) if name.lower() not in SECRET_PARAMS]
+    return urlencode(sorted(params))
+
+
+def canonical_body(body):
+    """Normalize a JSON request body so key order does not matter"""
+    if not body:
+        return ''
+    try:
+        return json.dumps(json.loads(body), sort_keys=True)
+    except ValueError:
+        return body.decode('utf-8', errors='replace')
+
+
+def fixture_key(method, host, path, query, body):
+    """
+    Get the fixture key of a request
+
+    Args:
+        method: HTTP method
+        host: Upstream host
+        path: Request path
+        query: Raw query string
+        body: Request body bytes
+
+    Returns:
+        Hex digest identifying the request
+    """
+    text = '\n'.join([method.upper(), host, path, public_query(query), canonical_body(body)])
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+class FixtureStore:
+    """Recorded exchanges as one JSON file per request, grouped by host"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, host, key):
+        return os.path.join(self.directory, host.replace(':', '_'), f"{key}.json")
+
+    def load(self, host, key):
+        """Get a recorded exchange, or None"""
+        try:
+            with open(self.path(host, key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, host, key, exchange):
+        """Write a recorded exchange atomically"""
+        path = self.path(host, key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(exchange, f, indent=2)
+            os.replace(f"{path}.tmp", path)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Serves /{host}{path} from fixtures, recording them first in record mode"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_upstream()
+
+    def do_POST(self):
+        self.handle_upstream()
+
+    def do_PUT(self):
+        self.handle_upstream()
+
+    def do_DELETE(self):
+        self.handle_upstream()
+
+    def handle_upstream(self):
+        host, _, rest = self.path.lstrip('/').partition('/')
+        parsed = urlparse(f"/{rest}")
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        key = fixture_key(self.command, host, parsed.path, parsed.query, body)
+
+        if self.server.mode == 'record':
+            try:
+                exchange = self.record(host, parsed, body)
+            except requests.RequestException as e:
+                self.send_body(502, 'application/json', json.dumps({"error": f"Upstream request failed: {str(e)}"}))
+                return
+            self.server.store.save(host, key, exchange)
+        else:
+            exchange = self.server.store.load(host, key)
+            if exchange is None:
+                self.send_body(404, 'application/json', json.dumps({
+                    "error": f"No fixture for {self.command} {host}{parsed.path}", "fixture": key
+                }))
+                return
+            time.sleep(self.server.delay(host))
+
+        response = exchange['response']
+        self.send_body(response['status'], response.get('contentType') or 'application/json', response['body'])
+
+    def record(self, host, parsed, body):
+        """Forward the request to the real upstream and describe the exchange"""
+        headers = {name: value for name, value in self.headers.items() if name.lower() in FORWARDED_HEADERS}
+        url = f"https://{host}{parsed.path}" + (f"?{parsed.query}" if parsed.query else "")
+        start = time.time()
+        response = requests.request(self.command, url, headers=headers, data=body or None, timeout=self.server.timeout)
+        return {
+            "request": {
+                "method": self.command,
+                "url": f"https://{host}{parsed.path}?{public_query(parsed.query)}".rstrip('?'),
+                "body": canonical_body(body)
+            },
+            "response": {
+                "status": response.status_code,
+                "contentType": response.headers.get('Content-Type'),
+                "body": response.text
+            },
+            "recordedSeconds": round(time.time() - start, 3)
+        }
+
+    def send_body(self, status, content_type, text):
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Threaded stand-in server holding the mode, fixtures and latency settings"""
+
+    daemon_threads = True
+
+    def __init__(self, address, mode, fixtures, latency=0.0, jitter=0.0, host_latency=None,
+                 seed=None, timeout=120, verbose=False):
+        """
+        Args:
+            address: (host, port) to listen on
+            mode: "record" or "replay"
+            fixtures: Fixture directory
+            latency: Seconds added to every replayed response
+            jitter: Maximum random seconds added on top of latency
+            host_latency: Dictionary of upstream host to latency, overriding latency
+            seed: Seed for the jitter, for repeatable runs
+            timeout: Upstream timeout in record mode
+            verbose: Log every request
+        """
+        super().__init__(address, ReplayHandler)
+        self.mode = mode
+        self.store = FixtureStore(fixtures)
+        self.latency = latency
+        self.jitter = jitter
+        self.host_latency = host_latency or {}
+        self.timeout = timeout
+        self.verbose = verbose
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def delay(self, host):
+        """Get the injected delay for a replayed response"""
+        with self._random_lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0
+        return self.host_latency.get(host, self.latency) + extra
+
+
+def parse_host_latency(values):
+    """Parse HOST=SECONDS options"""
+    latencies = {}
+    for value in values or []:
+        host, _, seconds = value.partition('=')
+        latencies[host] = float(seconds)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record or replay upstream HTTP traffic for RS_AI')
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('--fixtures', default='fixtures/upstream', help='Fixture directory (default: fixtures/upstream)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every replayed response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Maximum random seconds added on top of --latency')
+    parser.add_argument('--host-latency', action='append', metavar='HOST=SECONDS', help='Latency for one upstream host (repeatable)')
+    parser.add_argument('--seed', type=int, help='Seed for the jitter')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        (args.host, args.port),
+        args.mode,
+        args.fixtures,
+        latency=args.latency,
+        jitter=args.jitter,
+        host_latency=parse_host_latency(args.host_latency),
+        seed=args.seed,
+        verbose=args.verbose
+    )
+    print(f"{args.mode.capitalize()}ing upstream traffic on http://{args.host}:{args.port} ({args.fixtures})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,201 +1,523 @@
-import requests
-import json
-from .cache_service import get_cached_data, set_cached_data
+import os
+from .async_http_client import get_async_http
+from .cache_service import (
+    get_or_compute, get_or_compute_async, peek_cached_data, set_cached_data, single_flight, single_flight_async
+)
+from .http_client import http
+from .indicator_matrix import IndicatorMatrix, IndicatorMatrixRefresher, build_indicator_matrix
+from .world_bank_store import open_store
 
 # Base URL for World Bank API
 BASE_URL = "https://api.worldbank.org/v2"
 
-def get_countries():
-    """Get list of countries from World Bank API"""
-    cache_key = "countries"
-    cached_data = get_cached_data(cache_key)
-    
-    if cached_data:
-        return cached_data
+# Map indicator text to World Bank indicator code
+INDICATOR_MAP = {
+    "gdp": "NY.GDP.MKTP.KD.ZG",  # GDP growth (annual %)
+    "inflation": "FP.CPI.TOTL.ZG",  # Inflation, consumer prices (annual %)
+    "unemployment": "SL.UEM.TOTL.ZS",  # Unemployment, total (% of total labor force)
+    "fdi": "BX.KLT.DINV.WD.GD.ZS",  # Foreign direct investment, net inflows (% of GDP)
+    "trade": "NE.TRD.GNFS.ZS"  # Trade (% of GDP)
+}
+
+# Years fetched for every indicator series
+SERIES_START_YEAR = 2000
+SERIES_END_YEAR = 2023
+
+# World Development Indicators source, required for multi-indicator requests
+WDI_SOURCE_ID = 2
+
+# Series are revalidated against the source's last update date once they
+# are older than SERIES_TTL, and kept for up to SERIES_STALE_TTL beyond that
+SERIES_TTL = 86400  # Revalidate after 24 hours
+SERIES_STALE_TTL = int(os.environ.get('WORLD_BANK_SERIES_MAX_AGE', 90 * 86400))
+
+# How often the source's last update date is checked
+SOURCE_CHECK_TTL = int(os.environ.get('WORLD_BANK_SOURCE_CHECK_INTERVAL', 3600))
+
+# Offline snapshot imported with `python -m backend.services.world_bank_store`.
+# When present, stored indicators are served from it and only missing ones
+# go to the API.
+snapshot_store = open_store(os.environ.get('WORLD_BANK_SNAPSHOT_DIR'))
+
+def build_matrix(indicators):
+    """
+    Build the all-country indicator matrix, from the snapshot if it holds
+    every indicator and the country metadata, otherwise from the API
+    """
+    if (snapshot_store is not None and snapshot_store.has_country_metadata
+            and all(indicator in snapshot_store.indicator_index for indicator in indicators)):
+        return IndicatorMatrix(*snapshot_store.matrix_inputs(indicators))
+    return build_indicator_matrix(indicators, SERIES_START_YEAR, SERIES_END_YEAR)
+
+# All-country matrix used for regional/global averages and ranks
+indicator_matrix = IndicatorMatrixRefresher(
+    INDICATOR_MAP.values(),
+    interval=int(os.environ.get('INDICATOR_MATRIX_REFRESH_INTERVAL', 86400)),
+    snapshot_path=os.path.join(os.environ['CACHE_DIR'], 'indicator_matrix.npz') if os.environ.get('CACHE_DIR') else None,
+    builder=build_matrix,
+    version=None if snapshot_store is not None else lambda: get_source_last_updated()
+)
+
+def start_indicator_matrix():
+    """Start the background job that keeps the all-country indicator matrix current"""
+    indicator_matrix.start()
+
+def get_source_last_updated():
+    """
+    Get the date the World Development Indicators source was last updated
     
+    Returns:
+        Last update date string, or None if it could not be fetched
+    """
     try:
-        response = requests.get(
-            f"{BASE_URL}/country?format=json&per_page=300"
+        return get_or_compute(
+            f"wb_source_{WDI_SOURCE_ID}",
+            fetch_source_last_updated,
+            SOURCE_CHECK_TTL,
+            upstream="world_bank"
         )
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Extract relevant country information and filter out aggregates
-        countries = []
-        for country in data[1]:
-            # Skip aggregates and regions
-            if country.get("region", {}).get("value") != "Aggregates":
-                countries.append({
-                    "code": country.get("id"),
-                    "name": country.get("name")
-                })
-        
-        # Sort by country name
-        countries.sort(key=lambda x: x["name"])
-        
-        # Cache the data
-        set_cached_data(cache_key, countries, 86400)  # Cache for 24 hours
-        
-        return countries
+    except Exception as e:
+        print(f"Error fetching World Bank source metadata: {str(e)}")
+        return None
+
+def fetch_source_last_updated():
+    """Fetch the lastupdated date of the WDI source from the World Bank API"""
+    response = http.get(f"{BASE_URL}/sources/{WDI_SOURCE_ID}", params={"format": "json"})
+    response.raise_for_status()
+    
+    return parse_source_last_updated(response.json())
+
+def parse_source_last_updated(data):
+    if len(data) < 2 or not data[1]:
+        raise ValueError(f"Unexpected World Bank response: {data}")
+    return data[1][0].get("lastupdated")
+
+def get_countries():
+    """Get list of countries from World Bank API"""
+    try:
+        return get_or_compute("countries", fetch_countries, 86400, upstream="world_bank")  # Cache for 24 hours
     except Exception as e:
         print(f"Error fetching countries: {str(e)}")
         return []
 
-def get_gdp_growth_data(country_code):
-    """Get GDP growth data for a specific country"""
-    cache_key = f"gdp_growth_{country_code}"
-    cached_data = get_cached_data(cache_key)
+def fetch_countries():
+    """Fetch the list of countries from the World Bank API, excluding aggregates"""
+    response = http.get(
+        f"{BASE_URL}/country?format=json&per_page=300"
+    )
+    response.raise_for_status()
     
-    if cached_data:
-        return cached_data
+    return parse_countries(response.json())
+
+def parse_countries(data):
+    """
+    Extract countries from a World Bank country list response
     
-    try:
-        # Indicator for GDP growth (annual %)
-        indicator = "NY.GDP.MKTP.KD.ZG"
-        
-        response = requests.get(
-            f"{BASE_URL}/country/{country_code}/indicator/{indicator}?format=json&per_page=20&date=2000:2023"
-        )
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Format the data for chart display
-        chart_data = []
-        for entry in data[1]:
-            if entry.get("value") is not None:
-                chart_data.append({
-                    "name": entry.get("date"),
-                    "value": entry.get("value")
-                })
-        
-        # Reverse to get chronological order
-        chart_data.reverse()
+    Args:
+        data: Parsed JSON response
         
-        # Cache the data
-        set_cached_data(cache_key, chart_data, 86400)  # Cache for 24 hours
-        
-        return chart_data
+    Returns:
+        List of countries with code and name, sorted by name
+    """
+    # Extract relevant country information and filter out aggregates
+    countries = []
+    for country in data[1]:
+        # Skip aggregates and regions
+        if country.get("region", {}).get("value") != "Aggregates":
+            countries.append({
+                "code": country.get("id"),
+                "name": country.get("name")
+            })
+    
+    # Sort by country name
+    countries.sort(key=lambda x: x["name"])
+    
+    return countries
+
+def get_gdp_growth_data(country_code):
+    """Get GDP growth data for a specific country"""
+    try:
+        return format_chart_data(get_indicator_series(country_code, INDICATOR_MAP["gdp"]))
     except Exception as e:
         print(f"Error fetching GDP growth data: {str(e)}")
         return []
 
 def get_unemployment_data(country_code):
     """Get unemployment data for a specific country"""
-    cache_key = f"unemployment_{country_code}"
-    cached_data = get_cached_data(cache_key)
+    try:
+        return format_chart_data(get_indicator_series(country_code, INDICATOR_MAP["unemployment"]))
+    except Exception as e:
+        print(f"Error fetching unemployment data: {str(e)}")
+        return []
+
+def format_chart_data(series, years=20):
+    """
+    Format an indicator series for chart display
     
-    if cached_data:
-        return cached_data
+    Args:
+        series: Indicator series as returned by get_indicator_series
+        years: Number of most recent years to include
+        
+    Returns:
+        Chart data points with values, in chronological order
+    """
+    chart_data = []
+    for entry in series["values"][:years]:
+        if entry.get("value") is not None:
+            chart_data.append({
+                "name": entry.get("date"),
+                "value": entry.get("value")
+            })
     
-    try:
-        # Indicator for Unemployment, total (% of total labor force)
-        indicator = "SL.UEM.TOTL.ZS"
+    # Reverse to get chronological order
+    chart_data.reverse()
+    
+    return chart_data
+
+def get_indicator_series(country_code, indicator):
+    """
+    Get one indicator series for a country
+    
+    Served straight from the offline snapshot when it holds the country and
+    indicator. Otherwise the series comes from the cache; on a miss, every
+    indicator in INDICATOR_MAP is fetched for the country in a single batched
+    request and stored as separate per-indicator entries, so the other
+    indicators are already cached when they are asked for.
+    
+    Cached series are tagged with the source's last update date. Once older
+    than SERIES_TTL they are still served while being revalidated in the
+    background: if the source has not been updated since, the cached series
+    is kept and its TTL extended; only otherwise is it refetched.
+    
+    Args:
+        country_code: ISO country code
+        indicator: World Bank indicator code
         
-        response = requests.get(
-            f"{BASE_URL}/country/{country_code}/indicator/{indicator}?format=json&per_page=20&date=2000:2023"
-        )
-        response.raise_for_status()
+    Returns:
+        Dictionary with the country name and yearly values, most recent first
+    """
+    if snapshot_store is not None and snapshot_store.has(country_code, indicator):
+        return snapshot_store.series(country_code, indicator, SERIES_START_YEAR, SERIES_END_YEAR)
+    
+    key = f"wb_series_{country_code}_{indicator}"
+    
+    def revalidate_or_load():
+        cached = peek_cached_data(key)
+        last_updated = get_source_last_updated()
+        if cached is not None and last_updated and cached.get("sourceLastUpdated") == last_updated:
+            # Source unchanged, storing it again extends the TTL
+            return cached
         
-        data = response.json()
+        series = load_country_indicators(country_code)
+        if indicator in series:
+            return series[indicator]
+        # Not part of the batch, fetch it on its own
+        return dict(fetch_country_indicators(country_code, [indicator])[indicator], sourceLastUpdated=last_updated)
+    
+    return get_or_compute(
+        key,
+        revalidate_or_load,
+        SERIES_TTL,
+        stale_ttl=SERIES_STALE_TTL,
+        upstream="world_bank"
+    )
+
+def load_country_indicators(country_code):
+    """
+    Fetch all batched indicators for a country and cache each series
+    
+    Concurrent callers for the same country share a single upstream request.
+    Every series is tagged with the source's last update date.
+    
+    Args:
+        country_code: ISO country code
         
-        # Format the data for chart display
-        chart_data = []
-        for entry in data[1]:
-            if entry.get("value") is not None:
-                chart_data.append({
-                    "name": entry.get("date"),
-                    "value": entry.get("value")
-                })
+    Returns:
+        Dictionary of indicator code to series
+    """
+    def fetch_and_split():
+        # Read before fetching, so an update landing mid-fetch is picked up next time
+        last_updated = get_source_last_updated()
+        series = fetch_country_indicators(country_code, list(INDICATOR_MAP.values()))
+        for indicator, indicator_series in series.items():
+            indicator_series["sourceLastUpdated"] = last_updated
+            set_cached_data(f"wb_series_{country_code}_{indicator}", indicator_series, SERIES_TTL + SERIES_STALE_TTL)
+        return series
+    
+    return single_flight(f"wb_batch_{country_code}", fetch_and_split)
+
+def fetch_country_indicators(country_code, indicators):
+    """
+    Fetch several indicators for a country in one World Bank API request
+    
+    Args:
+        country_code: ISO country code
+        indicators: List of World Bank indicator codes
         
-        # Reverse to get chronological order
-        chart_data.reverse()
+    Returns:
+        Dictionary of indicator code to series. Every requested indicator is
+        present; indicators without data have an empty value list.
+    """
+    series = {indicator: {"country": country_code, "values": []} for indicator in indicators}
+    
+    page = 1
+    pages = 1
+    while page <= pages:
+        response = http.get(
+            f"{BASE_URL}/country/{country_code}/indicator/{';'.join(indicators)}",
+            params=indicator_page_params(page)
+        )
+        response.raise_for_status()
         
-        # Cache the data
-        set_cached_data(cache_key, chart_data, 86400)  # Cache for 24 hours
+        pages = add_indicator_page(series, response.json(), country_code)
+        page += 1
+    
+    return sort_series(series)
+
+def indicator_page_params(page):
+    return {
+        "format": "json",
+        "source": WDI_SOURCE_ID,
+        "date": f"{SERIES_START_YEAR}:{SERIES_END_YEAR}",
+        "per_page": 1000,
+        "page": page
+    }
+
+def add_indicator_page(series, data, country_code):
+    """
+    Add one page of a multi-indicator response to the series
+    
+    Args:
+        series: Dictionary of indicator code to series, updated in place
+        data: Parsed JSON response page
+        country_code: ISO country code
         
-        return chart_data
-    except Exception as e:
-        print(f"Error fetching unemployment data: {str(e)}")
-        return []
+    Returns:
+        Total number of pages
+    """
+    if len(data) < 2:
+        # The API reports errors such as unknown countries as a message list
+        raise ValueError(f"Unexpected World Bank response: {data}")
+    
+    for entry in data[1] or []:
+        indicator = entry.get("indicator", {}).get("id")
+        if indicator not in series:
+            continue
+        series[indicator]["country"] = entry.get("country", {}).get("value", country_code)
+        series[indicator]["values"].append({
+            "date": entry.get("date"),
+            "value": entry.get("value")
+        })
+    return data[0].get("pages", 1)
+
+def sort_series(series):
+    # Most recent year first, matching the single-indicator API
+    for indicator_series in series.values():
+        indicator_series["values"].sort(key=lambda x: x["date"], reverse=True)
+    return series
 
 def get_country_comparison(country_code, indicator="gdp"):
     """Get comparative data for a country versus regional and global averages"""
-    cache_key = f"comparison_{country_code}_{indicator}"
-    cached_data = get_cached_data(cache_key)
-    
-    if cached_data:
-        return cached_data
-    
     try:
-        # Map indicator text to World Bank indicator code
-        indicator_map = {
-            "gdp": "NY.GDP.MKTP.KD.ZG",  # GDP growth (annual %)
-            "inflation": "FP.CPI.TOTL.ZG",  # Inflation, consumer prices (annual %)
-            "unemployment": "SL.UEM.TOTL.ZS",  # Unemployment, total (% of total labor force)
-            "fdi": "BX.KLT.DINV.WD.GD.ZS",  # Foreign direct investment, net inflows (% of GDP)
-            "trade": "NE.TRD.GNFS.ZS"  # Trade (% of GDP)
-        }
-        
         # Default to GDP if indicator is not in the map
-        wb_indicator = indicator_map.get(indicator, "NY.GDP.MKTP.KD.ZG")
-        
-        # Get country data
-        response = requests.get(
-            f"{BASE_URL}/country/{country_code}/indicator/{wb_indicator}?format=json&per_page=5&date=2018:2023"
-        )
-        response.raise_for_status()
-        
-        data = response.json()
+        wb_indicator = INDICATOR_MAP.get(indicator, INDICATOR_MAP["gdp"])
+        series = get_indicator_series(country_code, wb_indicator)
+        return build_country_comparison(country_code, wb_indicator, series)
+    except Exception as e:
+        print(f"Error fetching comparison data: {str(e)}")
+        return []
+
+def get_global_rank(country_code, indicator="gdp"):
+    """
+    Get a country's global rank for an indicator in its most recent year
+    
+    Args:
+        country_code: ISO country code
+        indicator: Indicator name from INDICATOR_MAP
         
-        # Get regional and global data (this would require additional API calls in a real implementation)
-        # For this example, we'll use placeholder values
-        comparison_data = []
+    Returns:
+        Rank (1 is the highest value) or None if not available
+    """
+    matrix = indicator_matrix.matrix
+    if matrix is None:
+        return None
+    comparison = matrix.compare(country_code, INDICATOR_MAP.get(indicator, INDICATOR_MAP["gdp"]))
+    return comparison["globalRank"] if comparison else None
+
+def build_country_comparison(country_code, indicator, series, since_year=2018):
+    """
+    Build comparison chart data from an indicator series
+    
+    Regional and global averages come from the precomputed all-country
+    indicator matrix for the same year. They are left out until the matrix
+    has been built.
+    
+    Args:
+        country_code: ISO country code
+        indicator: World Bank indicator code
+        series: Indicator series as returned by get_indicator_series
+        since_year: Earliest year considered for the most recent value
         
-        # Get the most recent year with data
-        recent_year = None
-        country_value = None
+    Returns:
+        Comparison data for the country, its region and the world
+    """
+    comparison_data = []
+    
+    # Get the most recent year with data
+    recent_year = None
+    country_value = None
+    
+    for entry in series["values"]:
+        if int(entry["date"]) < since_year:
+            break
+        if entry.get("value") is not None:
+            recent_year = entry.get("date")
+            country_value = entry.get("value")
+            break
+    
+    if recent_year and country_value is not None:
+        matrix = indicator_matrix.matrix
+        averages = matrix.compare(country_code, indicator, recent_year) if matrix is not None else None
         
-        for entry in data[1]:
-            if entry.get("value") is not None:
-                recent_year = entry.get("date")
-                country_value = entry.get("value")
-                break
+        # Add country data
+        comparison_data.append({
+            "name": series.get("country", "Country"),
+            "value": country_value,
+            "average": 0,  # Will be replaced with actual average
+            "globalRank": averages["globalRank"] if averages else None
+        })
         
-        if recent_year and country_value is not None:
-            # Add country data
-            comparison_data.append({
-                "name": data[1][0].get("country", {}).get("value", "Country"),
-                "value": country_value,
-                "average": 0  # Will be replaced with actual average
-            })
-            
-            # Add regional and global data (placeholders)
-            region_value = country_value * 0.9  # Simulate regional value as 90% of country value
-            global_value = country_value * 0.8  # Simulate global value as 80% of country value
-            
+        if averages and averages["regionValue"] is not None:
             comparison_data.append({
                 "name": "Regional Average",
-                "value": region_value,
+                "value": averages["regionValue"],
                 "average": country_value
             })
-            
+        
+        if averages and averages["globalValue"] is not None:
             comparison_data.append({
                 "name": "Global Average",
-                "value": global_value,
+                "value": averages["globalValue"],
                 "average": country_value
             })
-            
-            # Calculate the average for reference line
-            average = sum(item["value"] for item in comparison_data) / len(comparison_data)
-            for item in comparison_data:
-                item["average"] = average
-        
-        # Cache the data
-        set_cached_data(cache_key, comparison_data, 86400)  # Cache for 24 hours
         
-        return comparison_data
+        # Calculate the average for reference line
+        average = sum(item["value"] for item in comparison_data) / len(comparison_data)
+        for item in comparison_data:
+            item["average"] = average
+    
+    return comparison_data
+
+# Asyncio versions, for callers running on an event loop
+
+async def get_countries_async():
+    """Asyncio version of get_countries"""
+    async def fetch():
+        response = await get_async_http().get(f"{BASE_URL}/country?format=json&per_page=300", "world_bank")
+        response.raise_for_status()
+        return parse_countries(response.json())
+    
+    try:
+        return await get_or_compute_async("countries", fetch, 86400, upstream="world_bank")
+    except Exception as e:
+        print(f"Error fetching countries: {str(e)}")
+        return []
+
+async def get_gdp_growth_data_async(country_code):
+    """Asyncio version of get_gdp_growth_data"""
+    try:
+        return format_chart_data(await get_indicator_series_async(country_code, INDICATOR_MAP["gdp"]))
+    except Exception as e:
+        print(f"Error fetching GDP growth data: {str(e)}")
+        return []
+
+async def get_unemployment_data_async(country_code):
+    """Asyncio version of get_unemployment_data"""
+    try:
+        return format_chart_data(await get_indicator_series_async(country_code, INDICATOR_MAP["unemployment"]))
+    except Exception as e:
+        print(f"Error fetching unemployment data: {str(e)}")
+        return []
+
+async def get_country_comparison_async(country_code, indicator="gdp"):
+    """Asyncio version of get_country_comparison"""
+    try:
+        wb_indicator = INDICATOR_MAP.get(indicator, INDICATOR_MAP["gdp"])
+        series = await get_indicator_series_async(country_code, wb_indicator)
+        return build_country_comparison(country_code, wb_indicator, series)
     except Exception as e:
         print(f"Error fetching comparison data: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+async def get_source_last_updated_async():
+    """Asyncio version of get_source_last_updated"""
+    async def fetch():
+        response = await get_async_http().get(
+            f"{BASE_URL}/sources/{WDI_SOURCE_ID}", "world_bank", params={"format": "json"}
+        )
+        response.raise_for_status()
+        return parse_source_last_updated(response.json())
+    
+    try:
+        return await get_or_compute_async(f"wb_source_{WDI_SOURCE_ID}", fetch, SOURCE_CHECK_TTL, upstream="world_bank")
+    except Exception as e:
+        print(f"Error fetching World Bank source metadata: {str(e)}")
+        return None
+
+async def get_indicator_series_async(country_code, indicator):
+    """Asyncio version of get_indicator_series, sharing its cache entries"""
+    if snapshot_store is not None and snapshot_store.has(country_code, indicator):
+        return snapshot_store.series(country_code, indicator, SERIES_START_YEAR, SERIES_END_YEAR)
+    
+    key = f"wb_series_{country_code}_{indicator}"
+    
+    async def revalidate_or_load():
+        cached = peek_cached_data(key)
+        last_updated = await get_source_last_updated_async()
+        if cached is not None and last_updated and cached.get("sourceLastUpdated") == last_updated:
+            return cached
+        
+        series = await load_country_indicators_async(country_code)
+        if indicator in series:
+            return series[indicator]
+        single = await fetch_country_indicators_async(country_code, [indicator])
+        return dict(single[indicator], sourceLastUpdated=last_updated)
+    
+    return await get_or_compute_async(
+        key,
+        revalidate_or_load,
+        SERIES_TTL,
+        stale_ttl=SERIES_STALE_TTL,
+        upstream="world_bank"
+    )
+
+async def load_country_indicators_async(country_code):
+    """Asyncio version of load_country_indicators"""
+    async def fetch_and_split():
+        last_updated = await get_source_last_updated_async()
+        series = await fetch_country_indicators_async(country_code, list(INDICATOR_MAP.values()))
+        for indicator, indicator_series in series.items():
+            indicator_series["sourceLastUpdated"] = last_updated
+            set_cached_data(f"wb_series_{country_code}_{indicator}", indicator_series, SERIES_TTL + SERIES_STALE_TTL)
+        return series
+    
+    return await single_flight_async(f"wb_batch_{country_code}", fetch_and_split)
+
+async def fetch_country_indicators_async(country_code, indicators):
+    """Asyncio version of fetch_country_indicators"""
+    series = {indicator: {"country": country_code, "values": []} for indicator in indicators}
+    
+    page = 1
+    pages = 1
+    while page <= pages:
+        response = await get_async_http().get(
+            f"{BASE_URL}/country/{country_code}/indicator/{';'.join(indicators)}",
+            "world_bank",
+            params=indicator_page_params(page)
+        )
+        response.raise_for_status()
+        
+        pages = add_indicator_page(series, response.json(), country_code)
+        page += 1
+    
+    return sort_series(series)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""
+Offline World Bank indicator store
+
+Imports World Bank bulk CSV exports (the WDI_CSV.zip bundle or per-indicator
+API_<code>_DS2_en_csv_v2.zip downloads, zipped or extracted) into a compact
+columnar directory:
+
+    values.npy      float64 array (indicators x countries x years), NaN = missing
+    index.json      indicator, country and year axes plus country metadata
+
+The array is memory-mapped when the store is opened, so a lookup touches only
+the handful of pages it needs. Usage:
+
+    python -m backend.services.world_bank_store --out data/world_bank WDI_CSV.zip
+    WORLD_BANK_SNAPSHOT_DIR=data/world_bank python run.py
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import zipfile
+import numpy as np
+
+VALUES_FILE = 'values.npy'
+INDEX_FILE = 'index.json'
+
+
+def iter_csv_sources(paths):
+    """
+    Yield (name, text stream opener) for every CSV in the given files
+
+    Args:
+        paths: CSV files, ZIP archives or directories
+
+    Yields:
+        Tuples of (file name, zero-argument callable returning a text stream)
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            children = sorted(os.path.join(path, name) for name in os.listdir(path))
+            yield from iter_csv_sources(children)
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                names = [n for n in archive.namelist() if n.lower().endswith('.csv')]
+            for name in names:
+                yield name, (lambda p=path, n=name: open_zip_member(p, n))
+        elif path.lower().endswith('.csv'):
+            yield os.path.basename(path), (lambda p=path: open(p, encoding='utf-8-sig', newline=''))
+
+
+def open_zip_member(path, name):
+    """
+    Open a CSV inside a ZIP archive as a text stream
+
+    The archive is closed on return; its file stays open only until the
+    member stream is closed.
+    """
+    with zipfile.ZipFile(path) as archive:
+        return io.TextIOWrapper(archive.open(name), encoding='utf-8-sig', newline='')
+
+
+def read_table(open_stream):
+    """
+    Read a World Bank CSV, skipping any preamble before the header row
+
+    Args:
+        open_stream: Callable returning a text stream
+
+    Yields:
+        Header list first, then data rows
+    """
+    with open_stream() as stream:
+        reader = csv.reader(stream)
+        header = None
+        for row in reader:
+            if header is None:
+                if row and row[0] in ('Country Name', 'Country Code'):
+                    header = [c.strip() for c in row]
+                    yield header
+                continue
+            if row:
+                yield row
+
+
+def classify(header):
+    """Tell data tables ('data') from country metadata tables ('countries')"""
+    if 'Indicator Code' in header and 'Country Code' in header:
+        return 'data'
+    if 'Country Code' in header and 'Region' in header:
+        return 'countries'
+    return None
+
+
+def import_world_bank_export(paths, out_dir, indicators=None):
+    """
+    Import World Bank bulk CSV exports into a columnar store
+
+    Args:
+        paths: CSV files, ZIP archives or directories
+        out_dir: Output directory (created if missing)
+        indicators: Optional list of indicator codes to keep (default: all)
+
+    Returns:
+        Dictionary with the number of indicators, countries and years stored
+    """
+    wanted = set(indicators) if indicators else None
+    sources = list(iter_csv_sources(paths))
+
+    # First pass: discover axes and country metadata
+    indicator_codes = {}
+    country_names = {}
+    country_meta = {}
+    years = set()
+    data_sources = []
+    for name, open_stream in sources:
+        rows = read_table(open_stream)
+        header = next(rows, None)
+        kind = classify(header) if header else None
+
+        if kind == 'countries':
+            code_col = header.index('Country Code')
+            region_col = header.index('Region')
+            income_col = next((header.index(c) for c in ('Income Group', 'IncomeGroup') if c in header), None)
+            for row in rows:
+                country_meta[row[code_col]] = {
+                    'region': row[region_col] or None,
+                    'incomeLevel': (row[income_col] or None) if income_col is not None else None
+                }
+        elif kind == 'data':
+            data_sources.append(open_stream)
+            year_cols = [c for c in header if c.isdigit()]
+            years.update(int(y) for y in year_cols)
+            name_col = header.index('Country Name')
+            code_col = header.index('Country Code')
+            ind_name_col = header.index('Indicator Name')
+            ind_code_col = header.index('Indicator Code')
+            for row in rows:
+                if wanted is not None and row[ind_code_col] not in wanted:
+                    continue
+                indicator_codes[row[ind_code_col]] = row[ind_name_col]
+                country_names[row[code_col]] = row[name_col]
+
+    if not indicator_codes:
+        raise ValueError("No indicator data found in the given files")
+
+    indicator_list = sorted(indicator_codes)
+    country_list = sorted(country_names)
+    year_list = list(range(min(years), max(years) + 1))
+    indicator_index = {code: i for i, code in enumerate(indicator_list)}
+    country_index = {code: i for i, code in enumerate(country_list)}
+
+    os.makedirs(out_dir, exist_ok=True)
+    values_path = os.path.join(out_dir, VALUES_FILE)
+    values = np.lib.format.open_memmap(
+        values_path + '.tmp', mode='w+', dtype=np.float64,
+        shape=(len(indicator_list), len(country_list), len(year_list))
+    )
+    values[:] = np.nan
+
+    # Second pass: fill values
+    for open_stream in data_sources:
+        rows = read_table(open_stream)
+        header = next(rows)
+        code_col = header.index('Country Code')
+        ind_code_col = header.index('Indicator Code')
+        year_cols = [(i, int(c) - year_list[0]) for i, c in enumerate(header) if c.isdigit()]
+        for row in rows:
+            ind = indicator_index.get(row[ind_code_col])
+            if ind is None:
+                continue
+            country = country_index[row[code_col]]
+            for col, year_offset in year_cols:
+                if col < len(row) and row[col] != '':
+                    values[ind, country, year_offset] = float(row[col])
+
+    values.flush()
+    del values
+    os.replace(values_path + '.tmp', values_path)
+
+    index = {
+        'indicators': [{'code': code, 'name': indicator_codes[code]} for code in indicator_list],
+        'countries': [
+            dict({'code': code, 'name': country_names[code]}, **country_meta.get(code, {}))
+            for code in country_list
+        ],
+        'years': year_list,
+        'hasCountryMetadata': bool(country_meta)
+    }
+    with open(os.path.join(out_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f)
+
+    return {'indicators': len(indicator_list), 'countries': len(country_list), 'years': len(year_list)}
+
+
+class WorldBankStore:
+    """Read-only, memory-mapped view of an imported World Bank snapshot"""
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Directory written by import_world_bank_export
+        """
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            index = json.load(f)
+
+        self.directory = directory
+        self.values = np.load(os.path.join(directory, VALUES_FILE), mmap_mode='r')
+        self.indicators = [i['code'] for i in index['indicators']]
+        self.countries = index['countries']
+        self.years = index['years']
+        self.has_country_metadata = index.get('hasCountryMetadata', False)
+
+        self.indicator_index = {code: i for i, code in enumerate(self.indicators)}
+        self.country_index = {c['code']: i for i, c in enumerate(self.countries)}
+
+    def has(self, country_code, indicator):
+        return country_code in self.country_index and indicator in self.indicator_index
+
+    def series(self, country_code, indicator, start_year=None, end_year=None):
+        """
+        Get one indicator series for a country
+
+        Args:
+            country_code: ISO3 country code
+            indicator: World Bank indicator code
+            start_year: First year included (default: first stored year)
+            end_year: Last year included (default: last stored year)
+
+        Returns:
+            Dictionary with the country name and yearly values, most recent
+            first (the same shape as the API-backed series), or None if the
+            country or indicator is not stored
+        """
+        if not self.has(country_code, indicator):
+            return None
+
+        first = self.years[0]
+        lo = max(0, (start_year or first) - first)
+        hi = min(len(self.years), (end_year or self.years[-1]) - first + 1)
+        row = self.values[self.indicator_index[indicator], self.country_index[country_code], lo:hi]
+
+        values = []
+        for offset in range(len(row) - 1, -1, -1):
+            value = row[offset]
+            values.append({
+                'date': str(first + lo + offset),
+                'value': None if np.isnan(value) else float(value)
+            })
+        return {
+            'country': self.countries[self.country_index[country_code]]['name'],
+            'values': values
+        }
+
+    def matrix_inputs(self, indicators):
+        """
+        Get the inputs for an IndicatorMatrix, excluding aggregates
+
+        Aggregates (World, regions, income groups) have no region in the
+        World Bank country metadata and are left out.
+
+        Args:
+            indicators: World Bank indicator codes; all must be stored
+
+        Returns:
+            Tuple of (countries, years, values) for IndicatorMatrix
+        """
+        rows = [i for i, c in enumerate(self.countries) if c.get('region')]
+        countries = [self.countries[i] for i in rows]
+        values = {
+            indicator: np.asarray(self.values[self.indicator_index[indicator]][rows])
+            for indicator in indicators
+        }
+        return countries, self.years, values
+
+
+def open_store(directory):
+    """
+    Open a snapshot store if one exists
+
+    Args:
+        directory: Store directory, or None
+
+    Returns:
+        WorldBankStore or None
+    """
+    if not directory or not os.path.exists(os.path.join(directory, INDEX_FILE)):
+        return None
+    try:
+        return WorldBankStore(directory)
+    except Exception as e:
+        print(f"Error opening World Bank snapshot {directory}: {str(e)}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import World Bank bulk CSV exports into an offline store')
+    parser.add_argument('paths', nargs='+', help='CSV files, ZIP archives or directories')
+    parser.add_argument(
+        '--out',
+        default=os.environ.get('WORLD_BANK_SNAPSHOT_DIR', 'data/world_bank'),
+        help='Output directory'
+    )
+    parser.add_argument('--indicators', help='Comma-separated indicator codes to keep (default: all)')
+    args = parser.parse_args()
+
+    indicators = args.indicators.split(',') if args.indicators else None
+    result = import_world_bank_export(args.paths, args.out, indicators)
+    print(f"Imported {result['indicators']} indicators x {result['countries']} countries x {result['years']} years into {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 let currentCountry = null;
 let currentQuery = null;
 let analysisData = null;
+let p3EventSource = null;
 
 // DOM elements
 const countrySelect = document.getElementById('country-select');
@@ -500,10 +501,57 @@ async function fetchClimateData(countryCode) {
 }
 
 // Fetch and update P3 Strategy tab
-async function fetchP3Data(countryCode, query) {
+function fetchP3Data(countryCode, query) {
     const p3Content = document.getElementById('p3-content');
     p3Content.innerHTML = '<div class="text-center my-5"><div class="spinner-border text-primary" role="status"></div><p class="mt-2">Loading P3 strategy data...</p></div>';
     
+    if (p3EventSource) {
+        p3EventSource.close();
+        p3EventSource = null;
+    }
+    
+    if (!window.EventSource) {
+        fetchP3DataOnce(countryCode, query);
+        return;
+    }
+    
+    // Render each section as the model writes it
+    const source = new EventSource(`/api/p3/${countryCode}/stream?query=${encodeURIComponent(query)}`);
+    p3EventSource = source;
+    let started = false;
+    
+    source.addEventListener('section', (event) => {
+        const data = JSON.parse(event.data);
+        if (!started) {
+            p3Content.innerHTML = renderP3Sections({}, '');
+            started = true;
+        }
+        const paragraph = p3Content.querySelector(`.p3-section.${data.section} p`);
+        if (paragraph) {
+            paragraph.textContent += data.text;
+        }
+    });
+    
+    source.addEventListener('done', (event) => {
+        source.close();
+        p3EventSource = null;
+        p3Content.innerHTML = renderP3Sections(JSON.parse(event.data));
+    });
+    
+    source.onerror = () => {
+        // Closed before the result arrived; fall back to the regular request
+        source.close();
+        if (p3EventSource === source) {
+            p3EventSource = null;
+            fetchP3DataOnce(countryCode, query);
+        }
+    };
+}
+
+// Fetch the P3 Strategy tab in a single request
+async function fetchP3DataOnce(countryCode, query) {
+    const p3Content = document.getElementById('p3-content');
+    
     try {
         const response = await fetch(`/api/p3/${countryCode}?query=${encodeURIComponent(query)}`);
         
@@ -513,22 +561,7 @@ async function fetchP3Data(countryCode, query) {
         
         const data = await response.json();
         
-        let html = `
-            <div class="p3-section predict">
-                <h4>PREDICT - Identifying Potential Risks</h4>
-                <p>${data.predict || 'No prediction data available.'}</p>
-            </div>
-            <div class="p3-section prevent">
-                <h4>PREVENT - Mitigating Strategies</h4>
-                <p>${data.prevent || 'No prevention data available.'}</p>
-            </div>
-            <div class="p3-section protect">
-                <h4>PROTECT - Response Mechanisms</h4>
-                <p>${data.protect || 'No protection data available.'}</p>
-            </div>
-        `;
-        
-        p3Content.innerHTML = html;
+        p3Content.innerHTML = renderP3Sections(data);
         
     } catch (error) {
         console.error('Error fetching P3 data:', error);
@@ -536,6 +569,24 @@ async function fetchP3Data(countryCode, query) {
     }
 }
 
+// Build the P3 sections; missing sections show placeholder or a default message
+function renderP3Sections(data, placeholder) {
+    return `
+        <div class="p3-section predict">
+            <h4>PREDICT - Identifying Potential Risks</h4>
+            <p>${data.predict || (placeholder ?? 'No prediction data available.')}</p>
+        </div>
+        <div class="p3-section prevent">
+            <h4>PREVENT - Mitigating Strategies</h4>
+            <p>${data.prevent || (placeholder ?? 'No prevention data available.')}</p>
+        </div>
+        <div class="p3-section protect">
+            <h4>PROTECT - Response Mechanisms</h4>
+            <p>${data.protect || (placeholder ?? 'No protection data available.')}</p>
+        </div>
+    `;
+}
+
 // Fetch and update Risk Scenarios tab
 async function fetchRiskScenariosData(countryCode, query) {
     const riskContent = document.getElementById('risk-content');
@@ -901,22 +952,27 @@ async function askFollowUpQuestion(question) {
 // Fetch and update economic charts
 async function fetchEconomicCharts(countryCode) {
     try {
-        // Fetch GDP data
-        const gdpResponse = await fetch(`/api/gdp/${countryCode}`);
+        // Request all three series together; the backend answers them from a
+        // single batched World Bank fetch per country
+        const [gdpResponse, unemploymentResponse, comparisonResponse] = await Promise.all([
+            fetch(`/api/gdp/${countryCode}`),
+            fetch(`/api/unemployment/${countryCode}`),
+            fetch(`/api/comparison/${countryCode}`)
+        ]);
+        
+        // GDP data
         if (gdpResponse.ok) {
             const gdpData = await gdpResponse.json();
             renderLineChart('gdp-chart', 'GDP Growth (%)', gdpData);
         }
         
-        // Fetch unemployment data
-        const unemploymentResponse = await fetch(`/api/unemployment/${countryCode}`);
+        // Unemployment data
         if (unemploymentResponse.ok) {
             const unemploymentData = await unemploymentResponse.json();
             renderLineChart('unemployment-chart', 'Unemployment Rate (%)', unemploymentData);
         }
         
-        // Fetch comparison data
-        const comparisonResponse = await fetch(`/api/comparison/${countryCode}`);
+        // Comparison data
         if (comparisonResponse.ok) {
             const comparisonData = await comparisonResponse.json();
             renderComparisonChart('comparison-chart', 'GDP Growth Comparison (%)', comparisonData);